@@ -1,32 +1,155 @@
+RANK_CHARS = "23456789TJQKA"
+SUIT_NAMES = ["hearts", "diamonds", "spades", "clubs"]
+
+
 class Card:
 
-    def __init__(self, value:int, suit:str):
+    """
+    There are exactly 52 Card objects. Card(value, suit) always returns \
+    the same object for the same value and suit, so cards can be compared \
+    with "is", used as dict keys and never need to be copied.
+
+    Values go from 1 (a Two) to 13 (an Ace), suits are "hearts", \
+    "diamonds", "spades" or "clubs" (or just their first letter).
+
+    Besides value and suit every card has an index from 0 to 51 \
+    (4*(value-1) + suit number, as used by the evaluator) and a bitmask \
+    with one 16 bit field per suit, so a set of cards can be passed \
+    around as a single int.
+    """
+
+    __slots__ = ("value", "suit", "index", "mask")
+
+    _interned = {}
+
+    def __new__(cls, value:int, suit:str):
+        try:
+            return cls._interned[value, suit]
+        except KeyError:
+            pass
+        if suit in SUIT_NAMES:
+            suit_num = SUIT_NAMES.index(suit)
+        elif len(suit) == 1 and suit in "hdsc":
+            suit_num = "hdsc".index(suit)
+        else:
+            raise ValueError(f"{suit!r} is not a suit.")
+        if not 1 <= value <= 13:
+            raise ValueError(f"{value!r} is not a card value, values go from 1 to 13.")
+        return CARDS[4*(value - 1) + suit_num]
+
+    @classmethod
+    def _make(cls, index):
+        card = object.__new__(cls)
+        object.__setattr__(card, "value", (index >> 2) + 1)
+        object.__setattr__(card, "suit", SUIT_NAMES[index & 3])
+        object.__setattr__(card, "index", index)
+        object.__setattr__(card, "mask", 1 << (16*(index & 3) + (index >> 2)))
+        cls._interned[card.value, card.suit] = card
+        cls._interned[card.value, card.suit[0]] = card
+        return card
+
+    @classmethod
+    def from_str(cls, string:str):
 
         """
-        Initiates a Card object with a given value and suit. Card objects can
-        be compared to one another. The comparisons only check the value, not
-        the suit, meaning 6h == 6d will evaluate to True.
+        Returns the card for a string like "Ah" or "Td".
         """
 
-        self.value = value
-        self.suit = suit
+        try:
+            return CARDS[4*RANK_CHARS.index(string[0].upper()) + "hdsc".index(string[1].lower())]
+        except (ValueError, IndexError):
+            raise ValueError(f"{string!r} is not a card.") from None
 
-        self.repr_list = [str(x) for x in range(2,10)] + ["T", "J", "Q", "K", "A"]
+    def __setattr__(self, name, value):
+        raise AttributeError("Cards cannot be changed.")
 
+    def __reduce__(self):
+        return (card_from_index, (self.index,))
 
     def __repr__(self):
-        return self.repr_list[self.value-1] + self.suit[0]
+        return RANK_CHARS[self.value-1] + self.suit[0]
+
+    def __hash__(self):
+        return self.index
 
-    # Comparisons only check the value, not the suit
+    # Every card exists once, so equality is identity. Orderings go by the
+    # index, i.e. by value first and by suit between cards of one value,
+    # so they agree with equality and sorting still puts values in order.
     def __eq__(self, other):
-        return self.value == other.value
+        return self is other
     def __ne__(self, other):
-        return self.value != other.value
+        return self is not other
     def __lt__(self, other):
-        return self.value < other.value
+        return self.index < other.index
     def __le__(self, other):
-        return self.value <= other.value
+        return self.index <= other.index
     def __gt__(self, other):
-        return self.value > other.value
+        return self.index > other.index
     def __ge__(self, other):
-        return self.value >= other.value
+        return self.index >= other.index
+
+
+#All 52 cards, in index order
+CARDS = tuple(Card._make(i) for i in range(52))
+
+#Every card in one mask
+FULL_MASK = sum(card.mask for card in CARDS)
+
+_BY_MASK = {card.mask: card for card in CARDS}
+
+
+def card_from_index(index:int):
+    return CARDS[index]
+
+def parse_cards(string:str):
+
+    """
+    Inputs: A string of cards like "AhKd" or "Ah Kd Qc".
+    Outputs: A list of the cards.
+    """
+
+    string = string.replace(" ", "").replace(",", "")
+    return [Card.from_str(string[i:i+2]) for i in range(0, len(string), 2)]
+
+def to_cards(cards):
+
+    """
+    Accepts a list of Cards or a string like "AhKd" and returns a list of Cards.
+    """
+
+    if isinstance(cards, str):
+        return parse_cards(cards)
+    return list(cards)
+
+def cards_to_str(cards):
+
+    """
+    Returns a string like "AhKd" for a list of cards.
+    """
+
+    return "".join(map(repr, cards))
+
+def cards_to_mask(cards):
+
+    """
+    Returns the mask of a list of cards.
+    """
+
+    mask = 0
+    for card in cards:
+        mask |= card.mask
+    return mask
+
+def mask_to_cards(mask:int):
+
+    """
+    Returns the cards in a mask as a list, in index order.
+    """
+
+    cards = []
+    while mask:
+        low_bit = mask & -mask
+        cards.append(_BY_MASK[low_bit])
+        mask ^= low_bit
+    cards.sort(key = lambda card: card.index)
+    return cards
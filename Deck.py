@@ -51,3 +51,110 @@ class Deck(list):
         for suit in self.suits:
             for val in self.vals:
                 self.append(Card(val, suit))
+
+
+class PermutationDeck:
+
+    def __init__(self, cards = None, seed = None, rng = None):
+
+        """
+        A deck that deals from a fixed permutation of its cards with a \
+        moving cursor instead of popping from a list.
+
+        Dealing shuffles lazily: every draw picks its cards with the next \
+        steps of a Fisher-Yates shuffle, so only as many cards are shuffled \
+        as are dealt. reset puts every card back in O(1) by moving the \
+        cursor back to the start, nothing has to be gathered up.
+
+        Inputs: cards are the items to deal (default: the 52 Cards, but \
+            card indices work just as well). Randomness comes from rng, a \
+            random.Random, or a new one seeded with seed. The same seed \
+            always deals the same cards.
+        """
+
+        if cards is None:
+            cards = [Card(val, suit) for suit in ["hearts", "diamonds", "spades", "clubs"]
+                                     for val in range(1, 14)]
+        self.order = list(cards)
+        self.size = len(self.order)
+        self.rng = rng if rng is not None else random.Random(seed)
+
+        #Cards before cursor are dealt, cards before shuffled are in their
+        #final random position for this deal
+        self.cursor = 0
+        self.shuffled = 0
+
+    def __len__(self):
+        return self.size - self.cursor
+
+    def __iter__(self):
+        return iter(self.order[self.cursor:self.size])
+
+    def __repr__(self):
+        return f"PermutationDeck with {len(self)} of {self.size} cards left"
+
+    def reset(self):
+
+        """
+        Puts every card back into the deck and starts a new shuffle.
+        """
+
+        self.cursor = 0
+        self.shuffled = 0
+
+    def shuffle(self, num = None):
+
+        """
+        Starts a new shuffle of the cards left in the deck. With num, the \
+        next num cards are shuffled right away, otherwise each card is \
+        shuffled when it is drawn.
+        """
+
+        self.shuffled = self.cursor
+        if num:
+            self._shuffle_to(min(self.cursor + num, self.size))
+
+    def _shuffle_to(self, stop):
+        order = self.order
+        size = self.size
+        random = self.rng.random
+        for i in range(self.shuffled, stop):
+            j = i + int(random() * (size - i))
+            order[i], order[j] = order[j], order[i]
+        self.shuffled = stop
+
+    def draw(self, num: int = 1):
+
+        """
+        Returns a list with the next num cards. Raises an IndexError if \
+        more cards are to be drawn than are left in the deck or if fewer \
+        than 1 card is to be drawn, just like Deck.draw.
+        """
+
+        stop = self.cursor + num
+        if stop > self.size:
+            raise IndexError(
+                f"There are only {len(self)} cards left in the deck, you cannot draw {num} {'cards' if num != 1 else 'card'}.")
+        if num < 1:
+            raise IndexError(
+                "You cannot draw less than 1 card.")
+        if stop > self.shuffled:
+            self._shuffle_to(stop)
+
+        cards_drawn = self.order[self.cursor:stop]
+        self.cursor = stop
+        return cards_drawn
+
+    def remove(self, cards):
+
+        """
+        Takes the given cards out of the deck for good (e.g. dead cards), \
+        by moving them behind the last card that can be dealt. Has to be \
+        called before dealing.
+        """
+
+        for card in cards:
+            i = self.order.index(card, 0, self.size)
+            self.size -= 1
+            self.order[i], self.order[self.size] = self.order[self.size], self.order[i]
+        self.reset()
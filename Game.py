@@ -1,9 +1,12 @@
 from operator import attrgetter
 
-from Deck import Deck
+from Deck import PermutationDeck
 from eval_funcs import evaluate_holdem
-from Player import Player
-from UI import UI
+from Player import Player, BotPlayer
+from history import ACTION_CODES, HandRecord
+from omaha import OmahaBoard
+from showdown import resolve_showdown
+import evaluator
 
 class Game:
 
@@ -13,24 +16,44 @@ class Game:
         Initiates the Game object with as many players as given by \
         the parameter players (default is 6). The player objects are stored \
         in self.players and then a new hand is dealt.
+
+        With headless = True no UI is created, nothing is printed and no \
+        hands are played until run is called. Decisions then come from \
+        decision_provider, a callable (or a list with one per seat) taking \
+        the player and the game and returning a decision like \
+        Player.get_decision does, or from player_class, a Player subclass \
+        that overrides get_decision. chips is the starting stack of every \
+        player, or a list with one per seat. payouts are the prizes of \
+        the places still to be decided, for icm_equities; they only make \
+        sense if the players at this table are all that is left of the \
+        tournament, i.e. at the final table.
+
+        Hands played with run_async / new_hand_async await decisions \
+        instead, so decision_provider may also be a coroutine function \
+        (see async_providers). Whoever has not decided after \
+        decision_timeout seconds checks if they can and folds otherwise.
         """
 
         #See if the player names were given, else use numbers
         player_names = kwargs.get("player_names", list(range(players)))
 
+        self.headless = kwargs.get("headless", False)
+        self.hands_played = 0
+
+        #Where to log every hand (e.g. a history.HandHistoryWriter), if anywhere
+        self.history = kwargs.get("history")
+        self.hand_record = None
 
         #The players still in the game
-        self.players = [Player(self,
-                               position = i,
-                               player_name = player_names[i]) for i in range(players)]
+        self.players = [self.make_player(i, player_names[i], **kwargs) for i in range(players)]
         self.players_num = players
         self.winner = None
 
         #Player position whose turn it is, not to be confused with the Turn
         self.turn: int
         self.board = []
-        self.deck = Deck()
-        print([x.value for x in self.deck])
+        #Pass seed to make every deal of the game reproducible
+        self.deck = PermutationDeck(seed = kwargs.get("seed"))
 
         #Other possible args and kwargs, idk bro, might need it later
         self.args = args
@@ -55,12 +78,83 @@ class Game:
         self.blinds = kwargs.get("blinds", [1,2])
         self.ante = kwargs.get("ante", 0)
 
+        #Prizes of the places still to be decided, winner first, if this is
+        #a tournament table (see icm_equities)
+        self.payouts = kwargs.get("payouts")
+
+        #Seconds a player gets to decide in new_hand_async before they
+        #check or fold automatically (None waits forever)
+        self.decision_timeout = kwargs.get("decision_timeout")
+        self.timeouts = 0
+
+        if self.headless:
+            self.update()
+            return
+
+        #Only needed with a UI, so headless games never import tkinter
+        from UI import UI
         ui = UI(self)
 
 
         #Announce the winner
         print(f'The winner is {self.players[0].name}! Congratulations!')
 
+    def make_player(self, position, player_name, **kwargs):
+
+        """
+        Creates the player sitting in the given position. See __init__ for \
+        the keyword arguments that decide what kind of player it is.
+        """
+
+        chips = kwargs.get("chips", 1_000)
+        if isinstance(chips, (list, tuple)):
+            chips = chips[position]
+
+        provider = kwargs.get("decision_provider")
+        if isinstance(provider, (list, tuple)):
+            provider = provider[position]
+        if provider is not None:
+            return BotPlayer(self, provider, position = position, player_name = player_name,
+                             chips = chips)
+
+        player_class = kwargs.get("player_class", Player)
+        return player_class(self, position = position, player_name = player_name,
+                            chips = chips)
+
+    def log(self, message):
+
+        """
+        Prints the message unless the game is headless.
+        """
+
+        if not self.headless:
+            print(message)
+
+    def run(self, n_hands = 1, **kwargs):
+
+        """
+        Plays up to n_hands hands in a row, stopping early if only one \
+        player has chips left. Returns the number of hands played. The \
+        keyword arguments are passed on to new_hand.
+        """
+
+        played = 0
+        while played < n_hands and self.players_num > 1:
+            self.new_hand(**kwargs)
+            played += 1
+        return played
+
+    async def run_async(self, n_hands = 1, **kwargs):
+
+        """
+        Like run, but plays the hands with new_hand_async.
+        """
+
+        played = 0
+        while played < n_hands and self.players_num > 1:
+            await self.new_hand_async(**kwargs)
+            played += 1
+        return played
 
     def __repr__(self):
         return f"There are {len(self.players)} players left. The chip leader is {self.chip_leader}."
@@ -85,6 +179,12 @@ class Game:
         self.move_positions()
         self.players = [player for player in self.players if player.chips > 0]
         self.players_num = len(self.players)
+
+        #Close the gaps busted players leave in the positions
+        self.sort_by_position()
+        for position, player in enumerate(self.players):
+            player.position = position
+
         self.winner = None
         for player in self.players:
             player.folded = False
@@ -98,16 +198,29 @@ class Game:
 
         self.chip_leader = max(self.players, key=attrgetter('chips'))
 
+    def icm_equities(self, payouts = None, **kwargs):
+
+        """
+        Returns the ICM equity of every player left as a dict by player \
+        name, from their chips and payouts (default: self.payouts). See \
+        icm.game_equities. The players at this table are taken to be the \
+        whole field, so this is for final tables; with more tables, use \
+        Tournament.icm_equities.
+        """
+
+        #NumPy is only needed here, so games without payouts never import it
+        from icm import game_equities
+        return game_equities(self, payouts, **kwargs)
+
     def update_deck(self):
 
         """
-        Adds the cards given to players and on \
-        the board back to the deck, then shuffles
+        Puts the cards given to players and on the board back into \
+        the deck and starts a new shuffle. This does not touch the \
+        cards, the deck just starts dealing from the top again.
         """
-        for player in self.players:
-            self.deck += player.hole_cards
-        self.deck += self.board
-        self.deck.shuffle()
+
+        self.deck.reset()
 
     def update_board(self, new_cards = None, print_cards = True):
 
@@ -121,7 +234,7 @@ class Game:
         else:
             self.board += new_cards
             if print_cards == True:
-                print(f"Dealt to the board: {new_cards}")
+                self.log(f"Dealt to the board: {new_cards}")
 
     def update_pot(self):
 
@@ -132,6 +245,8 @@ class Game:
         """
 
         self.pot += sum(self.bets)
+        for position, bet in enumerate(self.bets):
+            self.contributions[position] += bet
         self.bets = [0]*self.players_num
 
     def sort_by_position(self):
@@ -154,6 +269,40 @@ class Game:
     def evaluate(self, card_list):
         return evaluate_holdem(card_list)
 
+    def live_players(self):
+
+        """
+        Returns the players who have not folded this hand.
+        """
+
+        return [player for player in self.players if not player.folded]
+
+    def showdown(self):
+
+        """
+        Ranks the hands of everyone who has not folded, then splits the \
+        main pot and any side pots among the winners. Should be called \
+        after the last betting round. Works for Hold'em and, if the players \
+        hold 4 or 5 cards, for Omaha.
+        """
+
+        board = [card.index for card in self.board]
+        hands = [None if player.folded else [card.index for card in player.hole_cards]
+                 for player in self.players]
+
+        #More than 2 hole cards means Omaha: exactly two of them have to be used
+        if len(self.players[0].hole_cards) > 2:
+            omaha_board = OmahaBoard(board)
+            ranks = [None if hand is None else omaha_board.evaluate(hand) for hand in hands]
+        else:
+            ranks = [None if hand is None else evaluator.evaluate(hand + board) for hand in hands]
+
+        winnings, self.pots = resolve_showdown(self.contributions, ranks)
+        for player, won in zip(self.players, winnings):
+            if won:
+                player.chips += won
+                self.log(f"{player.name} wins {won} chips with {evaluator.hand_name(ranks[player.position])}.")
+
     def move_positions(self):
         for player in self.players:
             player.position = (player.position + 1) % self.players_num
@@ -170,13 +319,7 @@ class Game:
         part of the Game class.
         """
 
-        self.sort_by_position()
-        self.players_in_it = list(range(self.players_num))
-        self.bets = [0]*self.players_num
-
-        for player in self.players:
-            player.hole_cards = sorted(self.deck.draw(cards_per_player),
-                                       reverse = True)
+        self.start_hand(cards_per_player)
 
         #Preflop Betting
         self.betting_round(preflop = True, **kwargs)
@@ -191,7 +334,69 @@ class Game:
             self.betting_round(**kwargs)
             i += 1
 
+        self.end_hand()
+
+    async def new_hand_async(self, cards_per_player = 2, **kwargs):
+
+        """
+        Plays a hand like new_hand, but awaits every decision (see \
+        betting_round_async), so other tables in the same event loop keep \
+        playing while a player thinks.
+        """
+
+        self.start_hand(cards_per_player)
+        await self.betting_round_async(preflop = True, **kwargs)
+
+        i = 0
+        while self.winner is None and i < 3:
+            card_num = i**2-3*i+3
+            self.update_board(self.deck.draw(card_num))
+            await self.betting_round_async(**kwargs)
+            i += 1
+
+        self.end_hand()
+
+    def start_hand(self, cards_per_player = 2):
+
+        """
+        Resets the bets of the hand and deals the hole cards.
+        """
+
+        self.sort_by_position()
+        self.players_in_it = list(range(self.players_num))
+        self.bets = [0]*self.players_num
+        #Everything each player has put into the pot this hand
+        self.contributions = [0]*self.players_num
+        self.pots = []
+
+        for player in self.players:
+            player.hole_cards = sorted(self.deck.draw(cards_per_player),
+                                       reverse = True)
+
+        if self.history is not None:
+            self.hand_record = HandRecord(self.hands_played, self.blinds, self.ante,
+                                          [player.chips for player in self.players],
+                                          [[card.index for card in player.hole_cards]
+                                           for player in self.players])
+
+    def end_hand(self):
+
+        """
+        Goes to showdown if needed, logs the hand and gets the game ready \
+        for the next one.
+        """
+
+        if self.winner is None:
+            self.showdown()
+
+        if self.hand_record is not None:
+            self.hand_record.board = [card.index for card in self.board]
+            self.hand_record.final_stacks = [player.chips for player in self.players]
+            self.history.write(self.hand_record)
+            self.hand_record = None
+
         #Update the state of the game once the hand ends
+        self.hands_played += 1
         self.update()
 
     def betting_round(self, preflop = False, **kwargs):
@@ -202,12 +407,53 @@ class Game:
         """
 
         verbose = kwargs.get("verbose", False)
+        steps = self.betting_steps(preflop, verbose)
+        try:
+            player = next(steps)
+            while True:
+                player = steps.send(player.get_decision(verbose = verbose))
+        except StopIteration:
+            pass
+
+    async def betting_round_async(self, preflop = False, **kwargs):
+
+        """
+        Plays a betting round like betting_round, awaiting every decision \
+        from Player.get_decision_async with self.decision_timeout.
+        """
+
+        steps = self.betting_steps(preflop, kwargs.get("verbose", False))
+        try:
+            player = next(steps)
+            while True:
+                player = steps.send(await player.get_decision_async(self.decision_timeout))
+        except StopIteration:
+            pass
+
+    def betting_steps(self, preflop = False, verbose = False):
+
+        """
+        The betting round itself, as a generator: it yields every player \
+        who has to act and expects their decision to be sent back in. This \
+        way betting_round and betting_round_async share all the rules.
+        """
+
+        #If at most one player can still bet, there is nothing to bet on,
+        #the remaining cards are just dealt
+        if not preflop and sum(1 for p in self.players if not (p.folded or p.all_in)) < 2:
+            return
 
         #The person we have to get back to without raises
         #or new bets for the betting round to end
-        self.last_to_bet = 2 if preflop else 0
+        #(heads-up the small blind has the button, so it acts first preflop
+        #and the big blind acts first after the flop)
+        if preflop:
+            self.last_to_bet = 2 % self.players_num
+        else:
+            self.last_to_bet = 1 if self.players_num == 2 else 0
         self.turn = self.last_to_bet
         complete_round_counter = 0
+        folded_num = sum(1 for player in self.players if player.folded)
 
         continuation_actions = set(["r", "b", "c"])
 
@@ -221,7 +467,7 @@ class Game:
             #Blinds are placed
             self.get_player_by_position(0).place_bet(self.blinds[0])
             self.get_player_by_position(1).place_bet(self.blinds[1])
-            self.turn = 2
+            self.turn = self.last_to_bet
 
 
         #Betting continues until we reach whoever was last to bet/raise
@@ -229,7 +475,7 @@ class Game:
         while True:
 
             #If only one person is left, the game ends
-            if self.players_num == 1:
+            if self.players_num - folded_num == 1:
                 break
 
             player = self.players[self.turn]
@@ -239,7 +485,7 @@ class Game:
             if player.position == self.last_to_bet:
                 if complete_round_counter != 0:
                     if verbose:
-                        print(f"We have now reached {player.name} who was the last to bet/raise.")
+                        self.log(f"We have now reached {player.name} who was the last to bet/raise.")
                     break
                 else:
                     complete_round_counter += 1
@@ -249,29 +495,36 @@ class Game:
             if player.folded:
                 self.turn = (self.turn + 1)%self.players_num
                 if verbose:
-                    print(f"{player.name} has folded already. Moving on...")
+                    self.log(f"{player.name} has folded already. Moving on...")
                 continue
             elif player.all_in:
                 self.turn = (self.turn + 1)%self.players_num
                 if verbose:
-                    print(f"{player.name} has already gone All-in. Moving on...")
+                    self.log(f"{player.name} has already gone All-in. Moving on...")
                 continue
 
             #Get the player's decision on how to play
-            decision = player.get_decision(verbose = verbose)
+            decision = yield player
+            if self.hand_record is not None:
+                self.hand_record.actions.append((player.position, ACTION_CODES[decision[0]],
+                                                 decision[1] if decision[0] in "rb" else 0))
 
             #Raise, Bet, Call or even Check
             if decision[0] in continuation_actions:
-                player.place_bet(decision[1])
 
                 #If the player bets or raises, update who is last to act
+                #Bets and raises are to an amount, calls are the chips to add
                 if decision[0] == "r" or decision[0] == "b":
+                    player.place_bet(decision[1] - player.bet)
                     self.last_to_bet = self.turn
                     if verbose:
-                        print(f"{player.name} is the last person to have bet.")
+                        self.log(f"{player.name} is the last person to have bet.")
+                else:
+                    player.place_bet(decision[1])
             #Fold
             else:
                 self.players_in_it.remove(self.turn)
+                folded_num += 1
 
 
             self.turn = (self.turn + 1)%self.players_num
@@ -281,10 +534,10 @@ class Game:
             player.bet = 0
 
         #Check if we already have a winner
-        if len(self.players_in_it) == 1:
-            self.winner = self.players[self.players_in_it[0]]
+        if self.players_num - folded_num == 1:
+            self.winner = self.live_players()[0]
             self.winner.chips += self.pot
-            print(f"{self.winner.name} wins the pot of {self.pot} chips.")
+            self.log(f"{self.winner.name} wins the pot of {self.pot} chips.")
 
 
 
@@ -15,6 +15,10 @@ class Player:
         """
         self.chips = chips
         self.hole_cards = []
+        #Incremental state of the hole cards and the board, built on first
+        #use (see the hand_state property)
+        self._hand_state = None
+        self._hand_state_cards = None
         self.position = position
         self.bet = 0
         self.all_in = False
@@ -29,19 +33,71 @@ class Player:
     def __repr__(self):
         return f"Player {self.name} with {self.chips} chips."
 
+    @property
+    def hand_state(self):
+
+        """
+        The HandState (see hand_state) of the hole cards and the board so \
+        far, or None unless the player holds two cards (Hold'em). It is \
+        only built when asked for, once per hand, and brought up to date \
+        with the board cards dealt since, so hands nobody looks at cost nothing.
+        """
+
+        if len(self.hole_cards) != 2:
+            return None
+        if self._hand_state_cards is not self.hole_cards:
+            from hand_state import HandState
+            self._hand_state = HandState(self.hole_cards)
+            self._hand_state_cards = self.hole_cards
+        state = self._hand_state
+        board = self.game.board
+        if state.size < 2 + len(board):
+            state.add_cards(board[state.size - 2:])
+        return state
+
     def place_bet(self, betsize:int = 0):
 
-        #Going All-in
+        #Going All-in (posting a blind after the ante took every chip
+        #leaves the player all-in already)
         if betsize >= self.chips:
             betsize = self.chips
-            self.all_in = True
-            self.game.players_in_it.remove(self.position)
+            if not self.all_in:
+                self.all_in = True
+                self.game.players_in_it.remove(self.position)
 
         self.bet += betsize
         self.chips -= betsize
         self.game.bets[self.position] = self.bet
 
     def get_decision(self, verbose = False):
+        steps = self.decision_steps(verbose)
+        try:
+            prompt = next(steps)
+            while True:
+                prompt = steps.send(input(prompt))
+        except StopIteration as stop:
+            return self.apply_decision(stop.value)
+
+    def apply_decision(self, decision):
+
+        """
+        Marks the player as folded if the decision is a fold and returns it.
+        """
+
+        if decision[0] == "f":
+            self.folded = True
+        return decision
+
+    def decision_steps(self, verbose = False):
+
+        """
+        The console dialogue of get_decision, as a generator: it yields \
+        every prompt, expects the line typed in answer to be sent back and \
+        returns the decision. It does not change the player, so \
+        get_decision and get_decision_async share it however they read \
+        the console.
+        """
+
         bets = self.game.bets
         size_to_call = max(bets)-self.bet
         actions = self.get_allowed_actions(size_to_call)
@@ -49,13 +105,13 @@ class Player:
 
         while True:
             if verbose:
-                decision = input(
+                decision = yield (
 f"""Hello {self.name}. Your hand is {self.hole_cards}.You can choose to \
 {actions[0]}, {actions[1]} or {actions[2]}. Type f to {actions[0]}, c to \
 {actions[1]} {'for another '+ str(size_to_call) + ' chips' if actions[1] == "Call" else ''}, \
 or type {actions[2][0].lower()} and a number to {actions[2]} to that amount of chips.\n""")
             else:
-                decision = input(
+                decision = yield (
 f"""{self.name}: {self.hole_cards}
 Options: {actions[0]}, {actions[1]}\
 {" " + str(size_to_call) if actions[1] == "Call" else ''}, \
@@ -82,7 +138,7 @@ Options: {actions[0]}, {actions[1]}\
 
                 #If we raise, it must be to more than the current largest bet
                 if raise_amount-self.bet <= size_to_call:
-                    print(f"You must raise to at least {max(bets)+self.blinds[1]}!")
+                    print(f"You must raise to at least {max(bets)+self.game.blinds[1]}!")
 
                 #We cannot bet more than we have
                 elif raise_amount > self.bet + self.chips:
@@ -100,7 +156,6 @@ Options: {actions[0]}, {actions[1]}\
             #folding
             elif decision[0].lower() == "f":
                 print(f"{self.name} folds.")
-                self.folded = True
                 return ("f",0)
             #calling or checking
             elif decision[0].lower() == "c":
@@ -109,6 +164,50 @@ Options: {actions[0]}, {actions[1]}\
 
 
 
+    async def get_decision_async(self, timeout = None):
+
+        """
+        Awaitable version of get_decision for Game.new_hand_async. The \
+        console is read through console_reader, so waiting for a line \
+        never blocks the event loop and can be given up on. Without a \
+        decision after timeout seconds the player checks or folds, and \
+        whatever is typed late is thrown away when the next prompt starts.
+        """
+
+        import asyncio
+
+        console = console_reader()
+        console.discard()
+
+        async def dialogue():
+            steps = self.decision_steps()
+            try:
+                prompt = next(steps)
+                while True:
+                    print(prompt, end = "", flush = True)
+                    prompt = steps.send(await console.readline())
+            except StopIteration as stop:
+                return stop.value
+
+        try:
+            decision = await asyncio.wait_for(dialogue(), timeout)
+        except asyncio.TimeoutError:
+            return self.timeout_decision()
+        return self.apply_decision(decision)
+
+    def timeout_decision(self):
+
+        """
+        The decision taken for a player who ran out of time: check if \
+        possible, else fold.
+        """
+
+        self.game.timeouts += 1
+        if max(self.game.bets) == self.bet:
+            return ("c", 0)
+        self.folded = True
+        return ("f", 0)
+
     def get_allowed_actions(self,
                         size_to_call = 0):
         """
@@ -119,6 +218,73 @@ Options: {actions[0]}, {actions[1]}\
 
 
 
+class BotPlayer(Player):
+
+    def __init__(self, game, decide, *args, **kwargs):
+
+        """
+        A Player whose decisions come from the callable decide instead of \
+        input(). decide is called with the player and the game and returns \
+        a decision in the same form as Player.get_decision: ("f", 0) to \
+        fold, ("c", anything) to check or call, or ("b", amount) / \
+        ("r", amount) to bet or raise to amount chips in total.
+        """
+
+        super().__init__(game, *args, **kwargs)
+        self.decide = decide
+
+    def get_decision(self, verbose = False):
+
+        """
+        Asks decide for a decision and turns it into a legal one. Bets and \
+        raises are clamped between the minimum raise and going all-in, \
+        calls always add exactly the chips needed to call.
+        """
+
+        return self.legal_decision(self.decide(self, self.game))
+
+    async def get_decision_async(self, timeout = None):
+
+        """
+        Awaits decide if it returns an awaitable (a coroutine function or \
+        one of async_providers), with the given timeout; plain callables \
+        are used as they are.
+        """
+
+        #Only async games need these, so importing Player stays cheap
+        import asyncio
+        import inspect
+
+        decision = self.decide(self, self.game)
+        if inspect.isawaitable(decision):
+            try:
+                decision = await asyncio.wait_for(decision, timeout)
+            except asyncio.TimeoutError:
+                return self.timeout_decision()
+        return self.legal_decision(decision)
+
+    def legal_decision(self, decision):
+
+        """
+        Turns a decision into a legal one, see get_decision.
+        """
+
+        highest_bet = max(self.game.bets)
+        size_to_call = highest_bet - self.bet
+
+        if decision[0] == "f":
+            self.folded = True
+            return ("f", 0)
+
+        if decision[0] in ("r", "b"):
+            all_in_to = self.bet + self.chips
+            if all_in_to > highest_bet:
+                raise_to = max(decision[1], highest_bet + self.game.blinds[1])
+                return ("r" if size_to_call else "b", min(raise_to, all_in_to))
+
+        return ("c", size_to_call)
+
+
 def contains_Number(string:str):
 
     """
@@ -128,4 +294,86 @@ def contains_Number(string:str):
     for char in string:
         if char.isdigit():
             return True
-    return False
\ No newline at end of file
+    return False
+
+class ConsoleReader:
+
+    def __init__(self):
+
+        """
+        Reads lines typed on the console on a daemon thread and hands them \
+        to the running event loop, so a coroutine can await a line and give \
+        up on it without leaving a blocked input() behind. The thread only \
+        passes lines on and never touches a player or a game.
+        """
+
+        import asyncio
+        import threading
+
+        self.loop = asyncio.get_running_loop()
+        self.lines = asyncio.Queue()
+        threading.Thread(target = self._read, daemon = True).start()
+
+    def _read(self):
+        import sys
+
+        for line in sys.stdin:
+            self._deliver(line.rstrip("\r\n"))
+        #None marks the end of the input
+        self._deliver(None)
+
+    def _deliver(self, line):
+        try:
+            self.loop.call_soon_threadsafe(self.lines.put_nowait, line)
+        except RuntimeError:
+            #The event loop has been closed, nobody is waiting anymore
+            pass
+
+    def attach(self):
+
+        """
+        Passes later lines to the running event loop, e.g. after one \
+        asyncio.run has finished and another one started.
+        """
+
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        if loop is not self.loop:
+            self.lines = asyncio.Queue()
+            self.loop = loop
+
+    def discard(self):
+
+        """
+        Throws away the lines typed while nobody was waiting for one.
+        """
+
+        while not self.lines.empty():
+            if self.lines.get_nowait() is None:
+                self.lines.put_nowait(None)
+                break
+
+    async def readline(self):
+        line = await self.lines.get()
+        if line is None:
+            self.lines.put_nowait(None)
+            raise EOFError("The console input was closed.")
+        return line
+
+
+_console_reader = None
+
+def console_reader():
+
+    """
+    Returns the ConsoleReader of the process, attached to the running \
+    event loop. There is only one, since only one thread can read the console.
+    """
+
+    global _console_reader
+    if _console_reader is None:
+        _console_reader = ConsoleReader()
+    else:
+        _console_reader.attach()
+    return _console_reader
@@ -1,7 +1,134 @@
-from Game import Game
+"""
+Command line entry point. Run this directory with a command:
 
-if __name__ == "__main__":
+    python Poker equity AhKh QsQd --board Jh7h2c    all-in equity
+    python Poker simulate --players 6 --hands 1000  headless bot games
+    python Poker bench [case ...]                   the benchmarks, see bench.py
+    python Poker startup                            checks the startup budget
+    python Poker play                               the game with its window
+
+Without a command it starts the game with its window, as it always did. \
+Only argparse is imported up front and every command imports what it \
+needs when it runs, so nothing loads the UI, NumPy or the evaluator \
+tables unless that command uses them.
+
+The vectorized modules (batch_eval, equity, ranges, icm, outs, \
+vector_game and the rest) need NumPy; install it with
+
+    pip install -r requirements.txt
+"""
+
+import argparse
+import os
+import sys
+
+#Seconds a fresh interpreter may take to import the engine, or to start
+#the CLI, before the startup command fails
+STARTUP_BUDGET = 0.15
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def equity_command(args):
+    from equity import equity, exact_equity
+
+    if args.exact:
+        result = exact_equity(args.hands, args.board, args.dead)
+    else:
+        result = equity(args.hands, args.board, args.dead, trials = args.trials,
+                        target_stderr = args.stderr, workers = args.workers, seed = args.seed)
+    print(result)
+    return 0
+
+def simulate_command(args):
+    import time
+
+    import bots
+    from Game import Game
+
+    providers = {"random": lambda: bots.RandomBot(seed = args.seed),
+                 "call": lambda: bots.check_call,
+                 "fold": lambda: bots.check_fold}
+    game = Game(args.players, headless = True, chips = args.chips, blinds = args.blinds,
+                ante = args.ante, decision_provider = providers[args.bot](), seed = args.seed)
+    start = time.perf_counter()
+    played = game.run(args.hands)
+    elapsed = time.perf_counter() - start
+    print(f"Played {played} hands in {elapsed:.2f} s ({played / elapsed if elapsed else 0:,.0f} hands/s)")
+    for player in sorted(game.players, key = lambda player: -player.chips):
+        print(f"{player.name}: {player.chips}")
+    return 0
+
+def bench_command(args):
+    import bench
+    return bench.main(args.args)
+
+def startup_command(args):
+    from bench import ENGINE_MODULES, startup_time
+
+    checks = [(f"import {', '.join(ENGINE_MODULES)}", None),
+              ("CLI --help", [HERE, "--help"])]
+    over = False
+    for name, command in checks:
+        seconds = startup_time(command, args.repeats)
+        over |= seconds > args.budget
+        print(f"{name:50} {seconds*1000:7.1f} ms{'  OVER BUDGET' if seconds > args.budget else ''}")
+    print(f"Budget: {args.budget*1000:.0f} ms")
+    return 1 if over else 0
+
+def play_command(args):
+    from Game import Game
 
     player_names = ["Anna", "Bob", "Chiara", "Dylan", "Emilia", "Fabian"]
     game = Game(player_names = player_names)
-    #ui = UI(game)
+    return 0
+
+
+def parser():
+    parser = argparse.ArgumentParser(prog = "poker", description = "Poker engine tools.")
+    commands = parser.add_subparsers(dest = "command")
+
+    equity = commands.add_parser("equity", help = "all-in equity of two or more hands")
+    equity.add_argument("hands", nargs = "+", help = "hole cards like AhKd")
+    equity.add_argument("--board", default = "", help = "community cards like Jh7h2c")
+    equity.add_argument("--dead", default = "", help = "cards that cannot come")
+    equity.add_argument("--exact", action = "store_true", help = "walk every runout")
+    equity.add_argument("--trials", type = int, default = 1_000_000, help = "most runouts to deal")
+    equity.add_argument("--stderr", type = float, help = "stop once every standard error is this small")
+    equity.add_argument("--workers", type = int, help = "processes (default: one per core)")
+    equity.add_argument("--seed", type = int)
+    equity.set_defaults(run = equity_command)
+
+    simulate = commands.add_parser("simulate", help = "play headless games between bots")
+    simulate.add_argument("--players", type = int, default = 6)
+    simulate.add_argument("--hands", type = int, default = 1000)
+    simulate.add_argument("--chips", type = int, default = 1000)
+    simulate.add_argument("--blinds", type = int, nargs = 2, default = [1, 2], metavar = ("SB", "BB"))
+    simulate.add_argument("--ante", type = int, default = 0)
+    simulate.add_argument("--bot", choices = ["random", "call", "fold"], default = "random")
+    simulate.add_argument("--seed", type = int)
+    simulate.set_defaults(run = simulate_command)
+
+    bench = commands.add_parser("bench", help = "run the benchmarks (arguments go to bench.py)")
+    bench.add_argument("args", nargs = argparse.REMAINDER)
+    bench.set_defaults(run = bench_command)
+
+    startup = commands.add_parser("startup", help = "check how fast the engine and the CLI start")
+    startup.add_argument("--budget", type = float, default = STARTUP_BUDGET, help = "seconds allowed")
+    startup.add_argument("--repeats", type = int, default = 5)
+    startup.set_defaults(run = startup_command)
+
+    play = commands.add_parser("play", help = "play with the window (the default)")
+    play.set_defaults(run = play_command)
+    return parser
+
+def main(argv = None):
+    args = parser().parse_args(argv)
+    if args.command is None:
+        return play_command(args)
+    return args.run(args)
+
+
+if __name__ == "__main__":
+
+    sys.exit(main())
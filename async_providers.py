@@ -0,0 +1,183 @@
+"""
+Decision providers for games played with Game.run_async.
+
+Any of these can be passed as decision_provider (or in the list of one \
+per seat). While a player's decision is pending the event loop keeps \
+running the other tables, so one process can host hundreds of them:
+
+    games = [Game(6, headless = True, decision_provider = AsyncBot(check_call),
+                  decision_timeout = 5) for _ in range(300)]
+    asyncio.run(play_tables(games, 100))
+
+AsyncBot      runs a normal decision function as a coroutine, optionally \
+              after a delay, to stand in for a slow client.
+QueueProvider puts a DecisionRequest on an asyncio.Queue for every \
+              decision and waits until someone answers it.
+StreamProvider sends the state as a JSON line over a stream (e.g. a \
+              socket) and reads the answer back, see serve_decisions for \
+              the other end.
+"""
+
+import asyncio
+import json
+
+
+class AsyncBot:
+
+    def __init__(self, decide, delay = 0.0):
+
+        """
+        Wraps a decision function taking (player, game), like those in \
+        bots, into a coroutine. delay is how many seconds it thinks first.
+        """
+
+        self.decide = decide
+        self.delay = delay
+
+    async def __call__(self, player, game):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return self.decide(player, game)
+
+
+def decision_state(player, game):
+
+    """
+    Returns what a player gets to see when deciding, as a dict that can be \
+    turned into JSON.
+    """
+
+    return {"player": player.name if isinstance(player.name, (int, str)) else str(player.name),
+            "position": player.position,
+            "hole_cards": [repr(card) for card in player.hole_cards],
+            "board": [repr(card) for card in game.board],
+            "chips": player.chips,
+            "bet": player.bet,
+            "to_call": max(game.bets) - player.bet,
+            "bets": list(game.bets),
+            "pot": game.pot,
+            "blinds": list(game.blinds)}
+
+def parse_reply(reply):
+
+    """
+    Reads a decision written as "f", "c", "b 300" or "r 300" (the amount \
+    being what to bet or raise to).
+    """
+
+    parts = reply.split()
+    if not parts or parts[0][0].lower() not in "fcbr":
+        raise ValueError(f"Could not read {reply!r} as a decision.")
+    action = parts[0][0].lower()
+    amount = int(parts[1]) if action in "br" and len(parts) > 1 else 0
+    return (action, amount)
+
+
+class DecisionRequest:
+
+    def __init__(self, player, game, future):
+
+        """
+        A pending decision on a QueueProvider's queue. state has what the \
+        player sees (see decision_state); answer it with respond.
+        """
+
+        self.player = player
+        self.game = game
+        self.state = decision_state(player, game)
+        self.future = future
+
+    def __repr__(self):
+        return f"Decision of {self.state['player']} with {self.state['hole_cards']}, {self.state['to_call']} to call"
+
+    def respond(self, action, amount = 0):
+
+        """
+        Answers the request. Does nothing if it timed out already.
+        """
+
+        if not self.future.done():
+            self.future.set_result((action, amount))
+
+class QueueProvider:
+
+    def __init__(self, requests = None):
+
+        """
+        Provides decisions by putting a DecisionRequest on the queue \
+        requests (a new asyncio.Queue by default) and waiting for its answer.
+        """
+
+        self.requests = requests if requests is not None else asyncio.Queue()
+
+    async def __call__(self, player, game):
+        future = asyncio.get_running_loop().create_future()
+        await self.requests.put(DecisionRequest(player, game, future))
+        return await future
+
+
+class StreamProvider:
+
+    def __init__(self, reader, writer):
+
+        """
+        Provides decisions over a pair of asyncio streams, e.g. from \
+        asyncio.open_connection: for every decision it writes the \
+        decision_state with a request number "id" as one JSON line and \
+        reads back a line with that number and a decision parse_reply \
+        understands, e.g. "7 r 300". Several seats may share the streams.
+
+        A request that timed out may still be answered later. Its answer \
+        carries an old number and is skipped, so it cannot be taken for \
+        the answer to the next request.
+        """
+
+        self.reader = reader
+        self.writer = writer
+        self._lock = asyncio.Lock()
+        self._last_id = 0
+
+    async def __call__(self, player, game):
+        async with self._lock:
+            self._last_id += 1
+            state = decision_state(player, game)
+            state["id"] = self._last_id
+            self.writer.write(json.dumps(state).encode() + b"\n")
+            await self.writer.drain()
+            while True:
+                reply = await self.reader.readline()
+                if not reply:
+                    raise ConnectionError("The decision stream was closed.")
+                reply_id, _, decision = reply.decode().partition(" ")
+                if reply_id == str(self._last_id):
+                    break
+        return parse_reply(decision)
+
+async def serve_decisions(reader, writer, decide):
+
+    """
+    The other end of a StreamProvider: answers every JSON line read from \
+    reader with decide(state), a reply string like "c" or "r 300", until \
+    the stream closes. The reply goes back with the id of the request.
+    """
+
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            state = json.loads(line)
+            writer.write(f"{state['id']} {decide(state)}".encode() + b"\n")
+            await writer.drain()
+    finally:
+        writer.close()
+
+
+async def play_tables(games, n_hands = 1, **kwargs):
+
+    """
+    Plays up to n_hands hands on every game at once in the running event \
+    loop. Returns the number of hands each game played.
+    """
+
+    return await asyncio.gather(*(game.run_async(n_hands, **kwargs) for game in games))
@@ -0,0 +1,117 @@
+"""
+Vectorized hand evaluation with NumPy.
+
+Works on integer arrays of card indices (see evaluator) instead of lists \
+of Card objects, so millions of hands can be ranked without any Python \
+work per hand. Ranks are the same as evaluator.evaluate.
+"""
+
+import numpy as np
+
+import evaluator
+
+#Rows per chunk. Every chunk needs a handful of int64 temporaries of \
+#shape (chunk, 7), so this keeps memory use around 100 MB at most.
+DEFAULT_CHUNK_SIZE = 1 << 18
+
+CARD_KEYS = np.array(evaluator.CARD_KEYS, dtype = np.int64)
+CARD_MASKS = np.array(evaluator.CARD_MASKS, dtype = np.int64)
+
+#Sorted rank keys and their ranks, looked up with searchsorted
+_RANK_KEYS = np.array(sorted(evaluator.RANK_TABLE), dtype = np.int64)
+_RANK_VALUES = np.array([evaluator.RANK_TABLE[k] for k in _RANK_KEYS.tolist()], dtype = np.int16)
+
+FLUSH_TABLE = np.array(evaluator.FLUSH_TABLE, dtype = np.int16)
+
+#Category of every rank, from 1 (high card) to 9 (straight flush)
+CATEGORIES = np.zeros(7463, dtype = np.int8)
+for _cat in range(1, 10):
+    CATEGORIES[evaluator.CATEGORY_STARTS[_cat]:] = _cat
+del _cat
+
+#Suit with 5 or more cards, from the flush nibble bits
+_FLUSH_SUIT = np.zeros(0x8889, dtype = np.int8)
+for _suit in range(4):
+    _FLUSH_SUIT[0x8 << 4*_suit] = _suit
+del _suit
+
+
+def _evaluate_chunk(cards, out_ranks):
+
+    """
+    Ranks one chunk of hands into out_ranks.
+    """
+
+    keys = CARD_KEYS[cards].sum(axis = 1) + evaluator.KEY_OFFSET
+    suit_bits = (keys >> evaluator.SUIT_SHIFT) & 0x8888
+    flush = suit_bits != 0
+
+    rank_keys = keys & evaluator.RANK_KEY_MASK
+    out_ranks[:] = _RANK_VALUES[np.searchsorted(_RANK_KEYS, rank_keys)]
+
+    if flush.any():
+        flush_cards = cards[flush]
+        suit = _FLUSH_SUIT[suit_bits[flush]]
+        in_suit = (flush_cards & 3) == suit[:, None]
+        rank_masks = np.where(in_suit, 1 << (flush_cards >> 2), 0).sum(axis = 1)
+        out_ranks[flush] = FLUSH_TABLE[rank_masks]
+
+def evaluate_batch(cards, chunk_size = DEFAULT_CHUNK_SIZE):
+
+    """
+    Inputs: An integer array of shape (N, k) with 5 <= k <= 7, every row \
+        holding distinct card indices from 0 to 51.
+    Outputs: A pair (ranks, categories) of arrays of shape (N,). ranks are \
+        the same as evaluator.evaluate gives for each row, categories go \
+        from 1 (high card) to 9 (straight flush).
+
+    Big inputs are worked through chunk_size rows at a time.
+    """
+
+    cards = np.asarray(cards)
+    if cards.ndim != 2 or not 5 <= cards.shape[1] <= 7:
+        raise ValueError(f"Expected an array of shape (N, 5..7), got {cards.shape}.")
+    if cards.size and (cards.min() < 0 or cards.max() > 51):
+        raise ValueError("Card indices must be between 0 and 51.")
+
+    n = cards.shape[0]
+    ranks = np.empty(n, dtype = np.int16)
+    for start in range(0, n, chunk_size):
+        stop = min(start + chunk_size, n)
+        #Only one chunk at a time is widened, so a compact int8 input
+        #is never copied as a whole
+        _evaluate_chunk(cards[start:stop].astype(np.int64, copy = False), ranks[start:stop])
+    return ranks, CATEGORIES[ranks]
+
+def evaluate_states(keys, masks):
+
+    """
+    Inputs: Arrays of evaluator keys and card masks of the same shape, \
+        built up with CARD_KEYS and CARD_MASKS as for \
+        evaluator.evaluate_state (keys starting at KEY_OFFSET), each for 5 \
+        to 7 cards.
+    Outputs: An int16 array of ranks of the same shape.
+
+    Like evaluate_state this lets callers share partial sums, e.g. of a \
+    board and hole cards, between many hands that add different cards.
+    """
+
+    keys = np.asarray(keys, dtype = np.int64)
+    masks = np.asarray(masks, dtype = np.int64)
+    suit_bits = (keys >> evaluator.SUIT_SHIFT) & 0x8888
+    ranks = _RANK_VALUES[np.searchsorted(_RANK_KEYS, keys & evaluator.RANK_KEY_MASK)]
+
+    flush = suit_bits != 0
+    if flush.any():
+        shifts = 16 * _FLUSH_SUIT[suit_bits[flush]].astype(np.int64)
+        ranks[flush] = FLUSH_TABLE[(masks[flush] >> shifts) & 0x1FFF]
+    return ranks
+
+def hands_to_array(hands):
+
+    """
+    Inputs: A list of hands, each a list of the same number of Card objects.
+    Outputs: An int8 array of shape (N, k) with the card indices.
+    """
+
+    return np.array([[card.index for card in hand] for hand in hands], dtype = np.int8)
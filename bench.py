@@ -0,0 +1,310 @@
+"""
+Benchmarks for the evaluator, the decks and the betting loop.
+
+Run it as
+
+    python bench.py [--out results.json] [--baseline baseline.json]
+                    [--save-baseline] [--threshold 0.1] [--full] [case ...]
+
+or as the bench command of the CLI (see __main__.py).
+
+Every case reports how many operations per second it managed (best of a \
+few repeats). Results are written as JSON and, if there is a baseline \
+file, compared against it; any case that got slower by more than the \
+threshold is flagged and the exit code is 1. The baseline is whatever an \
+earlier run saved with --save-baseline on the same machine.
+
+The 7-card enumeration only walks the 2,118,760 hands holding the two \
+lowest cards by default; --full walks all 133,784,560 and checks the \
+number of hands in every category. engine_startup starts fresh \
+interpreters that import the engine, so a module that begins importing \
+something heavy at load time shows up as a regression too.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+from Deck import Deck, PermutationDeck
+from eval_funcs import evaluate_holdem, flush_check, quad_trips_pairs_check, straight_check
+import evaluator
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE_FILE = os.path.join(HERE, "bench_baseline.json")
+
+#What a worker process imports to deal, play and evaluate hands
+ENGINE_MODULES = ["Game", "Deck", "evaluator", "eval_funcs", "bots"]
+
+#Number of 7-card hands in each category, from high card to straight flush
+SEVEN_CARD_COUNTS = [23294460, 58627800, 31433400, 6461620, 6180020,
+                     4047644, 3473184, 224848, 41584]
+
+CASES = {}
+
+
+def case(name):
+
+    """
+    Registers a benchmark. The function takes no arguments, does the work \
+    and returns how many operations it did.
+    """
+
+    def register(func):
+        CASES[name] = func
+        return func
+    return register
+
+def _random_hands(num, size = 7, seed = 0):
+
+    """
+    Returns num random hands of Cards, each sorted in descending order.
+    """
+
+    rng = random.Random(seed)
+    cards = list(Deck())
+    return [sorted(rng.sample(cards, size), reverse = True) for _ in range(num)]
+
+HANDS = _random_hands(20_000)
+HAND_INDICES = [[card.index for card in hand] for hand in HANDS]
+
+
+@case("straight_check")
+def bench_straight_check():
+    for hand in HANDS:
+        straight_check(hand)
+    return len(HANDS)
+
+@case("flush_check")
+def bench_flush_check():
+    for hand in HANDS:
+        flush_check(hand)
+    return len(HANDS)
+
+@case("quad_trips_pairs_check")
+def bench_quad_trips_pairs_check():
+    for hand in HANDS:
+        quad_trips_pairs_check(hand)
+    return len(HANDS)
+
+@case("evaluate_holdem")
+def bench_evaluate_holdem():
+    for hand in HANDS:
+        evaluate_holdem(hand)
+    return len(HANDS)
+
+@case("evaluator.evaluate")
+def bench_evaluate():
+    evaluate = evaluator.evaluate
+    for hand in HAND_INDICES:
+        evaluate(hand)
+    return len(HAND_INDICES)
+
+def enumerate_seven_card_hands(fixed = 2):
+
+    """
+    Evaluates every 7-card hand that holds the cards 0 to fixed-1, \
+    building up the evaluator state one card at a time.
+    Outputs: The number of hands in every category, high card first.
+    """
+
+    #The tables are bound to locals for the whole walk, so they have to be
+    #the real ones and not the stand-ins evaluator starts with
+    evaluator.preload()
+    card_keys = evaluator.CARD_KEYS
+    card_masks = evaluator.CARD_MASKS
+    rank_table = evaluator.RANK_TABLE
+    flush_table = evaluator.FLUSH_TABLE
+    flush_shift = evaluator.FLUSH_SUIT_SHIFT
+    flush_bits = evaluator.FLUSH_BITS
+    rank_key_mask = evaluator.RANK_KEY_MASK
+    counts = [0] * 7463
+
+    def walk(start, left, key, mask):
+        if left > 1:
+            for card in range(start, 53 - left):
+                walk(card + 1, left - 1, key + card_keys[card], mask | card_masks[card])
+            return
+        for card in range(start, 52):
+            full_key = key + card_keys[card]
+            flush = full_key & flush_bits
+            if flush:
+                counts[flush_table[(mask | card_masks[card]) >> flush_shift[flush] & 0x1FFF]] += 1
+            else:
+                counts[rank_table[full_key & rank_key_mask]] += 1
+
+    key = evaluator.KEY_OFFSET + sum(card_keys[card] for card in range(fixed))
+    mask = sum(card_masks[card] for card in range(fixed))
+    walk(fixed, 7 - fixed, key, mask)
+
+    starts = evaluator.CATEGORY_STARTS
+    return [sum(counts[starts[cat]:starts[cat + 1] if cat < 9 else 7463]) for cat in range(1, 10)]
+
+@case("seven_card_enumeration")
+def bench_seven_card_enumeration():
+    return sum(enumerate_seven_card_hands())
+
+def bench_full_enumeration():
+    counts = enumerate_seven_card_hands(fixed = 0)
+    if counts != SEVEN_CARD_COUNTS:
+        raise AssertionError(f"Category counts are off: {counts} instead of {SEVEN_CARD_COUNTS}.")
+    return sum(counts)
+
+@case("Deck.shuffle_draw")
+def bench_deck():
+    deck = Deck()
+    for _ in range(2_000):
+        deck.shuffle()
+        drawn = deck.draw(17)
+        deck += drawn
+    return 2_000
+
+@case("PermutationDeck.shuffle_draw")
+def bench_permutation_deck():
+    deck = PermutationDeck(seed = 0)
+    for _ in range(20_000):
+        deck.reset()
+        deck.draw(17)
+    return 20_000
+
+@case("equity.river")
+def bench_equity_river():
+    from equity import equity
+    #A full board leaves nothing to deal, which once made every trial fail
+    result = equity(["AhKh", "QsQd"], board = "2c3c4c5d9s", trials = 20_000, workers = 1, seed = 0)
+    if result.equity != [1.0, 0.0]:
+        raise AssertionError(f"AhKh should win every river runout, got {result.equity}.")
+    return result.trials
+
+@case("headless_hands")
+def bench_headless_hands():
+    from bots import RandomBot
+    from Game import Game
+    game = Game(6, headless = True, decision_provider = RandomBot(seed = 0), seed = 0, chips = 10**9)
+    return game.run(5_000)
+
+@case("vector_hands")
+def bench_vector_hands():
+    from vector_game import VectorGame, random_actions
+    game = VectorGame(4096, 6, chips = 10**9, seed = 0)
+    while game.hands_played.sum() < 50_000:
+        game.step(*random_actions(game))
+    return int(game.hands_played.sum())
+
+def startup_time(args = None, repeats = 5):
+
+    """
+    Returns the best wall time in seconds, out of repeats, of a fresh \
+    interpreter running with args (default: importing ENGINE_MODULES) in \
+    this directory.
+    """
+
+    if args is None:
+        args = ["-c", f"import {', '.join(ENGINE_MODULES)}"]
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *args], cwd = HERE, check = True, stdout = subprocess.DEVNULL)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+@case("engine_startup")
+def bench_engine_startup():
+    for _ in range(10):
+        subprocess.run([sys.executable, "-c", f"import {', '.join(ENGINE_MODULES)}"], cwd = HERE, check = True)
+    return 10
+
+
+def run_case(func, repeats = 3):
+
+    """
+    Runs a benchmark repeats times.
+    Outputs: A dict with the best time, the number of operations and the \
+        operations per second.
+    """
+
+    #Loading the evaluator tables is not part of any case, and which case
+    #happens to run first must not change the results
+    evaluator.preload()
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        ops = func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return {"seconds": best, "ops": ops, "ops_per_sec": ops / best}
+
+def compare(results, baseline, threshold):
+
+    """
+    Outputs: The names of the cases whose ops_per_sec dropped by more than \
+        threshold (a fraction) compared to the baseline.
+    """
+
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before and result["ops_per_sec"] < before["ops_per_sec"] * (1 - threshold):
+            regressions.append(name)
+    return regressions
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Run the benchmarks.")
+    parser.add_argument("cases", nargs = "*", help = "cases to run (default: all)")
+    parser.add_argument("--out", help = "write the results to this JSON file")
+    parser.add_argument("--baseline", default = BASELINE_FILE, help = "baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action = "store_true", help = "store the results as the new baseline")
+    parser.add_argument("--threshold", type = float, default = 0.1,
+                        help = "slowdown that counts as a regression (default 0.1 = 10%%)")
+    parser.add_argument("--repeats", type = int, default = 3)
+    parser.add_argument("--full", action = "store_true", help = "also enumerate all 133,784,560 7-card hands")
+    args = parser.parse_args(argv)
+
+    cases = dict(CASES)
+    if args.full:
+        cases["seven_card_enumeration_full"] = bench_full_enumeration
+    names = args.cases or list(cases)
+    unknown = [name for name in names if name not in cases]
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(unknown)}")
+
+    results = {}
+    for name in names:
+        repeats = 1 if name == "seven_card_enumeration_full" else args.repeats
+        results[name] = run_case(cases[name], repeats)
+        print(f"{name:32} {results[name]['ops_per_sec']:>14,.0f} /s")
+
+    report = {"python": sys.version.split()[0],
+              "platform": platform.platform(),
+              "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "results": results}
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent = 2)
+
+    regressions = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for name in regressions:
+            print(f"REGRESSION: {name} went from {baseline[name]['ops_per_sec']:,.0f} "
+                  f"to {results[name]['ops_per_sec']:,.0f} ops/s")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent = 2)
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+
+    sys.exit(main())
@@ -0,0 +1,46 @@
+"""
+Simple decision providers for headless games. Each one is called with the \
+player and the game and returns a decision like Player.get_decision.
+"""
+
+import random
+
+
+def check_call(player, game):
+
+    """
+    Never folds, never raises.
+    """
+
+    return ("c", 0)
+
+def check_fold(player, game):
+
+    """
+    Checks when it can, folds otherwise.
+    """
+
+    return ("c", 0) if max(game.bets) == player.bet else ("f", 0)
+
+class RandomBot:
+
+    def __init__(self, fold = 0.2, raise_ = 0.1, seed = None):
+
+        """
+        Folds (when facing a bet) and raises with the given probabilities \
+        and calls otherwise. Raises go to between 2 and 4 times the current \
+        bet. Pass a seed to make its decisions reproducible.
+        """
+
+        self.fold = fold
+        self.raise_ = raise_
+        self.rng = random.Random(seed)
+
+    def __call__(self, player, game):
+        roll = self.rng.random()
+        highest_bet = max(game.bets)
+        if roll < self.fold and highest_bet > player.bet:
+            return ("f", 0)
+        if roll > 1 - self.raise_:
+            return ("r", max(highest_bet, game.blinds[1]) * self.rng.randint(2, 4))
+        return ("c", 0)
@@ -0,0 +1,594 @@
+"""
+Hold'em equity calculations.
+
+equity() estimates how often each of a number of hands wins or ties given \
+an optional partial board and dead cards, by dealing random runouts in \
+batches spread over a process pool. exact_equity() (or equity(exact = True)) \
+walks every runout instead, which is the better choice from the flop on.
+"""
+
+from functools import lru_cache
+import hashlib
+import math
+import multiprocessing
+import os
+import random
+import time
+
+from Card import Card, to_cards
+from Deck import Deck, PermutationDeck
+import evaluator
+from evaluator import FLUSH_BITS, RANK_KEY_MASK, SUIT_SHIFT
+
+#z value of a two sided 95% confidence interval
+Z_95 = 1.959963984540054
+
+
+class EquityResult:
+
+    def __init__(self, hands, trials, wins, ties, shares, shares_sq, exact = False):
+
+        """
+        Holds the outcome of an equity calculation. For every hand there is \
+        the share of trials it won outright (win), the share it tied (tie) \
+        and its equity, i.e. won pots plus split pots divided by the number \
+        of winners. stderr and ci95 are the standard error of the equity \
+        and its 95% confidence interval; both are 0 for exact results.
+        """
+
+        self.hands = hands
+        self.trials = trials
+        self.exact = exact
+        self.win = [w / trials for w in wins]
+        self.tie = [t / trials for t in ties]
+        self.equity = [s / trials for s in shares]
+
+        self.stderr = []
+        for share, share_sq in zip(shares, shares_sq):
+            mean = share / trials
+            if exact or trials < 2:
+                self.stderr.append(0.0)
+            else:
+                variance = max(share_sq / trials - mean * mean, 0.0) * trials / (trials - 1)
+                self.stderr.append(math.sqrt(variance / trials))
+
+        self.ci95 = [(max(eq - Z_95*se, 0.0), min(eq + Z_95*se, 1.0))
+                     for eq, se in zip(self.equity, self.stderr)]
+
+    def __repr__(self):
+        lines = [f"{'Exact' if self.exact else 'Estimated'} equity over {self.trials} runouts:"]
+        for hand, eq, win, tie, se in zip(self.hands, self.equity, self.win, self.tie, self.stderr):
+            lines.append(f"{hand}: {eq:.2%} (win {win:.2%}, tie {tie:.2%}, +-{Z_95*se:.2%})")
+        return "\n".join(lines)
+
+    def as_dict(self):
+        return {"trials": self.trials,
+                "exact": self.exact,
+                "players": [{"hand": repr(hand), "win": win, "tie": tie, "equity": eq,
+                             "stderr": se, "ci95": ci}
+                            for hand, win, tie, eq, se, ci in zip(self.hands, self.win, self.tie,
+                                                                  self.equity, self.stderr, self.ci95)]}
+
+
+def check_spot(hands, board, dead):
+
+    """
+    Normalizes the inputs of an equity calculation and checks they make sense.
+    Outputs: The hands, the board, and the card indices that are still \
+        in the deck.
+    """
+
+    hands = [to_cards(hand) for hand in hands]
+    board = to_cards(board)
+    dead = to_cards(dead)
+
+    if len(hands) < 2:
+        raise ValueError("Equity needs at least two hands.")
+    for hand in hands:
+        if len(hand) != 2:
+            raise ValueError(f"Every hand needs exactly 2 cards, got {hand}.")
+    if len(board) > 5:
+        raise ValueError(f"A board has at most 5 cards, got {board}.")
+
+    known = [card for hand in hands for card in hand] + board + dead
+    if len(set(known)) != len(known):
+        raise ValueError(f"The same card was given twice: {known}.")
+
+    used = set(known)
+    remaining = sorted(card.index for card in Deck() if card not in used)
+    return hands, board, remaining
+
+def stream_seed(seed, stream):
+
+    """
+    Derives the seed of RNG stream number stream from a base seed. Streams \
+    are independent of each other and of how they are spread over workers.
+    """
+
+    digest = hashlib.sha256(f"{seed}:{stream}".encode()).digest()
+    return int.from_bytes(digest, "little")
+
+def _partial_states(hands, board):
+
+    """
+    Returns the evaluator key and mask of every hand combined with the board.
+    """
+
+    board_key = sum(evaluator.CARD_KEYS[card.index] for card in board)
+    board_mask = sum(card.mask for card in board)
+    return [(evaluator.KEY_OFFSET + board_key + sum(evaluator.CARD_KEYS[card.index] for card in hand),
+             board_mask | hand[0].mask | hand[1].mask) for hand in hands]
+
+def _run_batch(args):
+
+    """
+    Deals trials random runouts and tallies the results. Runs in a worker.
+    Outputs: Lists of wins, ties, equity shares and squared shares per hand.
+    """
+
+    states, remaining, to_deal, trials, seed = args
+    deck = PermutationDeck(remaining, seed = seed)
+    reset = deck.reset
+    draw = deck.draw
+    card_keys = evaluator.CARD_KEYS
+    card_masks = evaluator.CARD_MASKS
+    evaluate_state = evaluator.evaluate_state
+
+    players = len(states)
+    wins = [0] * players
+    ties = [0] * players
+    shares = [0.0] * players
+    shares_sq = [0.0] * players
+
+    for _ in range(trials):
+        runout_key = 0
+        runout_mask = 0
+        #On a full board there is nothing left to deal
+        if to_deal:
+            reset()
+            for card in draw(to_deal):
+                runout_key += card_keys[card]
+                runout_mask |= card_masks[card]
+
+        best = -1
+        winners = []
+        for i, (key, mask) in enumerate(states):
+            rank = evaluate_state(key + runout_key, mask | runout_mask)
+            if rank > best:
+                best = rank
+                winners = [i]
+            elif rank == best:
+                winners.append(i)
+
+        if len(winners) == 1:
+            wins[winners[0]] += 1
+            shares[winners[0]] += 1.0
+            shares_sq[winners[0]] += 1.0
+        else:
+            share = 1.0 / len(winners)
+            for i in winners:
+                ties[i] += 1
+                shares[i] += share
+                shares_sq[i] += share * share
+
+    return wins, ties, shares, shares_sq
+
+def equity(hands, board = (), dead = (),
+           trials = 1_000_000,
+           target_stderr = None,
+           time_budget = None,
+           workers = None,
+           seed = None,
+           batch_size = 10_000,
+           exact = False):
+
+    """
+    Inputs: hands is a list of hands (each a list of 2 Cards or a string \
+        like "AhKd"), board and dead are the known community cards and \
+        cards that cannot come anymore.
+        trials is the most runouts to deal. The calculation stops earlier \
+        once every hand's standard error is at most target_stderr, or once \
+        time_budget seconds have passed.
+        workers is the number of processes (default: one per core), seed \
+        makes the result reproducible regardless of the number of workers.
+        If exact is True, every runout is enumerated instead (see \
+        exact_equity) and the sampling arguments are ignored.
+    Outputs: An EquityResult.
+    """
+
+    if exact:
+        return exact_equity(hands, board, dead)
+    if trials < 1:
+        raise ValueError(f"Equity needs at least one trial, got {trials}.")
+
+    hands, board, remaining = check_spot(hands, board, dead)
+    to_deal = 5 - len(board)
+    states = _partial_states(hands, board)
+
+    if seed is None:
+        seed = random.randrange(1 << 64)
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    batches = []
+    for stream, start in enumerate(range(0, trials, batch_size)):
+        batches.append((states, remaining, to_deal, min(batch_size, trials - start),
+                        stream_seed(seed, stream)))
+
+    players = len(hands)
+    wins, ties = [0] * players, [0] * players
+    shares, shares_sq = [0.0] * players, [0.0] * players
+    done = 0
+    start_time = time.perf_counter()
+
+    def add(result):
+        for total, part in zip((wins, ties, shares, shares_sq), result):
+            for i in range(players):
+                total[i] += part[i]
+
+    def finished():
+        if time_budget is not None and time.perf_counter() - start_time >= time_budget:
+            return True
+        if target_stderr is not None and done >= 2*batch_size:
+            partial = EquityResult(hands, done, wins, ties, shares, shares_sq)
+            return max(partial.stderr) <= target_stderr
+        return False
+
+    if workers == 1 or len(batches) == 1:
+        for batch in batches:
+            add(_run_batch(batch))
+            done += batch[3]
+            if finished():
+                break
+    else:
+        #Results come back in batch order, so the same seed always adds \
+        #up the same batches no matter how many workers ran them. Forked
+        #workers share the tables if they are loaded first
+        evaluator.preload()
+        with multiprocessing.Pool(workers) as pool:
+            for batch, result in zip(batches, pool.imap(_run_batch, batches)):
+                add(result)
+                done += batch[3]
+                if finished():
+                    break
+
+    return EquityResult(hands, done, wins, ties, shares, shares_sq)
+
+
+#All 24 permutations of the 4 suits, identity first
+SUIT_PERMUTATIONS = [(a, b, c, d) for a in range(4) for b in range(4) for c in range(4) for d in range(4)
+                     if len({a, b, c, d}) == 4]
+
+def _permute_suit_set(perm, suit_set):
+    return sum(1 << perm[s] for s in range(4) if suit_set >> s & 1)
+
+#Sets of suits of the same size ordered like their sorted tuples of suits
+_SUIT_SET_ORDER = [tuple(s for s in range(4) if suit_set >> s & 1) for suit_set in range(16)]
+
+
+def suit_symmetries(hands, board, dead):
+
+    """
+    Returns the suit permutations that map every hand, the board and the \
+    dead cards onto themselves, identity first. Runouts that one of these \
+    permutations turns into each other have the same result.
+    """
+
+    fixed = [hand for hand in hands] + [board, dead]
+    symmetries = []
+    for perm in SUIT_PERMUTATIONS:
+        if all(set(Card(card.value, "hdsc"[perm[card.index & 3]]) for card in cards) == set(cards)
+               for cards in fixed):
+            symmetries.append(perm)
+    return symmetries
+
+#For the 4 suit nibbles of an evaluator key, the suits that already have \
+#4 or more cards, so one more card of them can make a flush
+_NEAR_FLUSH = [sum(1 << s for s in range(4) if nibbles >> 4*s & 0xF >= 7)
+               for nibbles in range(1 << 16)]
+
+#Boards evaluated at once by _whole_board_outcomes
+_PREFLOP_CHUNK = 1 << 18
+
+class _Enumeration:
+
+    def __init__(self, states, remaining, to_deal, symmetries):
+
+        """
+        Walks every runout of to_deal cards from remaining once, or only \
+        one runout of every suit isomorphic class weighted by the size of \
+        the class if there are symmetries.
+
+        The evaluator key and mask of the runout are built up one card at \
+        a time and shared by all players, who only add them to their own \
+        hole card state at the end. On the last card, cards of the same \
+        rank that cannot complete a flush give the same result, so they \
+        are evaluated once together.
+        """
+
+        self.players = [(1 << i, key, mask) for i, (key, mask) in enumerate(states)]
+        self.remaining = remaining
+        self.to_deal = to_deal
+        self.group_size = len(symmetries)
+
+        #For every permutation, where each set of suits goes
+        self.set_images = [[_permute_suit_set(perm, suit_set) for suit_set in range(16)]
+                           for perm in symmetries]
+
+        #For the last card, the cards from every position on grouped by \
+        #rank as [card, count], for when none of them can make a flush
+        self.rank_groups = []
+        for start in range(len(remaining) + 1):
+            groups = []
+            for card in remaining[start:]:
+                if groups and groups[-1][0] >> 2 == card >> 2:
+                    groups[-1][1] += 1
+                else:
+                    groups.append([card, 1])
+            self.rank_groups.append(groups)
+
+        #How many runouts (weighted) ended with which players sharing the pot, \
+        #keyed by a bitmask of the winners
+        self.outcomes = {}
+
+    def run(self):
+        if self.to_deal == 0:
+            self._add(self._winners(0, 0), 1)
+        elif self.group_size > 1:
+            self._walk_symmetric(0, self.to_deal, 0, 0, tuple(range(1, self.group_size)), -1, 0)
+        else:
+            self._walk(0, self.to_deal, 0, 0, 1)
+        return self
+
+    def totals(self):
+        return _totals(len(self.players), self.outcomes)
+
+    def _add(self, winner_bits, weight):
+        self.outcomes[winner_bits] = self.outcomes.get(winner_bits, 0) + weight
+
+    def _winners(self, key, mask):
+
+        """
+        Returns the bitmask of the players with the best hand once the \
+        runout with the given key and mask is added.
+        """
+
+        rank_table = evaluator.RANK_TABLE
+        flush_table = evaluator.FLUSH_TABLE
+        flush_shift = evaluator.FLUSH_SUIT_SHIFT
+
+        best = -1
+        winner_bits = 0
+        for bit, player_key, player_mask in self.players:
+            full_key = player_key + key
+            flush = full_key & FLUSH_BITS
+            if flush:
+                rank = flush_table[(player_mask | mask) >> flush_shift[flush] & 0x1FFF]
+            else:
+                rank = rank_table[full_key & RANK_KEY_MASK]
+            if rank > best:
+                best = rank
+                winner_bits = bit
+            elif rank == best:
+                winner_bits |= bit
+        return winner_bits
+
+    def _compare_group(self, others, suit_set):
+
+        """
+        Compares a finished rank group of the runout with its images under \
+        the permutations in others.
+        Outputs: None if some permutation makes the runout smaller (so it is \
+            not the representative of its class), otherwise the permutations \
+            that leave the group unchanged.
+        """
+
+        own = _SUIT_SET_ORDER[suit_set]
+        tied = []
+        for g in others:
+            image = _SUIT_SET_ORDER[self.set_images[g][suit_set]]
+            if image < own:
+                return None
+            if image == own:
+                tied.append(g)
+        return tuple(tied)
+
+    def _walk_symmetric(self, start, left, key, mask, others, group_rank, group_suits):
+
+        """
+        Like _walk, but only goes into runouts that are the smallest of \
+        their class. others are the non-identity permutations that map \
+        every finished rank group so far onto itself.
+        """
+
+        remaining = self.remaining
+        card_keys = evaluator.CARD_KEYS
+        card_masks = evaluator.CARD_MASKS
+
+        #Cards of a new rank finish the current group, which is the same \
+        #for every such card, so compare it only once
+        finished = self._compare_group(others, group_suits) if group_rank >= 0 else others
+
+        for i in range(start, len(remaining) - left + 1):
+            card = remaining[i]
+            rank, suit = card >> 2, card & 3
+            if rank == group_rank:
+                still_tied, suits = others, group_suits | 1 << suit
+            elif finished is None:
+                #Every later card has a new rank too
+                break
+            else:
+                still_tied, suits = finished, 1 << suit
+
+            new_key = key + card_keys[card]
+            new_mask = mask | card_masks[card]
+
+            if left == 1:
+                if finished == () and rank != group_rank:
+                    #The rest have new ranks and there is nothing left to compare
+                    self._last_card(i, key, mask, self.group_size)
+                    break
+                tied = self._compare_group(still_tied, suits)
+                if tied is not None:
+                    self._add(self._winners(new_key, new_mask), self.group_size // (len(tied) + 1))
+            elif not still_tied:
+                #Nothing maps the runout onto itself anymore, so every \
+                #completion is the smallest of a class of full size
+                self._walk(i + 1, left - 1, new_key, new_mask, self.group_size)
+            else:
+                self._walk_symmetric(i + 1, left - 1, new_key, new_mask, still_tied, rank, suits)
+
+    def _walk(self, start, left, key, mask, weight):
+        remaining = self.remaining
+        card_keys = evaluator.CARD_KEYS
+        card_masks = evaluator.CARD_MASKS
+
+        if left > 1:
+            for i in range(start, len(remaining) - left + 1):
+                card = remaining[i]
+                self._walk(i + 1, left - 1, key + card_keys[card], mask | card_masks[card], weight)
+        else:
+            self._last_card(start, key, mask, weight)
+
+    def _last_card(self, start, key, mask, weight):
+
+        """
+        Adds the results of completing the runout with each of the \
+        remaining cards from position start on.
+        """
+
+        players = self.players
+        near_flush = 0
+        for _, player_key, _ in players:
+            near_flush |= _NEAR_FLUSH[(player_key + key) >> SUIT_SHIFT & 0xFFFF]
+
+        #Cards of the same rank that cannot make a flush give the same result
+        if not near_flush:
+            todo = self.rank_groups[start]
+        else:
+            todo = []
+            group_rank = -1
+            for card in self.remaining[start:]:
+                if near_flush >> (card & 3) & 1:
+                    todo.append([card, 1])
+                elif card >> 2 == group_rank:
+                    group[1] += 1
+                else:
+                    group_rank = card >> 2
+                    group = [card, 1]
+                    todo.append(group)
+
+        #Same as _winners, written out since this is the hot loop
+        card_keys = evaluator.CARD_KEYS
+        card_masks = evaluator.CARD_MASKS
+        rank_table = evaluator.RANK_TABLE
+        flush_table = evaluator.FLUSH_TABLE
+        flush_shift = evaluator.FLUSH_SUIT_SHIFT
+        outcomes = self.outcomes
+        for card, count in todo:
+            runout_key = key + card_keys[card]
+            runout_mask = mask | card_masks[card]
+            best = -1
+            winner_bits = 0
+            for bit, player_key, player_mask in players:
+                full_key = player_key + runout_key
+                flush = full_key & FLUSH_BITS
+                if flush:
+                    rank = flush_table[(player_mask | runout_mask) >> flush_shift[flush] & 0x1FFF]
+                else:
+                    rank = rank_table[full_key & RANK_KEY_MASK]
+                if rank > best:
+                    best = rank
+                    winner_bits = bit
+                elif rank == best:
+                    winner_bits |= bit
+            outcomes[winner_bits] = outcomes.get(winner_bits, 0) + weight * count
+
+def _totals(players, outcomes):
+
+    """
+    Inputs: The number of players and how many runouts ended with which \
+        players sharing the pot, keyed by a bitmask of the winners.
+    Outputs: The number of runouts and lists of wins, ties, equity \
+        shares and squared shares per player.
+    """
+
+    wins, ties = [0] * players, [0] * players
+    shares, shares_sq = [0.0] * players, [0.0] * players
+    for winner_bits, weight in outcomes.items():
+        winners = [i for i in range(players) if winner_bits >> i & 1]
+        share = 1.0 / len(winners)
+        for i in winners:
+            if len(winners) == 1:
+                wins[i] += weight
+            else:
+                ties[i] += weight
+            shares[i] += weight * share
+            shares_sq[i] += weight * share * share
+    return sum(outcomes.values()), wins, ties, shares, shares_sq
+
+@lru_cache(maxsize = None)
+def _combinations(n, k):
+
+    """
+    Returns an int8 array with every set of k positions out of n as a row, \
+    in lexicographic order, built one column at a time.
+    """
+
+    import numpy as np
+
+    combos = np.arange(n)[:, None]
+    for _ in range(k - 1):
+        last = combos[:, -1]
+        #Every row is followed by each position after its last one
+        counts = n - 1 - last
+        rows = np.repeat(np.arange(len(combos)), counts)
+        starts = np.repeat(np.cumsum(counts) - counts, counts)
+        following = np.arange(len(rows)) - starts + np.repeat(last + 1, counts)
+        combos = np.concatenate([combos[rows], following[:, None]], axis = 1)
+    return combos.astype(np.int8)
+
+def _whole_board_outcomes(states, remaining):
+
+    """
+    Evaluates every five card board for every player at once with NumPy \
+    (see batch_eval.evaluate_states), _PREFLOP_CHUNK boards at a time.
+    Outputs: How many boards ended with which players sharing the pot, \
+        keyed by a bitmask of the winners.
+    """
+
+    import numpy as np
+    from batch_eval import CARD_KEYS, CARD_MASKS, evaluate_states
+
+    combos = _combinations(len(remaining), 5)
+    remaining = np.array(remaining, dtype = np.int64)
+    bits = np.arange(len(states))[:, None]
+    counts = np.zeros(1 << len(states), dtype = np.int64)
+    for start in range(0, len(combos), _PREFLOP_CHUNK):
+        cards = remaining[combos[start:start + _PREFLOP_CHUNK]]
+        keys = CARD_KEYS[cards].sum(axis = 1)
+        masks = np.bitwise_or.reduce(CARD_MASKS[cards], axis = 1)
+        ranks = np.stack([evaluate_states(keys + key, masks | mask) for key, mask in states])
+        winner_bits = ((ranks == ranks.max(axis = 0)) << bits).sum(axis = 0)
+        counts += np.bincount(winner_bits, minlength = len(counts))
+    return {winner_bits: count for winner_bits, count in enumerate(counts.tolist()) if count}
+
+def exact_equity(hands, board = (), dead = (), use_symmetries = True):
+
+    """
+    Inputs: The same hands, board and dead cards as equity.
+    Outputs: An EquityResult over every possible runout.
+
+    Runouts that only differ by swapping suits no hand, board or dead \
+    card tells apart are only evaluated once, unless use_symmetries is False. \
+    Preflop all boards are evaluated together as NumPy arrays instead.
+    """
+
+    hands, board, remaining = check_spot(hands, board, dead)
+    if not board:
+        #Preflop every board is dealt, which NumPy does far faster than the walk
+        outcomes = _whole_board_outcomes(_partial_states(hands, board), remaining)
+        return EquityResult(hands, *_totals(len(hands), outcomes), exact = True)
+    symmetries = suit_symmetries(hands, board, to_cards(dead)) if use_symmetries else [SUIT_PERMUTATIONS[0]]
+    walk = _Enumeration(_partial_states(hands, board), remaining, 5 - len(board), symmetries).run()
+    return EquityResult(hands, *walk.totals(), exact = True)
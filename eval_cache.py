@@ -0,0 +1,280 @@
+"""
+Memoization in front of the hand evaluators.
+
+LRUCache is a bounded, thread-safe mapping with hit, miss and eviction \
+counters. CachedEvaluator and CachedOmahaEvaluator put one in front of \
+evaluator.evaluate and the Omaha evaluator, keyed by the card bitmask.
+
+The rank of a hand does not change if its suits are renamed, so by \
+default keys are suit-normalized. Hold'em hands without five cards of a \
+suit are keyed by their rank counts alone, since suits cannot matter \
+there; the others by the card mask with its four 16 bit suit fields \
+sorted, which maps e.g. AhKhQh7h2h and AsKsQs7s2s to the same entry. For \
+Omaha the hole cards and the board are renamed together, since which \
+cards are in the hand matters.
+
+The cache is for evaluations slower than the lookup itself, e.g. Omaha \
+hands, where a hit is around six times faster than evaluating and a miss \
+costs the suit renaming and one insert on top. evaluator.evaluate is \
+little more than a table lookup already, about 1 us, which no lookup in \
+a locked Python mapping beats, so CachedEvaluator has no default \
+evaluator; it is meant for slower functions of the hand rank.
+"""
+
+import threading
+from collections import OrderedDict
+
+import evaluator
+from evaluator import CARD_KEYS, CARD_MASKS, FLUSH_BITS, KEY_OFFSET, RANK_KEY_MASK
+from omaha import OmahaBoard
+
+POLICIES = ("lru", "fifo")
+
+#Set in the keys hand_key makes for hands with a flush, above any rank key
+FLUSH_KEY = 1 << 64
+
+
+class LRUCache:
+
+    def __init__(self, capacity = 1 << 16, policy = "lru"):
+
+        """
+        A mapping holding at most capacity entries. Once full, adding an \
+        entry evicts the least recently used one (policy "lru") or the \
+        oldest one (policy "fifo", where lookups do not count as use and \
+        are a little cheaper). Every method takes a lock, so one cache can \
+        be shared by several threads.
+        """
+
+        if capacity < 1:
+            raise ValueError("The capacity has to be at least 1.")
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown eviction policy {policy!r}, use one of {POLICIES}.")
+        self.capacity = capacity
+        self.policy = policy
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._refresh = policy == "lru"
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __repr__(self):
+        return (f"{self.policy.upper()} cache with {len(self)}/{self.capacity} entries, "
+                f"{self.hits} hits, {self.misses} misses, {self.evictions} evictions")
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default = None):
+
+        """
+        Returns the value stored for key, or default (counted as a miss).
+        """
+
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            if self._refresh:
+                self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def get_or_compute(self, key, compute, *args):
+
+        """
+        Returns the value stored for key, or stores and returns \
+        compute(*args). compute runs outside the lock, so two threads \
+        missing the same key at once may both compute it.
+        """
+
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self.hits += 1
+                if self._refresh:
+                    self._data.move_to_end(key)
+                return value
+            self.misses += 1
+        value = compute(*args)
+        self.put(key, value)
+        return value
+
+    def put(self, key, value):
+        with self._lock:
+            data = self._data
+            if key in data:
+                data[key] = value
+                if self._refresh:
+                    data.move_to_end(key)
+                return
+            data[key] = value
+            if len(data) > self.capacity:
+                data.popitem(last = False)
+                self.evictions += 1
+
+    def clear(self):
+
+        """
+        Drops every entry. The counters are kept, see reset_stats.
+        """
+
+        with self._lock:
+            self._data.clear()
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+
+        """
+        Returns the size and the counters as a dict, plus the hit rate.
+        """
+
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"size": len(self._data), "capacity": self.capacity, "hits": self.hits,
+                    "misses": self.misses, "evictions": self.evictions,
+                    "hit_rate": self.hits / lookups if lookups else 0.0}
+
+
+def canonical_mask(mask):
+
+    """
+    Returns the card mask (see evaluator.CARD_MASKS) with its four suit \
+    fields sorted, the same for every suit renaming of the cards.
+    """
+
+    a, b, c, d = sorted((mask & 0xFFFF, mask >> 16 & 0xFFFF, mask >> 32 & 0xFFFF, mask >> 48))
+    return d << 48 | c << 32 | b << 16 | a
+
+def hand_key(cards):
+
+    """
+    Returns a key for a list of 5 to 7 card indices that is the same for \
+    all hands with the same rank: the rank counts if no suit has five \
+    cards, else the suit-normalized card mask (see canonical_mask).
+    """
+
+    key = KEY_OFFSET
+    for card in cards:
+        key += CARD_KEYS[card]
+    if not key & FLUSH_BITS:
+        return key & RANK_KEY_MASK
+    mask = 0
+    for card in cards:
+        mask |= CARD_MASKS[card]
+    return FLUSH_KEY | canonical_mask(mask)
+
+def canonical_pair(mask1, mask2):
+
+    """
+    Like canonical_mask for two sets of cards that have to be renamed \
+    together. Returns one int holding both.
+    """
+
+    #Each suit's two fields side by side in one 32 bit int, so sorting
+    #compares plain ints
+    a, b, c, d = sorted((mask1 << 16 & 0xFFFF0000 | mask2 & 0xFFFF,
+                         mask1 & 0xFFFF0000 | mask2 >> 16 & 0xFFFF,
+                         mask1 >> 16 & 0xFFFF0000 | mask2 >> 32 & 0xFFFF,
+                         mask1 >> 32 & 0xFFFF0000 | mask2 >> 48))
+    return d << 96 | c << 64 | b << 32 | a
+
+
+class CachedEvaluator:
+
+    def __init__(self, evaluate, capacity = 1 << 16, policy = "lru", normalize_suits = True):
+
+        """
+        Calls evaluate (taking a list of card indices) through an \
+        LRUCache. With normalize_suits the key is hand_key, which is only \
+        right for evaluators whose result depends on nothing but the ranks \
+        when there is no flush, and on the flush suit's ranks otherwise. \
+        That is true of hand ranks, but not e.g. of functions returning \
+        the cards. Without it the key is the card mask.
+
+        There is no default evaluate: evaluator.evaluate is faster than \
+        any lookup in the cache (see the module docstring). If it is \
+        passed anyway, a miss without a flush is answered straight from \
+        RANK_TABLE, since hand_key is then the table's key.
+        """
+
+        self.evaluate = evaluate
+        self.cache = LRUCache(capacity, policy)
+        self.normalize_suits = normalize_suits
+        self._ranks = normalize_suits and evaluate is evaluator.evaluate
+
+    def __repr__(self):
+        return f"Cached {self.evaluate.__name__}: {self.cache}"
+
+    def __call__(self, cards):
+
+        """
+        Inputs: A list of card indices.
+        Outputs: What evaluate returns for them.
+        """
+
+        if self.normalize_suits:
+            key = hand_key(cards)
+            if self._ranks and key < FLUSH_KEY:
+                return self.cache.get_or_compute(key, evaluator.RANK_TABLE.__getitem__, key)
+        else:
+            card_masks = evaluator.CARD_MASKS
+            key = 0
+            for card in cards:
+                key |= card_masks[card]
+        return self.cache.get_or_compute(key, self.evaluate, cards)
+
+    def stats(self):
+        return self.cache.stats()
+
+class CachedOmahaEvaluator:
+
+    def __init__(self, capacity = 1 << 16, policy = "lru", normalize_suits = True):
+
+        """
+        Ranks Omaha hands through an LRUCache of (hole cards, board) and \
+        keeps the OmahaBoard of the last board that missed, so ranking \
+        many hands on the same board only prepares it once.
+        """
+
+        self.cache = LRUCache(capacity, policy)
+        self.normalize_suits = normalize_suits
+        self._last_board = (None, None)
+
+    def __repr__(self):
+        return f"Cached Omaha evaluator: {self.cache}"
+
+    def __call__(self, hand, board):
+
+        """
+        Inputs: A list of hole card indices and a list of 3 to 5 board \
+            card indices.
+        Outputs: The rank of the best Omaha hand, see omaha.
+        """
+
+        card_masks = evaluator.CARD_MASKS
+        hand_mask = board_mask = 0
+        for card in hand:
+            hand_mask |= card_masks[card]
+        for card in board:
+            board_mask |= card_masks[card]
+        key = canonical_pair(board_mask, hand_mask) if self.normalize_suits else (board_mask, hand_mask)
+
+        return self.cache.get_or_compute(key, self._evaluate, hand, board, board_mask)
+
+    def _evaluate(self, hand, board, board_mask):
+        #One tuple, so another thread never sees a mask with the wrong board
+        last_mask, omaha_board = self._last_board
+        if last_mask != board_mask:
+            omaha_board = OmahaBoard(board)
+            self._last_board = (board_mask, omaha_board)
+        return omaha_board.evaluate(hand)
+
+    def stats(self):
+        return self.cache.stats()
@@ -1,6 +1,7 @@
-from Card import Card
 from collections import Counter
 
+import evaluator
+
 def _straight_check_raw(cards_list):
 
     """
@@ -17,13 +18,17 @@ def _straight_check_raw(cards_list):
     else:
         # Sort in descending order
         sorted_cards = cards_list.copy()
+        values = [card.value for card in sorted_cards]
 
-        # Add a 1 for every ace
-        for card in sorted_cards:
+        # Add every ace again at the end with the value 0, so it can
+        # also play low. Cards are immutable, so the low value only
+        # lives in values
+        for card in cards_list:
 
             # Vals go from 1 to 13, Aces have value 13
             if card.value == 13:
-                sorted_cards.append(Card(0, card.suit))
+                sorted_cards.append(card)
+                values.append(0)
 
             # Since the list is sorted in descending order,
             # we can stop when reaching the first non-Ace card
@@ -33,7 +38,7 @@ def _straight_check_raw(cards_list):
         n = len(sorted_cards)
         straight_counter = 1
         doubles = 0
-        for index, card in enumerate(sorted_cards):
+        for index, value in enumerate(values):
 
             # If we are too close to the end to make a straight and haven't
             # made a straight yet, return empty list
@@ -45,12 +50,12 @@ def _straight_check_raw(cards_list):
                 return sorted_cards[index-straight_counter-doubles+1:index+1]
 
             # Otherwise if the next card is just 1 below, increase straight_counter by 1
-            elif sorted_cards[index + 1].value == card.value-1:
+            elif values[index + 1] == value-1:
                 straight_counter += 1
 
             # If the next card has the same value, we don't want to reset
             # Take into account how many "double" cards we have to know where to slice
-            elif sorted_cards[index + 1].value == card.value:
+            elif values[index + 1] == value:
                 doubles += 1
 
             # If the next card is further than 1 away and we already have a straight,
@@ -74,19 +79,8 @@ def straight_check(card_list):
         is no straight, an empty list.
     """
 
-    straight = _straight_check_raw(card_list)
-    i = -1
-    # Check if we have a straight
-    while straight:
-
-        # If the straight ends with an ace, change the value back from
-        # the dummy value 0 to actual ace value of 13
-        if straight[i].value == 0:
-            straight[i].value = 13
-            i -= 1 #if we have multiple aces, we don't want to change just the last one
-        else:
-            break
-    return straight
+    # Low aces are the ace cards themselves, so there is nothing to undo
+    return _straight_check_raw(card_list)
 
 # allows us to check if any number of cards are all of the same suit
 def suited(card_list):
@@ -155,8 +149,10 @@ def straight_flush_check(straight, flush):
 
     target_suit = flush[0].suit
 
-    #filter out all wrong suits from the straight, then check if it's still a straight
-    return straight_check([card for card in straight if card.suit == target_suit])
+    #filter out all wrong suits from the straight, then check if it's still a straight.
+    #A wheel lists its ace last, where straight_check would not look for a
+    #low ace, so sort the cards again first
+    return straight_check(sorted((card for card in straight if card.suit == target_suit), reverse = True))
 
 def quad_trips_pairs_check(card_list):
 
@@ -171,7 +167,7 @@ def quad_trips_pairs_check(card_list):
 
     #card_list = sorted(card_list, reverse = True)
 
-    counting_vals = Counter([card.value for card in card_list])
+    counting_vals = Counter([card.value for card in card_list]).most_common()
     #at_least_pair = [val for val in counting_vals.most_common(3) if val[1] > 1]
 
 
@@ -189,7 +185,9 @@ def quad_trips_pairs_check(card_list):
     elif best == 4:
 
         quad_val = counting_vals[0][0]
-        kicker = counting_vals[1][0]
+        #The highest other card, which need not be the most common one
+        #(four 2s with two 3s and a 4 play the 4)
+        kicker = max(value for value, _ in counting_vals[1:])
 
         # This ensures if we have four Ks and two Aces, we always return \
         # the four Ks and leave out an Ace
@@ -227,10 +225,49 @@ def quad_trips_pairs_check(card_list):
 def evaluate_holdem(card_list):
 
     """
-    Inputs: A list of cards.
+    Inputs: A list of 5 to 7 cards.
     Outputs: The name of the best 5-card hand one can make, as well as a list \
         with the 5 cards.
 
+    Note: This is a wrapper around evaluator.evaluate. If you only need to \
+        compare hands, use evaluate_holdem_rank instead, which skips \
+        picking out the 5 cards.
+    """
+
+    by_index = {card.index: card for card in card_list}
+    rank, five = evaluator.best_five(list(by_index))
+    hand_value = evaluator.hand_name(rank)
+
+    counts = Counter(by_index[i].value for i in five)
+    hand = sorted((by_index[i] for i in five),
+                  key = lambda card: (counts[card.value], card.value), reverse = True)
+
+    # In a wheel the ace plays low, so it goes to the end
+    if hand_value in ("straight", "straight flush") and hand[0].value == 13 and hand[1].value == 4:
+        hand = hand[1:] + hand[:1]
+
+    return hand_value, hand
+
+def evaluate_holdem_rank(card_list):
+
+    """
+    Inputs: A list of 5 to 7 cards.
+    Outputs: The rank of the best 5-card hand as an integer. A larger rank \
+        means a better hand, equal ranks mean a split pot.
+    """
+
+    return evaluator.evaluate([card.index for card in card_list])
+
+def evaluate_holdem_reference(card_list):
+
+    """
+    Inputs: A list of cards.
+    Outputs: The name of the best 5-card hand one can make, as well as a list \
+        with the cards making it.
+
+    This is the original list based evaluator. It is much slower than \
+    evaluate_holdem and is only kept around to check the lookup tables against.
+
     Note: This function only works for Hold'em as it makes a key assumptions \
         which is true for 7 cards but not necessarily for 9: If you have \
         a flush, you cannot also have a full house or four of a kind.
@@ -0,0 +1,346 @@
+"""
+Lookup table hand evaluator.
+
+Cards are passed around as integer indices from 0 to 51, where \
+index = 4*rank + suit. Ranks go from 0 (a Two) to 12 (an Ace) and suits \
+follow the order of Deck.suits, i.e. hearts, diamonds, spades, clubs.
+
+Every set of 5, 6 or 7 cards is mapped to a single integer between 1 and \
+7462 where a larger value means a better hand, so showdowns are a plain \
+integer comparison.
+
+The tables are read from TABLE_FILE (or built and saved there) on the \
+first lookup, not on import, so modules that only need the constants, \
+or a game that has not dealt a hand yet, start up quickly. preload loads \
+them right away.
+"""
+
+import os
+from itertools import combinations
+
+#Bumped whenever the table layout changes so stale caches are rebuilt
+TABLE_VERSION = 1
+
+TABLE_DIR = os.environ.get("POKER_TABLE_DIR",
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), "tables"))
+TABLE_FILE = os.path.join(TABLE_DIR, f"eval_v{TABLE_VERSION}.pkl")
+
+RANK_CHARS = "23456789TJQKA"
+SUIT_CHARS = "hdsc"
+
+#Same names (and numbers) as Game.hand_strength
+HAND_NAMES = [None,
+              "high card",
+              "pair",
+              "two pair",
+              "three of a kind",
+              "straight",
+              "flush",
+              "full house",
+              "four of a kind",
+              "straight flush"]
+
+#Each card contributes 5**rank to the lower 32 bits of a key, so the sum of \
+#up to 7 cards (at most 4 of a rank) is a unique base 5 number of rank counts.
+#The upper bits hold one nibble per suit, starting at 3 so that the high bit \
+#of a nibble is set exactly when that suit has 5 or more cards.
+RANK_KEY_MASK = 0xFFFFFFFF
+SUIT_SHIFT = 32
+KEY_OFFSET = 0x3333 << SUIT_SHIFT
+FLUSH_BITS = 0x8888 << SUIT_SHIFT
+
+#The 64 bit card mask has one 16 bit field per suit
+FLUSH_SUIT_SHIFT = {0x8 << SUIT_SHIFT: 0,
+                    0x80 << SUIT_SHIFT: 16,
+                    0x800 << SUIT_SHIFT: 32,
+                    0x8000 << SUIT_SHIFT: 48}
+
+CARD_KEYS = [5**(i >> 2) + (1 << (SUIT_SHIFT + 4*(i & 3))) for i in range(52)]
+CARD_MASKS = [1 << (16*(i & 3) + (i >> 2)) for i in range(52)]
+
+#Rank masks of the ten straights, best first. The wheel is A2345.
+STRAIGHTS = [0b11111 << low for low in range(8, -1, -1)] + [0b1000000001111]
+
+
+def _straight_high(rank_mask):
+
+    """
+    Inputs: A 13 bit mask of ranks.
+    Outputs: The rank of the highest card of the best straight in the mask, \
+        or -1 if there is no straight. The wheel counts as Five high.
+    """
+
+    for i, straight in enumerate(STRAIGHTS):
+        if rank_mask & straight == straight:
+            return 12 - i
+    return -1
+
+def _top_ranks(rank_mask, num):
+
+    """
+    Returns the num highest ranks in the mask in descending order.
+    """
+
+    ranks = []
+    for rank in range(12, -1, -1):
+        if rank_mask >> rank & 1:
+            ranks.append(rank)
+            if len(ranks) == num:
+                break
+    return ranks
+
+def _flush_strength(rank_mask):
+
+    """
+    Inputs: A mask of the ranks of one suit (at least 5 of them).
+    Outputs: A tuple that sorts like the best flush or straight flush.
+    """
+
+    high = _straight_high(rank_mask)
+    if high >= 0:
+        return (9, high)
+    return (6, *_top_ranks(rank_mask, 5))
+
+def _rank_strength(counts):
+
+    """
+    Inputs: A list with how often each of the 13 ranks appears (5 to 7 cards).
+    Outputs: A tuple that sorts like the best non-flush hand.
+    """
+
+    quads = [r for r in range(12, -1, -1) if counts[r] == 4]
+    trips = [r for r in range(12, -1, -1) if counts[r] == 3]
+    pairs = [r for r in range(12, -1, -1) if counts[r] == 2]
+    rank_mask = sum(1 << r for r in range(13) if counts[r])
+
+    def kickers(used, num):
+        return _top_ranks(rank_mask & ~sum(1 << r for r in used), num)
+
+    if quads:
+        return (8, quads[0], *kickers(quads[:1], 1))
+    if trips and (len(trips) > 1 or pairs):
+        return (7, trips[0], max(trips[1:] + pairs))
+
+    high = _straight_high(rank_mask)
+    if high >= 0:
+        return (5, high)
+    if trips:
+        return (4, trips[0], *kickers(trips[:1], 2))
+    if len(pairs) > 1:
+        return (3, pairs[0], pairs[1], *kickers(pairs[:2], 1))
+    if pairs:
+        return (2, pairs[0], *kickers(pairs[:1], 3))
+    return (1, *_top_ranks(rank_mask, 5))
+
+def _rank_multisets(num, rank = 0):
+
+    """
+    Yields every list of 13 rank counts that adds up to num with at most 4 \
+    cards of each rank.
+    """
+
+    if rank == 12:
+        if num <= 4:
+            yield [num]
+        return
+    for count in range(min(num, 4) + 1):
+        for rest in _rank_multisets(num - count, rank + 1):
+            yield [count] + rest
+
+def build_tables():
+
+    """
+    Builds the evaluation tables from scratch.
+
+    Outputs: A pair (rank_table, flush_table). rank_table is a dict from the \
+        base 5 rank key of 5 to 7 cards to the hand rank ignoring flushes, \
+        flush_table is a list indexed by the rank mask of one suit.
+    """
+
+    rank_strengths = {}
+    for num in (5, 6, 7):
+        for counts in _rank_multisets(num):
+            key = sum(count * 5**rank for rank, count in enumerate(counts))
+            rank_strengths[key] = _rank_strength(counts)
+
+    flush_strengths = {mask: _flush_strength(mask)
+                       for mask in range(1 << 13) if bin(mask).count("1") >= 5}
+
+    #Every 6 or 7 card hand is as good as some 5 card hand, so the 5 card \
+    #strengths alone give us all 7462 classes in order
+    classes = set(flush_strengths[m] for m in flush_strengths if bin(m).count("1") == 5)
+    classes.update(rank_strengths[k] for k in rank_strengths if sum(_base5_digits(k)) == 5)
+    ordered = {strength: i + 1 for i, strength in enumerate(sorted(classes))}
+
+    rank_table = {key: ordered[s] for key, s in rank_strengths.items()}
+    flush_table = [0] * (1 << 13)
+    for mask, s in flush_strengths.items():
+        flush_table[mask] = ordered[s]
+    return rank_table, flush_table
+
+def _base5_digits(key):
+    digits = []
+    while key:
+        key, digit = divmod(key, 5)
+        digits.append(digit)
+    return digits
+
+def load_tables(path = TABLE_FILE):
+
+    """
+    Loads the evaluation tables from the cache file, building and saving \
+    them first if the file is missing or unreadable.
+    """
+
+    import pickle
+
+    try:
+        with open(path, "rb") as f:
+            version, rank_table, flush_table = pickle.load(f)
+        if version == TABLE_VERSION:
+            return rank_table, flush_table
+    except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+        pass
+
+    rank_table, flush_table = build_tables()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump((TABLE_VERSION, rank_table, flush_table), f,
+                        protocol = pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except OSError:
+        #A read-only install still works, it just rebuilds every time
+        pass
+    return rank_table, flush_table
+
+
+class _LazyTable:
+
+    """
+    Stands in for RANK_TABLE or FLUSH_TABLE until the first lookup, which \
+    loads both tables and puts them in place of the stand-ins. Functions \
+    look the tables up as globals on every call, so only that first \
+    lookup goes through here.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def _table(self):
+        preload()
+        return globals()[self.name]
+
+    def __getitem__(self, key):
+        return self._table()[key]
+
+    def __iter__(self):
+        return iter(self._table())
+
+    def __len__(self):
+        return len(self._table())
+
+    def __contains__(self, key):
+        return key in self._table()
+
+    def __getattr__(self, name):
+        return getattr(self._table(), name)
+
+RANK_TABLE = _LazyTable("RANK_TABLE")
+FLUSH_TABLE = _LazyTable("FLUSH_TABLE")
+
+def preload():
+
+    """
+    Loads the tables now if that has not happened yet, e.g. in a parent \
+    process before it forks workers, so they share the pages.
+    """
+
+    global RANK_TABLE, FLUSH_TABLE
+    if isinstance(RANK_TABLE, _LazyTable):
+        RANK_TABLE, FLUSH_TABLE = load_tables()
+
+#The lowest rank of each category, so category lookups are a short scan
+CATEGORY_STARTS = [None, 1, 1278, 4138, 4996, 5854, 5864, 7141, 7297, 7453]
+
+
+def evaluate(cards):
+
+    """
+    Inputs: A list or tuple of 5 to 7 card indices.
+    Outputs: The rank of the best 5-card hand, from 1 (7-5-4-3-2 offsuit) \
+        to 7462 (a royal flush).
+    """
+
+    key = KEY_OFFSET
+    for card in cards:
+        key += CARD_KEYS[card]
+
+    flush = key & FLUSH_BITS
+    if flush:
+        shift = FLUSH_SUIT_SHIFT[flush]
+        suit = shift >> 4
+        rank_mask = 0
+        for card in cards:
+            if card & 3 == suit:
+                rank_mask |= 1 << (card >> 2)
+        return FLUSH_TABLE[rank_mask]
+    return RANK_TABLE[key & RANK_KEY_MASK]
+
+def evaluate_state(key, mask):
+
+    """
+    Inputs: A key and a card mask built up with CARD_KEYS and CARD_MASKS \
+        (the key starting at KEY_OFFSET, the mask at 0).
+    Outputs: The hand rank, same as evaluate.
+
+    This lets callers that add cards one at a time keep their partial sums \
+    around instead of starting over from the full card list.
+    """
+
+    flush = key & FLUSH_BITS
+    if flush:
+        return FLUSH_TABLE[mask >> FLUSH_SUIT_SHIFT[flush] & 0x1FFF]
+    return RANK_TABLE[key & RANK_KEY_MASK]
+
+def category(rank):
+
+    """
+    Returns the category of a hand rank as a number from 1 (high card) to \
+    9 (straight flush), matching Game.hand_strength.
+    """
+
+    for cat in range(9, 0, -1):
+        if rank >= CATEGORY_STARTS[cat]:
+            return cat
+    return 0
+
+def hand_name(rank):
+
+    """
+    Returns the name of a hand rank, e.g. "full house".
+    """
+
+    return HAND_NAMES[category(rank)]
+
+def card_index(card):
+
+    """
+    Returns the index of a Card object (the same as card.index).
+    """
+
+    return card.index
+
+def best_five(cards):
+
+    """
+    Inputs: A list of 5 to 7 card indices.
+    Outputs: A pair (rank, five) with the rank of the hand and the 5 card \
+        indices that make it.
+    """
+
+    rank = evaluate(cards)
+    for five in combinations(cards, 5):
+        if evaluate(five) == rank:
+            return rank, list(five)
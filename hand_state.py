@@ -0,0 +1,163 @@
+"""
+Incremental Hold'em hand state.
+
+A HandState holds a player's hole cards plus the board so far as rank \
+counts, suit counts and rank bitmasks, together with the evaluator key and \
+card mask (see evaluator.evaluate_state). Adding a card updates all of \
+them in constant time, so the made hand and the draws can be read on \
+every street without sorting or re-evaluating the whole card list.
+"""
+
+import evaluator
+
+#Rank masks of the 10 straights, ace high first, wheel last
+STRAIGHTS = evaluator.STRAIGHTS
+
+
+class HandState:
+
+    __slots__ = ("rank_counts", "suit_counts", "rank_mask", "suit_masks", "multiples",
+                 "key", "mask", "size")
+
+    def __init__(self, cards = ()):
+
+        """
+        Starts a state from the given cards (Cards or card indices).
+
+        rank_counts[r] is how many cards of rank r (0 = Two, 12 = Ace) \
+        there are, suit_counts[s] how many of suit s, rank_mask has bit r \
+        set for every rank held and suit_masks[s] the ranks held in suit s. \
+        multiples[n] is the number of ranks held exactly n times.
+        """
+
+        self.rank_counts = [0] * 13
+        self.suit_counts = [0] * 4
+        self.rank_mask = 0
+        self.suit_masks = [0] * 4
+        self.multiples = [13, 0, 0, 0, 0]
+        self.key = evaluator.KEY_OFFSET
+        self.mask = 0
+        self.size = 0
+        for card in cards:
+            self.add(card)
+
+    def __repr__(self):
+        category = self.category()
+        return f"HandState of {self.size} cards: {evaluator.HAND_NAMES[category]}"
+
+    def add(self, card):
+
+        """
+        Adds one card (a Card or a card index).
+        """
+
+        index = card if isinstance(card, int) else card.index
+        rank, suit = index >> 2, index & 3
+        count = self.rank_counts[rank]
+        self.rank_counts[rank] = count + 1
+        self.multiples[count] -= 1
+        self.multiples[count + 1] += 1
+        self.suit_counts[suit] += 1
+        self.rank_mask |= 1 << rank
+        self.suit_masks[suit] |= 1 << rank
+        self.key += evaluator.CARD_KEYS[index]
+        self.mask |= evaluator.CARD_MASKS[index]
+        self.size += 1
+
+    def add_cards(self, cards):
+        for card in cards:
+            self.add(card)
+
+    def copy(self):
+        state = HandState.__new__(HandState)
+        state.rank_counts = self.rank_counts[:]
+        state.suit_counts = self.suit_counts[:]
+        state.rank_mask = self.rank_mask
+        state.suit_masks = self.suit_masks[:]
+        state.multiples = self.multiples[:]
+        state.key = self.key
+        state.mask = self.mask
+        state.size = self.size
+        return state
+
+    def rank(self):
+
+        """
+        Returns the rank of the best five card hand, same as \
+        evaluator.evaluate, or None with fewer than 5 cards.
+        """
+
+        if self.size < 5:
+            return None
+        return evaluator.evaluate_state(self.key, self.mask)
+
+    def category(self):
+
+        """
+        Returns the category of the best made hand, from 1 (high card) to \
+        9 (straight flush) as in Game.hand_strength. With fewer than 5 \
+        cards only pairs, trips and quads count.
+        """
+
+        if self.size >= 5:
+            return evaluator.category(evaluator.evaluate_state(self.key, self.mask))
+        multiples = self.multiples
+        if multiples[4]:
+            return 8
+        if multiples[3]:
+            return 4
+        if multiples[2] >= 2:
+            return 3
+        return 2 if multiples[2] else 1
+
+    def hand_name(self):
+        return evaluator.HAND_NAMES[self.category()]
+
+    def flush_draw(self):
+
+        """
+        Returns the suit with exactly four cards if there is one and no \
+        flush yet, else None.
+        """
+
+        if max(self.suit_counts) >= 5:
+            return None
+        for suit, count in enumerate(self.suit_counts):
+            if count == 4:
+                return suit
+        return None
+
+    def straight_outs(self):
+
+        """
+        Returns the ranks that would complete a straight, or an empty list \
+        if there is a straight already.
+        """
+
+        rank_mask = self.rank_mask
+        outs = 0
+        for straight in STRAIGHTS:
+            missing = straight & ~rank_mask
+            if not missing:
+                return []
+            #Exactly one rank missing
+            if not missing & (missing - 1):
+                outs |= missing
+        return [rank for rank in range(13) if outs >> rank & 1]
+
+    def draws(self):
+
+        """
+        Returns the draws of the hand as a dict: "flush" (the suit of a \
+        four card flush draw or None), "straight" ("open-ended" for two or \
+        more completing ranks, "gutshot" for one, else None) and \
+        "straight_outs" (the completing ranks).
+        """
+
+        outs = self.straight_outs()
+        straight = None
+        if len(outs) >= 2:
+            straight = "open-ended"
+        elif outs:
+            straight = "gutshot"
+        return {"flush": self.flush_draw(), "straight": straight, "straight_outs": outs}
@@ -0,0 +1,283 @@
+"""
+Binary hand histories.
+
+HandHistoryWriter appends every hand a Game plays to a log of files that \
+are rotated once they reach a size limit, read_history streams the hands \
+back out of them without loading the files, and replay plays a recorded \
+hand again through a headless Game.
+
+Every file starts with the 8 bytes b"PKHH" and the format version \
+(uint32), followed by records with this layout (little endian):
+
+    uint16  length of the whole record in bytes
+    uint32  hand number
+    uint8   number of seats, uint8 hole cards per seat, uint8 board cards
+    uint16  number of actions
+    uint32  small blind, uint32 big blind, uint32 ante
+    uint32  stack of every seat before the hand
+    uint32  stack of every seat after the hand
+    uint8   hole cards of every seat, seat after seat (card indices)
+    uint8   board cards
+    5 bytes for every action: uint8 seat << 2 | action code, then \
+            uint32 amount (the total bet for bets and raises, otherwise 0)
+
+Seats are the positions at the start of the hand, 0 being the small blind.
+"""
+
+import mmap
+import os
+import struct
+
+MAGIC = b"PKHH"
+VERSION = 1
+FILE_HEADER = struct.Struct("<4sI")
+RECORD_HEADER = struct.Struct("<HIBBBHIII")
+ACTION = struct.Struct("<BI")
+
+#Action codes
+FOLD, CALL, BET, RAISE = range(4)
+ACTION_CODES = {"f": FOLD, "c": CALL, "b": BET, "r": RAISE}
+ACTION_LETTERS = "fcbr"
+
+
+class HandRecord:
+
+    def __init__(self, hand_id, blinds, ante, stacks, hole_cards,
+                 board = None, actions = None, final_stacks = None):
+
+        """
+        One hand as it is stored in the log. hole_cards is a list with the \
+        card indices of every seat, actions a list of (seat, code, amount).
+        """
+
+        self.hand_id = hand_id
+        self.blinds = list(blinds)
+        self.ante = ante
+        self.stacks = list(stacks)
+        self.hole_cards = hole_cards
+        self.board = board if board is not None else []
+        self.actions = actions if actions is not None else []
+        self.final_stacks = final_stacks if final_stacks is not None else []
+
+    def __repr__(self):
+        return (f"Hand {self.hand_id}: {len(self.stacks)} seats, board {self.board}, "
+                f"{len(self.actions)} actions")
+
+    def encode(self):
+
+        """
+        Returns the record as bytes.
+        """
+
+        seats = len(self.stacks)
+        cards_per_seat = len(self.hole_cards[0]) if seats else 0
+        n = (RECORD_HEADER.size + 8*seats + seats*cards_per_seat
+             + len(self.board) + ACTION.size*len(self.actions))
+
+        parts = [RECORD_HEADER.pack(n, self.hand_id, seats, cards_per_seat, len(self.board),
+                                    len(self.actions), self.blinds[0], self.blinds[1], self.ante),
+                 struct.pack(f"<{2*seats}I", *self.stacks, *self.final_stacks),
+                 bytes(card for hand in self.hole_cards for card in hand),
+                 bytes(self.board)]
+        parts.extend(ACTION.pack(seat << 2 | code, amount) for seat, code, amount in self.actions)
+        return b"".join(parts)
+
+    @classmethod
+    def decode(cls, buffer, offset = 0):
+
+        """
+        Reads the record that starts at offset in buffer.
+        Outputs: The record and the offset of the next one.
+        """
+
+        (length, hand_id, seats, cards_per_seat, board_len, n_actions,
+         small_blind, big_blind, ante) = RECORD_HEADER.unpack_from(buffer, offset)
+        pos = offset + RECORD_HEADER.size
+
+        stacks = struct.unpack_from(f"<{2*seats}I", buffer, pos)
+        pos += 8*seats
+        hole_cards = [list(buffer[pos + i*cards_per_seat:pos + (i + 1)*cards_per_seat])
+                      for i in range(seats)]
+        pos += seats*cards_per_seat
+        board = list(buffer[pos:pos + board_len])
+        pos += board_len
+
+        actions = []
+        for seat_code, amount in ACTION.iter_unpack(buffer[pos:pos + ACTION.size*n_actions]):
+            actions.append((seat_code >> 2, seat_code & 3, amount))
+
+        record = cls(hand_id, (small_blind, big_blind), ante, stacks[:seats], hole_cards,
+                     board, actions, list(stacks[seats:]))
+        return record, offset + length
+
+
+class HandHistoryWriter:
+
+    def __init__(self, prefix, max_bytes = 64 << 20, buffer_size = 1 << 16):
+
+        """
+        Writes records to prefix.00000.phh, prefix.00001.phh, ... starting \
+        a new file whenever the current one would grow past max_bytes. \
+        Writes are buffered buffer_size bytes at a time; call close (or use \
+        the writer in a with statement) to flush the rest.
+        """
+
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.buffer_size = buffer_size
+        self.file_num = len(history_files(prefix))
+        self.file = None
+        self.hands_written = 0
+        self._open_next()
+
+    def _open_next(self):
+        if self.file is not None:
+            self.file.close()
+        directory = os.path.dirname(self.prefix)
+        if directory:
+            os.makedirs(directory, exist_ok = True)
+        self.path = f"{self.prefix}.{self.file_num:05d}.phh"
+        self.file_num += 1
+        self.file = open(self.path, "wb", buffering = self.buffer_size)
+        self.file.write(FILE_HEADER.pack(MAGIC, VERSION))
+        self.size = FILE_HEADER.size
+
+    def write(self, record):
+
+        """
+        Appends a HandRecord to the log.
+        """
+
+        data = record.encode()
+        if self.size + len(data) > self.max_bytes and self.size > FILE_HEADER.size:
+            self._open_next()
+        self.file.write(data)
+        self.size += len(data)
+        self.hands_written += 1
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def history_files(prefix):
+
+    """
+    Returns the files of the log with the given prefix, oldest first.
+    """
+
+    #glob pulls in re, which games that never read logs can do without
+    import glob
+
+    return sorted(glob.glob(glob.escape(prefix) + ".[0-9][0-9][0-9][0-9][0-9].phh"))
+
+def read_file(path):
+
+    """
+    Yields the HandRecords in one file, one at a time. The file is \
+    memory-mapped, so it is never read into memory as a whole.
+    """
+
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < FILE_HEADER.size:
+            return
+        with mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ) as buffer:
+            magic, version = FILE_HEADER.unpack_from(buffer)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not a version {VERSION} hand history.")
+            offset = FILE_HEADER.size
+            end = len(buffer)
+            while offset < end:
+                record, offset = HandRecord.decode(buffer, offset)
+                yield record
+
+def read_history(prefix):
+
+    """
+    Yields every HandRecord of the log with the given prefix, in order.
+    """
+
+    for path in history_files(prefix):
+        yield from read_file(path)
+
+
+class ReplayDeck:
+
+    def __init__(self, cards):
+
+        """
+        A deck that deals the given cards in order, for replaying a hand.
+        """
+
+        self.cards = cards
+        self.cursor = 0
+
+    def __len__(self):
+        return len(self.cards) - self.cursor
+
+    def draw(self, num = 1):
+        if self.cursor + num > len(self.cards):
+            raise IndexError("The record does not have that many cards.")
+        cards_drawn = self.cards[self.cursor:self.cursor + num]
+        self.cursor += num
+        return cards_drawn
+
+    def reset(self):
+        pass
+
+class _RecordedDecisions:
+
+    def __init__(self, actions):
+        self.actions = iter(actions)
+
+    def __call__(self, player, game):
+        try:
+            seat, code, amount = next(self.actions)
+        except StopIteration:
+            raise ValueError("The record has no more actions, but the game asks for one.") from None
+        if seat != player.position:
+            raise ValueError(f"The record has seat {seat} acting, but the game asks seat {player.position}.")
+        return (ACTION_LETTERS[code], amount)
+
+def replay(record, verify = True):
+
+    """
+    Plays a recorded hand again in a headless Game, dealing the recorded \
+    cards and taking the recorded decisions.
+    Outputs: The stacks of every seat after the hand. With verify, raises \
+        a ValueError if they differ from the recorded ones.
+    """
+
+    from Card import CARDS
+    from Game import Game
+
+    seats = len(record.stacks)
+    game = Game(seats, headless = True, blinds = record.blinds, ante = record.ante,
+                decision_provider = _RecordedDecisions(record.actions))
+
+    #Seat the players in the recorded positions with the recorded stacks
+    game.sort_by_position()
+    for position, player in enumerate(game.players):
+        player.position = position
+        player.chips = record.stacks[position]
+    seated = list(game.players)
+
+    cards = [CARDS[card] for hand in record.hole_cards for card in hand] + [CARDS[card] for card in record.board]
+    game.deck = ReplayDeck(cards)
+    game.new_hand(cards_per_player = len(record.hole_cards[0]))
+
+    final_stacks = [player.chips for player in seated]
+    if verify and final_stacks != record.final_stacks:
+        raise ValueError(f"Replaying hand {record.hand_id} ends with {final_stacks}, "
+                         f"the record has {record.final_stacks}.")
+    return final_stacks
@@ -0,0 +1,194 @@
+"""
+Independent Chip Model (ICM) tournament equity.
+
+ICM turns chip stacks into shares of the prize pool: a player finishes \
+first with probability proportional to their stack, and each later place \
+goes the same way among the players not placed yet. payouts is the list \
+of prizes by place, winner first:
+
+    icm([5000, 3000, 2000], [50, 30, 20])     # -> array([38.4, 32.75, 28.86])
+
+Summing over every finishing order takes n! terms. The probability of a \
+set of players taking the first places does not depend on their order \
+among themselves though, so the exact equity is a dynamic program over \
+the subsets of players, place by place: 2^n subsets, which is instant up \
+to 12 players and still fine somewhat beyond. The subsets of a given size \
+are handled together as NumPy arrays, and so are many stack vectors of \
+the same size (icm_batch), e.g. every outcome of a decision.
+
+Bigger fields are sampled: drawing finishing orders from the model is \
+the same as sorting the players by log(stack) plus Gumbel noise, so many \
+orders can be drawn at once.
+
+Players without chips get nothing; with fewer players left than paid \
+places, the players left share the top places only.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+#Up to this many players with chips the equity is exact by default
+MAX_EXACT = 12
+
+#Sampled finishing orders handled at once
+_CHUNK = 4096
+
+
+@lru_cache(maxsize = None)
+def _subsets(n):
+
+    """
+    Returns a boolean array with the players in each of the 2^n subsets, \
+    and the subsets of every size.
+    """
+
+    masks = np.arange(1 << n)
+    members = ((masks[:, None] >> np.arange(n)) & 1).astype(bool)
+    sizes = members.sum(axis = 1)
+    return members, [np.flatnonzero(sizes == k) for k in range(n + 1)]
+
+def _exact(stacks, payouts):
+
+    """
+    Exact ICM of a (B, n) array of stacks, see icm_batch.
+    """
+
+    batch, n = stacks.shape
+    places = min(len(payouts), n)
+    members, levels = _subsets(n)
+    total = stacks.sum(axis = 1)
+    #Chips of the players in every subset
+    placed = stacks @ members.T
+
+    #reach[b, mask]: probability that the players in mask took the first places
+    reach = np.zeros((batch, 1 << n))
+    reach[:, 0] = 1
+    equities = np.zeros((batch, n))
+    for k in range(places):
+        masks = levels[k]
+        left = total[:, None] - placed[:, masks]
+        share = np.divide(stacks[:, None, :], left[:, :, None],
+                          out = np.zeros((batch, len(masks), n)), where = left[:, :, None] > 0)
+        #Probability that mask took the first k places and player j takes place k + 1
+        taken = reach[:, masks, None] * share * ~members[masks][None]
+        equities += payouts[k] * taken.sum(axis = 1)
+        if k + 1 < places:
+            for j in range(n):
+                reach[:, masks | 1 << j] += taken[:, :, j]
+    return equities
+
+def _sampled(stacks, payouts, trials, rng):
+
+    """
+    Monte Carlo ICM of one vector of stacks.
+    """
+
+    equities = np.zeros(len(stacks))
+    live = np.flatnonzero(stacks > 0)
+    places = min(len(payouts), len(live))
+    if places == 0:
+        return equities
+    if len(live) == 1:
+        equities[live] = payouts[0]
+        return equities
+
+    logs = np.log(stacks[live])
+    won = np.zeros(len(live))
+    done = 0
+    while done < trials:
+        size = min(_CHUNK, trials - done)
+        keys = logs + rng.gumbel(size = (size, len(live)))
+        #The top places in order, highest key first
+        top = np.argpartition(-keys, places - 1, axis = 1)[:, :places]
+        order = np.take_along_axis(top, np.argsort(-np.take_along_axis(keys, top, axis = 1), axis = 1), axis = 1)
+        for k in range(places):
+            won += payouts[k] * np.bincount(order[:, k], minlength = len(live))
+        done += size
+    equities[live] = won / trials
+    return equities
+
+def icm_batch(stacks, payouts, max_exact = MAX_EXACT, trials = 20_000, seed = None,
+              chunk = 256):
+
+    """
+    Inputs: A (B, n) array of stacks, one row per situation, the prizes by \
+        place, the most players to work out exactly (rows with more players \
+        with chips are sampled), the number of finishing orders sampled and \
+        a seed for the sampling.
+    Outputs: A (B, n) array with the ICM equity of every player in every \
+        row, in the unit of the prizes.
+    """
+
+    stacks = np.asarray(stacks, dtype = np.float64)
+    if stacks.ndim != 2:
+        raise ValueError(f"Expected a 2 dimensional array of stacks, got shape {stacks.shape}.")
+    if (stacks < 0).any():
+        raise ValueError("Stacks cannot be negative.")
+    payouts = np.asarray(payouts, dtype = np.float64)
+    batch, n = stacks.shape
+    equities = np.zeros((batch, n))
+    if batch == 0 or n == 0 or len(payouts) == 0:
+        return equities
+
+    if n <= max_exact:
+        for start in range(0, batch, chunk):
+            equities[start:start + chunk] = _exact(stacks[start:start + chunk], payouts)
+        return equities
+
+    #Rows with few enough players left are still exact, on those players only
+    rng = np.random.default_rng(seed)
+    for row in range(batch):
+        live = np.flatnonzero(stacks[row] > 0)
+        if len(live) <= max_exact:
+            equities[row, live] = _exact(stacks[row, live][None], payouts)[0]
+        else:
+            equities[row] = _sampled(stacks[row], payouts, trials, rng)
+    return equities
+
+def icm(stacks, payouts, max_exact = MAX_EXACT, trials = 20_000, seed = None):
+
+    """
+    Inputs: The stacks of the players, the prizes by place (winner first), \
+        the most players to work out exactly and for more, how many \
+        finishing orders to sample and the seed of the sampling.
+    Outputs: An array with every player's share of the prizes.
+    """
+
+    stacks = np.asarray(stacks, dtype = np.float64)
+    live = np.flatnonzero(stacks > 0)
+    equities = np.zeros(len(stacks))
+    #Only the players with chips take part, which keeps the exact case small
+    equities[live] = icm_batch(stacks[live][None], payouts, max_exact, trials, seed)[0]
+    return equities
+
+def expected_icm(outcomes, probabilities, payouts, **kwargs):
+
+    """
+    Inputs: A list of stack vectors, the possible results of a decision, \
+        their probabilities and the prizes by place. kwargs go to icm_batch.
+    Outputs: The expected ICM equity of every player over the outcomes, \
+        e.g. to compare calling an all-in with folding.
+    """
+
+    equities = icm_batch(outcomes, payouts, **kwargs)
+    return np.asarray(probabilities, dtype = np.float64) @ equities
+
+def game_equities(game, payouts = None, **kwargs):
+
+    """
+    Returns the ICM equity of every player left in a Game as a dict by \
+    player name, from their chips and payouts (default: game.payouts, \
+    the prizes of the places still to be decided). kwargs go to icm.
+
+    Only the game's players share the payouts, so the game has to be the \
+    final table: nine equal stacks at one table of a bigger field would \
+    otherwise split prizes that players at other tables are playing for too.
+    """
+
+    payouts = game.payouts if payouts is None else payouts
+    if payouts is None:
+        raise ValueError("The game has no payouts, pass them in.")
+    players = game.players
+    equities = icm([player.chips for player in players], payouts, **kwargs)
+    return {player.name: float(equity) for player, equity in zip(players, equities)}
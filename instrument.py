@@ -0,0 +1,248 @@
+"""
+Timers, counters and a sampling profiler for the hot paths.
+
+Nothing in Game, the decks or the evaluator calls into this module. \
+enable() swaps timing wrappers in for the functions listed in HOOKS and \
+disable() puts the originals back, so while instrumentation is off the \
+code runs exactly as if this module did not exist.
+
+    import instrument
+    instrument.enable()
+    game.run(10_000)
+    print(instrument.prometheus_text())
+    instrument.disable()
+
+Every hook keeps a call count, the total and the longest time spent in \
+it. Times are inclusive: new_hand also contains the betting rounds, the \
+showdown and update. The counters hands, evaluations, decisions and \
+shuffles are the call counts of the matching hooks, other counters can be \
+added with increment.
+
+SamplingProfiler looks at the stack of a thread every few milliseconds \
+from a background thread, which tells where the time inside a phase goes \
+without slowing the sampled thread down much.
+"""
+
+import sys
+import threading
+import time
+from collections import Counter
+
+#(module, class or None, attribute, timer name) of every hooked function
+HOOKS = [("Game", "Game", "new_hand", "new_hand"),
+         ("Game", "Game", "betting_round", "betting_round"),
+         ("Game", "Game", "showdown", "showdown"),
+         ("Game", "Game", "update", "update"),
+         ("Player", "Player", "get_decision", "decision"),
+         ("Player", "BotPlayer", "get_decision", "decision"),
+         ("Deck", "Deck", "shuffle", "shuffle"),
+         ("Deck", "PermutationDeck", "reset", "shuffle"),
+         ("Deck", "PermutationDeck", "draw", "draw"),
+         ("evaluator", None, "evaluate", "evaluate"),
+         ("omaha", "OmahaBoard", "evaluate", "omaha_evaluate")]
+
+#Which timers the standard counters are read from
+COUNTER_TIMERS = {"hands": ["new_hand"],
+                  "evaluations": ["evaluate", "omaha_evaluate"],
+                  "decisions": ["decision"],
+                  "shuffles": ["shuffle"]}
+
+#timer name -> [calls, total seconds, longest call in seconds]
+_timers = {}
+_counters = Counter()
+#(owner, attribute, original function) of every installed wrapper
+_installed = []
+_WRAPPER_CODE = None
+
+
+def _timed(name, func):
+
+    """
+    Wraps func so every call is added to the timer called name.
+    """
+
+    global _WRAPPER_CODE
+    timer = _timers.setdefault(name, [0, 0.0, 0.0])
+    perf_counter = time.perf_counter
+
+    def wrapper(*args, **kwargs):
+        start = perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = perf_counter() - start
+            timer[0] += 1
+            timer[1] += elapsed
+            if elapsed > timer[2]:
+                timer[2] = elapsed
+
+    _WRAPPER_CODE = wrapper.__code__
+    wrapper.__name__ = func.__name__
+    wrapper.__qualname__ = func.__qualname__
+    wrapper.__doc__ = func.__doc__
+    wrapper.__wrapped__ = func
+    return wrapper
+
+def enabled():
+    return bool(_installed)
+
+def enable():
+
+    """
+    Installs the timing wrappers. Does nothing if they are installed \
+    already. Counts carry on from where they were; call reset to start over.
+    """
+
+    if _installed:
+        return
+    import importlib
+    for module_name, class_name, attr, name in HOOKS:
+        module = importlib.import_module(module_name)
+        owner = module if class_name is None else getattr(module, class_name)
+        original = owner.__dict__[attr] if class_name is not None else getattr(module, attr)
+        setattr(owner, attr, _timed(name, original))
+        _installed.append((owner, attr, original))
+
+def disable():
+
+    """
+    Puts the original functions back. The numbers collected so far are kept.
+    """
+
+    while _installed:
+        owner, attr, original = _installed.pop()
+        setattr(owner, attr, original)
+
+def reset():
+
+    """
+    Sets all timers and counters back to zero.
+    """
+
+    for timer in _timers.values():
+        timer[:] = [0, 0.0, 0.0]
+    _counters.clear()
+
+def increment(name, num = 1):
+
+    """
+    Adds num to a custom counter. Unlike the hooks this always costs a \
+    call, so keep it out of tight loops.
+    """
+
+    _counters[name] += num
+
+def snapshot():
+
+    """
+    Outputs: A dict with "counters" (name -> count) and "timers" (name -> \
+        dict with calls, total and max in seconds, and mean).
+    """
+
+    counters = {name: sum(_timers[timer][0] for timer in timers if timer in _timers)
+                for name, timers in COUNTER_TIMERS.items()}
+    counters.update(_counters)
+    timers = {name: {"calls": calls, "total": total, "max": longest,
+                     "mean": total / calls if calls else 0.0}
+              for name, (calls, total, longest) in _timers.items()}
+    return {"enabled": enabled(), "counters": counters, "timers": timers}
+
+def prometheus_text(prefix = "poker"):
+
+    """
+    Returns the snapshot in the Prometheus text exposition format.
+    """
+
+    stats = snapshot()
+    lines = []
+    for name, value in sorted(stats["counters"].items()):
+        lines.append(f"# TYPE {prefix}_{name}_total counter")
+        lines.append(f"{prefix}_{name}_total {value}")
+
+    lines.append(f"# TYPE {prefix}_phase_seconds summary")
+    for name, timer in sorted(stats["timers"].items()):
+        lines.append(f'{prefix}_phase_seconds_sum{{phase="{name}"}} {timer["total"]:.9f}')
+        lines.append(f'{prefix}_phase_seconds_count{{phase="{name}"}} {timer["calls"]}')
+    lines.append(f"# TYPE {prefix}_phase_seconds_max gauge")
+    for name, timer in sorted(stats["timers"].items()):
+        lines.append(f'{prefix}_phase_seconds_max{{phase="{name}"}} {timer["max"]:.9f}')
+    return "\n".join(lines) + "\n"
+
+
+class SamplingProfiler:
+
+    def __init__(self, interval = 0.005, thread = None, max_depth = 64):
+
+        """
+        Samples the stack of a thread (default: the one creating the \
+        profiler) every interval seconds once started. Can be used in a \
+        with statement.
+        """
+
+        self.interval = interval
+        self.thread_id = (thread or threading.current_thread()).ident
+        self.max_depth = max_depth
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __repr__(self):
+        return f"SamplingProfiler with {self.samples} samples every {self.interval*1000:g} ms"
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target = self._sample, name = "sampling-profiler", daemon = True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                code = frame.f_code
+                #Leave out the timing wrappers, they would show up everywhere
+                if code is not _WRAPPER_CODE:
+                    stack.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}")
+                frame = frame.f_back
+            self.stacks[tuple(reversed(stack))] += 1
+            self.samples += 1
+
+    def top(self, num = 10):
+
+        """
+        Outputs: The num functions the thread was most often seen running \
+            in, as (function, share of the samples).
+        """
+
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack[-1]] += count
+        return [(func, count / self.samples) for func, count in leaves.most_common(num)]
+
+    def collapsed(self):
+
+        """
+        Returns the samples in the collapsed stack format flame graph tools \
+        read, one "outer;inner;innermost count" line per stack.
+        """
+
+        return "\n".join(f"{';'.join(stack)} {count}" for stack, count in self.stacks.most_common())
@@ -0,0 +1,339 @@
+"""
+Suit isomorphism: canonical hands and dense indices.
+
+Renaming the suits of a hand does not change anything strategic, so \
+(hole cards, board) pairs fall into classes of up to 24 isomorphic ones: \
+the 22,100 flops into 1,755 classes, the 1,326 starting hands into 169 \
+and the 25,989,600 hole card and flop pairs into 1,286,792.
+
+A pair is described per suit by which ranks of that suit are in the hole \
+cards and which are on the board. Two pairs are isomorphic exactly if they \
+have the same four suit descriptions up to order, so sorting the suits by \
+their description gives the canonical representative. HandIndexer turns \
+that sorted description into a dense index (and back) by counting, the \
+way hand indexers for poker solvers do, without any tables of hands:
+
+    indexer = HandIndexer(2, 3)
+    i = indexer.index(hole, flop)       # 0 <= i < indexer.size
+    hole, flop = indexer.unindex(i)      # the canonical representative
+
+Cards are card indices (4*rank + suit) or Cards. Canonical hands always \
+use the suits in the order hearts, diamonds, spades, clubs, the suit with \
+the most hole cards (then board cards) first.
+"""
+
+from bisect import bisect_right
+from math import comb, factorial
+
+#COLEX[mask] is the rank of the set of ranks in mask among all sets of the
+#same size, in colexicographic order
+COLEX = [0] * 8192
+for _mask in range(8192):
+    _bits = [r for r in range(13) if _mask >> r & 1]
+    COLEX[_mask] = sum(comb(r, i + 1) for i, r in enumerate(_bits))
+del _mask, _bits
+
+POPCOUNT = [bin(mask).count("1") for mask in range(8192)]
+
+
+def _unrank_colex(index, size):
+
+    """
+    Returns the mask of the set of size ranks with colex rank index.
+    """
+
+    mask = 0
+    for i in range(size, 0, -1):
+        r = i - 1
+        while comb(r + 1, i) <= index:
+            r += 1
+        index -= comb(r, i)
+        mask |= 1 << r
+    return mask
+
+def _compress(mask, skip):
+
+    """
+    Renumbers the ranks in mask as positions among the ranks not in skip.
+    """
+
+    while skip:
+        top = skip.bit_length() - 1
+        low = (1 << top) - 1
+        mask = (mask & low) | (mask >> 1 & ~low)
+        skip &= low
+    return mask
+
+def _expand(mask, skip):
+
+    """
+    Inverse of _compress.
+    """
+
+    out = 0
+    position = 0
+    for r in range(13):
+        if not skip >> r & 1:
+            if mask >> position & 1:
+                out |= 1 << r
+            position += 1
+    return out
+
+def _suit_fields(cards):
+    fields = [0, 0, 0, 0]
+    for card in cards:
+        card = card if isinstance(card, int) else card.index
+        fields[card & 3] |= 1 << (card >> 2)
+    return fields
+
+def _multiset_index(values):
+
+    """
+    Index of a sorted multiset of values (ascending) among all multisets \
+    of the same size.
+    """
+
+    return sum(comb(v + i, i + 1) for i, v in enumerate(values))
+
+def _unrank_multiset(index, size, n_values):
+
+    """
+    Inverse of _multiset_index: the ascending values of the multiset.
+    """
+
+    values = [0] * size
+    for i in range(size, 0, -1):
+        #Largest v with comb(v + i - 1, i) <= index
+        low, high = 0, n_values - 1
+        while low < high:
+            mid = (low + high + 1) // 2
+            if comb(mid + i - 1, i) <= index:
+                low = mid
+            else:
+                high = mid - 1
+        values[i - 1] = low
+        index -= comb(low + i - 1, i)
+    return values
+
+
+class HandIndexer:
+
+    def __init__(self, n_hole, n_board = 0):
+
+        """
+        Indexes the suit isomorphism classes of n_hole hole cards \
+        together with n_board board cards (either may be 0).
+        """
+
+        if n_hole < 0 or n_board < 0 or n_hole + n_board > 52 or n_hole + n_board == 0:
+            raise ValueError(f"Cannot index {n_hole} hole and {n_board} board cards.")
+        self.n_hole = n_hole
+        self.n_board = n_board
+
+        #Every way to spread the cards over the suits, as the (hole, board)
+        #counts of each suit sorted from the most to the fewest
+        self.configs = sorted(self._configs(4, n_hole, n_board, (13, 13)), reverse = True)
+
+        #Number of classes and index of the first class of every config, and
+        #its runs of suits with the same shape as (first suit, number of
+        #suits, number of signatures of one suit, number of multisets)
+        self.offsets = []
+        self.config_index = {}
+        self.config_groups = []
+        size = 0
+        for i, config in enumerate(self.configs):
+            self.offsets.append(size)
+            self.config_index[config] = i
+            groups = []
+            for start, count, shape in self._groups(config):
+                n_values = self._shape_size(shape)
+                groups.append((start, count, n_values, comb(n_values + count - 1, count)))
+            self.config_groups.append(groups)
+            size += self._config_size(config)
+        self.size = size
+
+    def __repr__(self):
+        return f"HandIndexer of {self.n_hole} hole and {self.n_board} board cards: {self.size} classes"
+
+    def __len__(self):
+        return self.size
+
+    @classmethod
+    def _configs(cls, suits, n_hole, n_board, largest):
+
+        """
+        Yields every way to spread n_hole and n_board cards over suits \
+        suits as a tuple of shapes in descending order, none above largest.
+        """
+
+        if suits == 0:
+            if n_hole == n_board == 0:
+                yield ()
+            return
+        for h in range(min(n_hole, 13), -1, -1):
+            for b in range(min(n_board, 13 - h), -1, -1):
+                if (h, b) > largest:
+                    continue
+                for rest in cls._configs(suits - 1, n_hole - h, n_board - b, (h, b)):
+                    yield ((h, b),) + rest
+
+    @staticmethod
+    def _shape_size(shape):
+        hole, board = shape
+        return comb(13, hole) * comb(13 - hole, board)
+
+    def _groups(self, config):
+
+        """
+        Yields (first suit, number of suits, shape) for each run of suits \
+        with the same shape in config.
+        """
+
+        start = 0
+        while start < 4:
+            end = start
+            while end < 4 and config[end] == config[start]:
+                end += 1
+            yield start, end - start, config[start]
+            start = end
+
+    def _config_size(self, config):
+        size = 1
+        for _, count, shape in self._groups(config):
+            size *= comb(self._shape_size(shape) + count - 1, count)
+        return size
+
+    def _describe(self, hole, board):
+
+        """
+        Returns the suits sorted into canonical order as a list of \
+        (-hole cards, -board cards, signature, suit).
+        """
+
+        hole_fields = _suit_fields(hole)
+        board_fields = _suit_fields(board)
+        suits = []
+        for suit in range(4):
+            hole_mask, board_mask = hole_fields[suit], board_fields[suit]
+            if hole_mask & board_mask:
+                raise ValueError("The hole cards and the board share a card.")
+            h, b = POPCOUNT[hole_mask], POPCOUNT[board_mask]
+            if hole_mask:
+                signature = COLEX[hole_mask] * comb(13 - h, b) + COLEX[_compress(board_mask, hole_mask)]
+            else:
+                signature = COLEX[board_mask]
+            suits.append((-h, -b, signature, suit))
+        #Most cards first; suits of the same shape by signature
+        suits.sort()
+        return suits
+
+    def index(self, hole, board = ()):
+
+        """
+        Returns the index of the class of (hole, board), from 0 to size-1.
+        """
+
+        suits = self._describe(hole, board)
+        config = tuple((-h, -b) for h, b, _, _ in suits)
+        i = self.config_index.get(config)
+        if i is None:
+            raise ValueError(f"Expected {self.n_hole} hole and {self.n_board} distinct board cards.")
+        index = 0
+        for start, count, _, n_multisets in self.config_groups[i]:
+            if count == 1:
+                index = index * n_multisets + suits[start][2]
+            else:
+                index = index * n_multisets + _multiset_index([suits[s][2] for s in range(start, start + count)])
+        return self.offsets[i] + index
+
+    def unindex(self, index):
+
+        """
+        Returns the canonical (hole, board) of the class with the given \
+        index, each a tuple of card indices from the highest down.
+        """
+
+        if not 0 <= index < self.size:
+            raise IndexError(f"Index {index} out of range for {self.size} classes.")
+        i = bisect_right(self.offsets, index) - 1
+        config = self.configs[i]
+        index -= self.offsets[i]
+
+        signatures = [0] * 4
+        for start, count, n_values, n_multisets in reversed(self.config_groups[i]):
+            index, rest = divmod(index, n_multisets)
+            signatures[start:start + count] = _unrank_multiset(rest, count, n_values)
+
+        hole, board = [], []
+        for suit, ((h, b), signature) in enumerate(zip(config, signatures)):
+            hole_index, board_index = divmod(signature, comb(13 - h, b))
+            hole_mask = _unrank_colex(hole_index, h)
+            board_mask = _expand(_unrank_colex(board_index, b), hole_mask)
+            hole += [4*r + suit for r in range(13) if hole_mask >> r & 1]
+            board += [4*r + suit for r in range(13) if board_mask >> r & 1]
+        return tuple(sorted(hole, reverse = True)), tuple(sorted(board, reverse = True))
+
+
+def canonical(hole, board = ()):
+
+    """
+    Inputs: Hole cards and board cards (card indices or Cards), either may \
+        be empty.
+    Outputs: A tuple (hole, board, weight): the canonical representative of \
+        the class, as tuples of card indices from the highest down, and the \
+        number of (hole, board) pairs in the class.
+    """
+
+    hole = [card if isinstance(card, int) else card.index for card in hole]
+    board = [card if isinstance(card, int) else card.index for card in board]
+    hole_fields = _suit_fields(hole)
+    board_fields = _suit_fields(board)
+    order = sorted(range(4), key = lambda s: (-POPCOUNT[hole_fields[s]], -POPCOUNT[board_fields[s]],
+                                              COLEX[hole_fields[s]], COLEX[board_fields[s]]))
+    new_suit = [0] * 4
+    for new, suit in enumerate(order):
+        new_suit[suit] = new
+
+    #Suits holding exactly the same cards can be swapped without changing anything
+    weight = 24
+    contents = list(zip(hole_fields, board_fields))
+    for content in set(contents):
+        weight //= factorial(contents.count(content))
+    return (tuple(sorted((card & ~3 | new_suit[card & 3] for card in hole), reverse = True)),
+            tuple(sorted((card & ~3 | new_suit[card & 3] for card in board), reverse = True)), weight)
+
+def weight(hole, board = ()):
+
+    """
+    Returns the number of (hole, board) pairs isomorphic to the given one.
+    """
+
+    return canonical(hole, board)[2]
+
+
+_indexers = {}
+
+def indexer(n_hole, n_board = 0):
+
+    """
+    Returns a shared HandIndexer for n_hole hole and n_board board cards.
+    """
+
+    key = (n_hole, n_board)
+    if key not in _indexers:
+        _indexers[key] = HandIndexer(n_hole, n_board)
+    return _indexers[key]
+
+def canonical_flops():
+
+    """
+    Returns the 1,755 canonical flops as a list of (flop, weight), where \
+    weight is how many of the 22,100 flops are isomorphic to it.
+    """
+
+    flop_indexer = indexer(0, 3)
+    flops = []
+    for i in range(flop_indexer.size):
+        flop = flop_indexer.unindex(i)[1]
+        flops.append((flop, weight((), flop)))
+    return flops
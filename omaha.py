@@ -0,0 +1,133 @@
+"""
+Omaha hand evaluation (4 or 5 hole cards).
+
+In Omaha a hand is made of exactly two hole cards and exactly three board \
+cards. Instead of evaluating all 60 (PLO4) or 100 (PLO5) such 5-card \
+hands, OmahaBoard keeps per board the best hand every pair of hole card \
+ranks can make, plus the best flush every suited pair can make. A \
+player's hand is then one or two lookups per pair of hole cards, and \
+pairs of ranks that several players (or several hands on the same board) \
+share are only worked out once.
+
+Ranks are the same as evaluator.evaluate.
+"""
+
+from itertools import combinations
+
+import evaluator
+
+#Positions of every pair of hole cards, by the number of hole cards
+HOLE_PAIRS = {n: list(combinations(range(n), 2)) for n in range(2, 7)}
+
+
+class OmahaBoard:
+
+    def __init__(self, board):
+
+        """
+        Prepares the lookup tables for a board of 3 to 5 card indices.
+
+        rank_best[13*r1 + r2] is the best hand two hole cards of ranks r1 \
+        and r2 make with three board cards, not counting flushes. \
+        flush_best[suit][13*r1 + r2] is the best flush or straight flush of \
+        two hole cards of that suit, for every suit with 3 or more cards on \
+        the board. Entries are filled in the first time they are needed \
+        (-1 means not yet), since a showdown only looks at a few of them.
+        """
+
+        if not 3 <= len(board) <= 5:
+            raise ValueError(f"An Omaha board has 3 to 5 cards, got {len(board)}.")
+        self.board = list(board)
+
+        self.triple_keys = list(set(sum(5**(card >> 2) for card in triple)
+                                    for triple in combinations(self.board, 3)))
+        self.rank_best = [-1] * 169
+
+        self.triple_masks = [None] * 4
+        self.flush_best = [None] * 4
+        for suit in range(4):
+            suited = [card >> 2 for card in self.board if card & 3 == suit]
+            if len(suited) >= 3:
+                self.triple_masks[suit] = [sum(1 << rank for rank in triple)
+                                           for triple in combinations(suited, 3)]
+                self.flush_best[suit] = [-1] * 169
+
+    def _fill_rank(self, r1, r2):
+        rank_table = evaluator.RANK_TABLE
+        pair_key = 5**r1 + 5**r2
+        #A pair that would make 5 of a rank cannot be dealt, .get skips it
+        best = max(rank_table.get(key + pair_key, 0) for key in self.triple_keys)
+        self.rank_best[13*r1 + r2] = self.rank_best[13*r2 + r1] = best
+        return best
+
+    def _fill_flush(self, suit, r1, r2):
+        flush_table = evaluator.FLUSH_TABLE
+        pair_mask = 1 << r1 | 1 << r2
+        best = max((flush_table[mask | pair_mask] for mask in self.triple_masks[suit]
+                    if not mask & pair_mask), default = 0)
+        self.flush_best[suit][13*r1 + r2] = self.flush_best[suit][13*r2 + r1] = best
+        return best
+
+    def evaluate(self, hand):
+
+        """
+        Inputs: A list of 2 to 6 hole card indices.
+        Outputs: The rank of the best hand using exactly two of them.
+        """
+
+        rank_best = self.rank_best
+        flush_best = self.flush_best
+        best = 0
+        for i, j in HOLE_PAIRS[len(hand)]:
+            a, b = hand[i], hand[j]
+            index = 13*(a >> 2) + (b >> 2)
+            rank = rank_best[index]
+            if rank < 0:
+                rank = self._fill_rank(a >> 2, b >> 2)
+            if a & 3 == b & 3 and flush_best[a & 3] is not None:
+                flush_rank = flush_best[a & 3][index]
+                if flush_rank < 0:
+                    flush_rank = self._fill_flush(a & 3, a >> 2, b >> 2)
+                if flush_rank > rank:
+                    rank = flush_rank
+            if rank > best:
+                best = rank
+        return best
+
+    def evaluate_all(self, hands):
+
+        """
+        Returns the rank of every hand in hands, e.g. everyone at showdown.
+        """
+
+        return [self.evaluate(hand) for hand in hands]
+
+def evaluate_omaha(hand, board):
+
+    """
+    Inputs: A list of hole card indices and a list of 3 to 5 board card \
+        indices.
+    Outputs: The rank of the best Omaha hand. To rank several hands on the \
+        same board, use OmahaBoard (or evaluate_omaha_all) so the board is \
+        only prepared once.
+    """
+
+    return OmahaBoard(board).evaluate(hand)
+
+def evaluate_omaha_all(hands, board):
+
+    """
+    Returns the rank of each of hands on the board.
+    """
+
+    return OmahaBoard(board).evaluate_all(hands)
+
+def evaluate_omaha_slow(hand, board):
+
+    """
+    Evaluates every 2 + 3 card combination directly. Only meant as a \
+    reference to check OmahaBoard against.
+    """
+
+    return max(evaluator.evaluate(pair + triple)
+               for pair in combinations(hand, 2) for triple in combinations(board, 3))
@@ -0,0 +1,278 @@
+"""
+Outs and draws on the flop and turn.
+
+outs works out, for every player at a table at once, which of the cards \
+still in the deck would put them in the lead on the next street, give \
+them a share of it, or make them a given hand category:
+
+    spot = outs(["AhKh", "QsQd"], "Jh7h2c")
+    spot.to_lead(0)                  # every heart, ace and king
+    spot.to_category(0, "flush")
+    spot.counts()
+
+The board and each player's hole cards are summed into one evaluator key \
+and card mask per player once; every card left in the deck then only adds \
+its own key and mask, and all players and cards are ranked together as \
+NumPy arrays (see batch_eval.evaluate_states). outs_batch does the same \
+for many spots at once, e.g. every flop a bot is weighing up.
+
+These are next card outs: what one more card does for each player, not \
+draws that need both the turn and the river.
+"""
+
+import numpy as np
+
+from batch_eval import CARD_KEYS, CARD_MASKS, CATEGORIES, evaluate_states
+from Card import CARDS
+from equity import check_spot
+import evaluator
+
+
+def _category_number(category):
+
+    """
+    Accepts a hand category as a number (1 to 9) or a name like "flush".
+    """
+
+    if isinstance(category, str):
+        try:
+            return evaluator.HAND_NAMES.index(category.lower())
+        except ValueError:
+            raise ValueError(f"Unknown hand category {category!r}.") from None
+    return category
+
+def _partial_states(holes, boards):
+
+    """
+    Inputs: Integer arrays of hole cards of shape (S, P, 2) and of boards \
+        of shape (S, k).
+    Outputs: The evaluator keys and card masks of every player's hole \
+        cards plus the board, each of shape (S, P).
+    """
+
+    board_keys = CARD_KEYS[boards].sum(axis = 1) + evaluator.KEY_OFFSET
+    board_masks = np.bitwise_or.reduce(CARD_MASKS[boards], axis = 1)
+    keys = board_keys[:, None] + CARD_KEYS[holes].sum(axis = 2)
+    masks = board_masks[:, None] | CARD_MASKS[holes[:, :, 0]] | CARD_MASKS[holes[:, :, 1]]
+    return keys, masks
+
+def _evaluate(holes, boards, cards):
+
+    """
+    Ranks every player of every spot now and with each card of cards \
+    (shape (S, R)) added, sharing the sums of the board and hole cards.
+    """
+
+    keys, masks = _partial_states(holes, boards)
+    current = evaluate_states(keys, masks)
+    ranks = evaluate_states(keys[:, None, :] + CARD_KEYS[cards][:, :, None],
+                            masks[:, None, :] | CARD_MASKS[cards][:, :, None])
+    return OutsBatch(cards, ranks, current)
+
+
+class OutsBatch:
+
+    def __init__(self, cards, ranks, current):
+
+        """
+        Next card outs of S spots with P players each. cards[s] are the R \
+        card indices left in the deck in spot s, ranks[s, r, p] the rank \
+        player p has if cards[s, r] comes and current[s, p] the rank now. \
+        lead[s, r, p] is True if that card puts player p alone in the \
+        lead, tie if it leaves p sharing it.
+        """
+
+        self.cards = cards
+        self.ranks = ranks
+        self.current = current
+
+        on_top = ranks == ranks.max(axis = 2, keepdims = True)
+        shared = on_top.sum(axis = 2, keepdims = True) > 1
+        self.lead = on_top & ~shared
+        self.tie = on_top & shared
+        self.categories = CATEGORIES[ranks]
+        self.current_categories = CATEGORIES[current]
+
+    def __repr__(self):
+        spots, cards, players = self.ranks.shape
+        return f"Outs of {spots} spots with {players} players and {cards} cards to come"
+
+    def __len__(self):
+        return self.ranks.shape[0]
+
+    def __getitem__(self, spot):
+        return Outs(self, spot)
+
+    def lead_counts(self):
+
+        """
+        Returns an (S, P) array with how many cards put each player alone \
+        in the lead.
+        """
+
+        return self.lead.sum(axis = 1)
+
+    def tie_counts(self):
+        return self.tie.sum(axis = 1)
+
+    def category_counts(self, category):
+
+        """
+        Returns an (S, P) array with how many cards give each player a \
+        hand of the given category (number or name) or better.
+        """
+
+        return (self.categories >= _category_number(category)).sum(axis = 1)
+
+    def improve_counts(self):
+
+        """
+        Returns an (S, P) array with how many cards move each player up \
+        to a better hand category.
+        """
+
+        return (self.categories > self.current_categories[:, None, :]).sum(axis = 1)
+
+
+class Outs:
+
+    def __init__(self, batch, spot = 0, hands = None):
+
+        """
+        The outs of one spot of an OutsBatch. Cards are returned as Cards. \
+        hands are the players' hole cards, only used for printing.
+        """
+
+        self.batch = batch
+        self.spot = spot
+        self.hands = hands
+        self.cards = batch.cards[spot]
+
+    def __repr__(self):
+        return f"Outs of {self.batch.ranks.shape[2]} players with {len(self.cards)} cards to come"
+
+    def _cards(self, selected):
+        return [CARDS[card] for card in self.cards[selected].tolist()]
+
+    def leaders(self):
+
+        """
+        Returns the players with the best hand right now.
+        """
+
+        current = self.batch.current[self.spot]
+        return np.flatnonzero(current == current.max()).tolist()
+
+    def to_lead(self, player):
+
+        """
+        Returns the cards that put the player alone in the lead.
+        """
+
+        return self._cards(self.batch.lead[self.spot, :, player])
+
+    def to_tie(self, player):
+
+        """
+        Returns the cards that leave the player sharing the lead.
+        """
+
+        return self._cards(self.batch.tie[self.spot, :, player])
+
+    def to_category(self, player, category):
+
+        """
+        Returns the cards that give the player a hand of the given \
+        category (number or name, e.g. "flush") or better.
+        """
+
+        return self._cards(self.batch.categories[self.spot, :, player] >= _category_number(category))
+
+    def improving(self, player):
+
+        """
+        Returns the cards that move the player up to a better hand category.
+        """
+
+        categories = self.batch.categories[self.spot, :, player]
+        return self._cards(categories > self.batch.current_categories[self.spot, player])
+
+    def counts(self):
+
+        """
+        Returns a dict per player with the number of cards that put them \
+        in the lead ("lead"), that tie ("tie") and that improve their hand \
+        category ("improve"), and the chance the next card leaves them alone \
+        in the lead ("lead_chance").
+        """
+
+        lead = self.batch.lead[self.spot].sum(axis = 0)
+        tie = self.batch.tie[self.spot].sum(axis = 0)
+        improve = (self.batch.categories[self.spot] > self.batch.current_categories[self.spot]).sum(axis = 0)
+        return [{"lead": int(l), "tie": int(t), "improve": int(i), "lead_chance": float(l / len(self.cards))}
+                for l, t, i in zip(lead, tie, improve)]
+
+    def summary(self):
+
+        """
+        Returns one line per player with their current hand and outs.
+        """
+
+        lines = []
+        for player, count in enumerate(self.counts()):
+            name = self.hands[player] if self.hands is not None else f"Player {player}"
+            category = evaluator.HAND_NAMES[self.batch.current_categories[self.spot, player]]
+            lines.append(f"{name}: {category}, {count['lead']} outs to the lead "
+                         f"({count['lead_chance']:.1%}), {count['tie']} to a tie, {count['improve']} improving")
+        return "\n".join(lines)
+
+
+def outs(hands, board, dead = ()):
+
+    """
+    Inputs: The hole cards of every player (each two Cards or a string \
+        like "AhKd"), a flop or turn board and dead cards that cannot come.
+    Outputs: An Outs with what each card left in the deck does for every player.
+    """
+
+    hands, board, remaining = check_spot(hands, board, dead)
+    if len(board) not in (3, 4):
+        raise ValueError(f"Outs are for the flop and the turn, got a board of {len(board)} cards.")
+    holes = np.array([[[card.index for card in hand] for hand in hands]], dtype = np.int64)
+    boards = np.array([[card.index for card in board]], dtype = np.int64)
+    cards = np.array([remaining], dtype = np.int64)
+
+    return Outs(_evaluate(holes, boards, cards), 0, hands)
+
+def outs_batch(holes, boards):
+
+    """
+    Inputs: An integer array of hole card indices of shape (S, P, 2), P \
+        players in each of S spots, and one of boards of shape (S, 3) or \
+        (S, 4).
+    Outputs: An OutsBatch over every card left in the deck of each spot.
+    """
+
+    holes = np.asarray(holes, dtype = np.int64)
+    boards = np.asarray(boards, dtype = np.int64)
+    if holes.ndim != 3 or holes.shape[2] != 2 or boards.ndim != 2 or boards.shape[0] != holes.shape[0]:
+        raise ValueError(f"Expected hole cards of shape (S, P, 2) and boards of shape (S, k), "
+                         f"got {holes.shape} and {boards.shape}.")
+    if boards.shape[1] not in (3, 4):
+        raise ValueError(f"Outs are for the flop and the turn, got boards of {boards.shape[1]} cards.")
+    spots, players, _ = holes.shape
+    if players == 0:
+        raise ValueError("Every spot needs at least one player.")
+    known = 2 * players + boards.shape[1]
+    if spots == 0:
+        return _evaluate(holes, boards, np.zeros((0, 52 - known), dtype = np.int64))
+
+    used = np.zeros((spots, 52), dtype = bool)
+    rows = np.arange(spots)[:, None]
+    used[rows, holes.reshape(spots, -1)] = True
+    used[rows, boards] = True
+    if (used.sum(axis = 1) != known).any():
+        raise ValueError("Some spot has the same card twice.")
+    cards = np.nonzero(~used)[1].reshape(spots, 52 - known)
+
+    return _evaluate(holes, boards, cards)
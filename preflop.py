@@ -0,0 +1,281 @@
+"""
+Precomputed heads-up preflop all-in equities.
+
+build_tables() works out the equity of every one of the 1326 starting \
+combos against every other one, and of each of the 169 starting hand \
+classes ("AA", "AKs", "72o", ...) against each other, and writes them to \
+one binary file. PreflopTable memory-maps that file, so opening it costs \
+nothing and every process using it shares the same pages.
+
+File layout (native byte order, checked through the byte order mark):
+    16 byte header: magic b"PFEQ", version (uint32), byte order mark \
+        0xFEFF (uint16), 2 unused bytes, number of combos (uint32)
+    1326 x 1326 uint16: equity of row combo against column combo
+    169 x 169 uint16: equity of row class against column class
+Equities are stored as round(equity * 65534). 65535 marks combos that \
+share a card.
+"""
+
+import mmap
+import multiprocessing
+import os
+import struct
+from array import array
+
+from Card import Card, CARDS, RANK_CHARS
+from equity import equity, SUIT_PERMUTATIONS
+import evaluator
+
+TABLE_VERSION = 1
+TABLE_FILE = os.path.join(evaluator.TABLE_DIR, f"preflop_v{TABLE_VERSION}.bin")
+
+MAGIC = b"PFEQ"
+HEADER = struct.Struct("=4sIHxxI")
+SCALE = 65534
+CONFLICT = 65535
+
+#All 1326 two card combos as pairs of card indices (higher index first)
+COMBOS = [(high, low) for high in range(52) for low in range(high)]
+N_COMBOS = len(COMBOS)
+N_CLASSES = 169
+
+#COMBO_INDEX[a][b] is the combo made of cards a and b, in any order
+COMBO_INDEX = [[0] * 52 for _ in range(52)]
+for _i, (_high, _low) in enumerate(COMBOS):
+    COMBO_INDEX[_high][_low] = COMBO_INDEX[_low][_high] = _i
+del _i, _high, _low
+
+
+def class_index(card1, card2):
+
+    """
+    Returns the index of the starting hand class of two card indices, in \
+    the usual 13x13 chart layout: row and column 0 are Aces, pairs are on \
+    the diagonal, suited hands above it and offsuit hands below it.
+    """
+
+    high, low = max(card1 >> 2, card2 >> 2), min(card1 >> 2, card2 >> 2)
+    if (card1 & 3) == (card2 & 3):
+        return (12 - high) * 13 + (12 - low)
+    return (12 - low) * 13 + (12 - high)
+
+def class_name(index):
+
+    """
+    Returns the name of a starting hand class, e.g. "AKs", "QQ" or "72o".
+    """
+
+    row, col = divmod(index, 13)
+    if row == col:
+        return RANK_CHARS[12 - row] * 2
+    if row < col:
+        return RANK_CHARS[12 - row] + RANK_CHARS[12 - col] + "s"
+    return RANK_CHARS[12 - col] + RANK_CHARS[12 - row] + "o"
+
+CLASS_NAMES = [class_name(i) for i in range(N_CLASSES)]
+CLASS_INDEX = {name: i for i, name in enumerate(CLASS_NAMES)}
+COMBO_CLASSES = [class_index(*combo) for combo in COMBOS]
+
+def combo_index(hand):
+
+    """
+    Returns the combo index of a hand given as two Cards, two card \
+    indices or a string like "AhKd".
+    """
+
+    if isinstance(hand, str):
+        hand = (Card.from_str(hand[:2]), Card.from_str(hand[2:]))
+    a, b = (card if isinstance(card, int) else card.index for card in hand)
+    if a == b:
+        raise ValueError("A hand cannot hold the same card twice.")
+    return COMBO_INDEX[a][b]
+
+
+#Where every combo goes under each of the 24 suit permutations
+def _permuted_combos():
+    images = []
+    for perm in SUIT_PERMUTATIONS:
+        images.append([COMBO_INDEX[4*(a >> 2) + perm[a & 3]][4*(b >> 2) + perm[b & 3]]
+                       for a, b in COMBOS])
+    return images
+
+def canonical_matchups():
+
+    """
+    Groups all pairs of combos that share no card into suit isomorphic \
+    classes, counting A vs B and B vs A as the same.
+    Outputs: A dict from the smallest pair (i, j) of every class to a \
+        list of (i, j, swapped) for every pair in it, where swapped means \
+        the pair is the representative with the two hands the other way round.
+    """
+
+    images = _permuted_combos()
+    masks = [CARDS[a].mask | CARDS[b].mask for a, b in COMBOS]
+    classes = {}
+    for i in range(N_COMBOS):
+        for j in range(i + 1, N_COMBOS):
+            if masks[i] & masks[j]:
+                continue
+            best, swapped = None, False
+            for image in images:
+                a, b = image[i], image[j]
+                if best is None or (a, b) < best:
+                    best, swapped = (a, b), False
+                if (b, a) < best:
+                    best, swapped = (b, a), True
+            classes.setdefault(best, []).append((i, j, swapped))
+    return classes
+
+def _matchup_equity(args):
+
+    """
+    Equity of combo i against combo j. Runs in a worker.
+    """
+
+    i, j, trials, seed = args
+    hands = [[CARDS[c] for c in COMBOS[i]], [CARDS[c] for c in COMBOS[j]]]
+    if trials is None:
+        return equity(hands, exact = True).equity[0]
+    return equity(hands, trials = trials, seed = seed, workers = 1).equity[0]
+
+def build_tables(path = TABLE_FILE, workers = None, trials = None, seed = 0):
+
+    """
+    Computes both tables and writes them to path.
+
+    Inputs: workers is the number of processes (default: one per core). \
+        With trials = None every matchup is enumerated exactly, which takes \
+        hours of CPU time for the roughly 47,000 suit isomorphic matchups. \
+        Otherwise each one is estimated from that many random runouts.
+    """
+
+    classes = canonical_matchups()
+    jobs = [(i, j, trials, seed) for i, j in classes]
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers == 1:
+        results = map(_matchup_equity, jobs)
+    else:
+        evaluator.preload()
+        pool = multiprocessing.Pool(workers)
+        results = pool.imap(_matchup_equity, jobs, chunksize = 16)
+
+    combo_table = array("H", [CONFLICT]) * (N_COMBOS * N_COMBOS)
+    try:
+        for members, eq in zip(classes.values(), results):
+            for i, j, swapped in members:
+                eq_i = 1.0 - eq if swapped else eq
+                combo_table[i*N_COMBOS + j] = round(eq_i * SCALE)
+                combo_table[j*N_COMBOS + i] = round((1.0 - eq_i) * SCALE)
+    finally:
+        if workers != 1:
+            pool.terminate()
+
+    #A class against a class is the average over all their combos that \
+    #can be dealt together
+    sums = [0.0] * (N_CLASSES * N_CLASSES)
+    counts = [0] * (N_CLASSES * N_CLASSES)
+    for i in range(N_COMBOS):
+        row = i * N_COMBOS
+        class_row = COMBO_CLASSES[i] * N_CLASSES
+        for j in range(N_COMBOS):
+            value = combo_table[row + j]
+            if value != CONFLICT:
+                sums[class_row + COMBO_CLASSES[j]] += value
+                counts[class_row + COMBO_CLASSES[j]] += 1
+    class_table = array("H", [round(s / c) if c else CONFLICT for s, c in zip(sums, counts)])
+
+    os.makedirs(os.path.dirname(path), exist_ok = True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, TABLE_VERSION, 0xFEFF, N_COMBOS))
+        combo_table.tofile(f)
+        class_table.tofile(f)
+    os.replace(tmp_path, path)
+
+
+class PreflopTable:
+
+    def __init__(self, path = TABLE_FILE):
+
+        """
+        Memory-maps a table file written by build_tables. Raises \
+        FileNotFoundError if it has not been built yet and ValueError if \
+        the file is not a table of this version.
+        """
+
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+
+        magic, version, bom, n_combos = HEADER.unpack_from(self._mmap)
+        size = HEADER.size + 2 * (N_COMBOS * N_COMBOS + N_CLASSES * N_CLASSES)
+        if magic != MAGIC or version != TABLE_VERSION or n_combos != N_COMBOS or len(self._mmap) != size:
+            raise ValueError(f"{path} is not a version {TABLE_VERSION} preflop table.")
+        if bom != 0xFEFF:
+            raise ValueError(f"{path} was built on a machine with a different byte order.")
+
+        self._values = memoryview(self._mmap)[HEADER.size:].cast("H")
+        self.combo_values = self._values[:N_COMBOS * N_COMBOS]
+        self.class_values = self._values[N_COMBOS * N_COMBOS:]
+
+    def combo_equity(self, hand1, hand2):
+
+        """
+        Inputs: Two hands, each two Cards, two card indices or a string \
+            like "AhKd".
+        Outputs: The all-in preflop equity of hand1 against hand2.
+        """
+
+        value = self.combo_values[combo_index(hand1) * N_COMBOS + combo_index(hand2)]
+        if value == CONFLICT:
+            raise ValueError(f"{hand1} and {hand2} share a card.")
+        return value / SCALE
+
+    def class_equity(self, class1, class2):
+
+        """
+        Inputs: Two starting hand classes, by name ("AKs") or index.
+        Outputs: The average all-in equity of class1 against class2 over \
+            all their combos that do not share a card.
+        """
+
+        if isinstance(class1, str):
+            class1 = CLASS_INDEX[class1]
+        if isinstance(class2, str):
+            class2 = CLASS_INDEX[class2]
+        return self.class_values[class1 * N_CLASSES + class2] / SCALE
+
+    def class_matrix(self):
+
+        """
+        Returns the 169 x 169 class equities as a list of rows.
+        """
+
+        return [[value / SCALE for value in self.class_values[row*N_CLASSES:(row + 1)*N_CLASSES]]
+                for row in range(N_CLASSES)]
+
+    def close(self):
+        self.combo_values.release()
+        self.class_values.release()
+        self._values.release()
+        self._mmap.close()
+
+
+_default_table = None
+
+def default_table():
+
+    """
+    Returns the PreflopTable at TABLE_FILE, opening it on first use.
+    """
+
+    global _default_table
+    if _default_table is None:
+        _default_table = PreflopTable()
+    return _default_table
+
+
+if __name__ == "__main__":
+
+    build_tables()
@@ -0,0 +1,443 @@
+"""
+Push/fold equilibria for short stacks.
+
+With a short stack, preflop play comes down to going all-in or folding \
+when everyone folds to you, and calling or folding when someone shoves. \
+solve works out equilibrium shove and call ranges for that game, heads-up \
+or at a full table, for given stacks, blinds and ante:
+
+    chart = solve(6, stack = 10, blinds = (0.5, 1), ante = 0.1)
+    print(chart.grid("BTN"))
+    chart.should_push("BTN", "K9o")          # O(1) lookups for bots
+    chart.should_call("BB", "BTN", "A5o")
+
+Strategies are 169 numbers per decision, the frequency of shoving (or \
+calling) with every starting hand class. Every iteration computes the \
+best response of every player to the current average strategies with a \
+few 169 x 169 matrix products and folds it into the average (fictitious \
+play), which converges to an equilibrium of the push/fold game.
+
+The model is the usual one of push/fold charts: the first player to shove \
+goes all-in for the full stack, later players call or fold, and once \
+someone called everyone behind folds (no overcalls), so every pot is \
+decided between two hands. The hands of players who folded are not taken \
+out of the deck. Equities are the all-in class against class equities of \
+preflop.PreflopTable if its file has been built, else a Monte Carlo \
+estimate (see class_equities).
+"""
+
+import json
+import os
+
+import numpy as np
+
+from batch_eval import evaluate_batch
+import evaluator
+from preflop import CLASS_INDEX, CLASS_NAMES, N_CLASSES, N_COMBOS, class_index
+import preflop
+from ranges import CLASS_COMBOS, COMBO_CARDS, COMBO_MASKS, Range
+
+#Position names in the order they act preflop, of a 10 player table
+POSITION_NAMES = ["UTG", "UTG+1", "UTG+2", "UTG+3", "LJ", "HJ", "CO", "BTN", "SB", "BB"]
+
+#Number of combos of every class, and the combos as a padded array
+CLASS_SIZES = np.array([len(combos) for combos in CLASS_COMBOS], dtype = np.int64)
+_PADDED_COMBOS = np.zeros((N_CLASSES, 12), dtype = np.int64)
+for _class, _combos in enumerate(CLASS_COMBOS):
+    _PADDED_COMBOS[_class, :len(_combos)] = _combos
+del _class, _combos
+
+
+def position_names(players):
+
+    """
+    Returns the names of the positions of a table of players players, in \
+    the order they act preflop (the blinds last).
+    """
+
+    if not 2 <= players <= len(POSITION_NAMES):
+        raise ValueError(f"Push/fold tables have 2 to {len(POSITION_NAMES)} players.")
+    return POSITION_NAMES[-players:]
+
+def _hand_class(hand):
+
+    """
+    Returns the class index of a hand given as a class name ("AKs"), a \
+    class index, or two Cards or card indices.
+    """
+
+    if isinstance(hand, str):
+        return CLASS_INDEX[hand]
+    if isinstance(hand, int):
+        return hand
+    a, b = (card if isinstance(card, int) else card.index for card in hand)
+    return class_index(a, b)
+
+
+def combo_pairs():
+
+    """
+    Returns a 169 x 169 array whose entry [i, j] is the number of combos \
+    of class j that do not share a card with a given combo of class i.
+    """
+
+    onehot = np.zeros((N_COMBOS, N_CLASSES))
+    onehot[np.arange(N_COMBOS), preflop.COMBO_CLASSES] = 1
+    compatible = ((COMBO_MASKS[:, None] & COMBO_MASKS[None, :]) == 0).astype(np.float64)
+    return (onehot.T @ compatible @ onehot) / CLASS_SIZES[:, None]
+
+def estimate_class_equities(trials = 1000, seed = 0, chunk = 64):
+
+    """
+    Estimates the all-in equity of every class against every other one \
+    from trials random deals (combos of both classes and a board) per pair \
+    of classes, evaluated with batch_eval. Takes about 20 seconds for the \
+    default 1000 trials, which is accurate to around 1.5 percent.
+    Outputs: A 169 x 169 array, equity of the row class against the column class.
+    """
+
+    rng = np.random.default_rng(seed)
+    matrix = np.full((N_CLASSES, N_CLASSES), 0.5)
+    first, second = np.triu_indices(N_CLASSES, 1)
+
+    for start in range(0, len(first), chunk):
+        class1 = np.repeat(first[start:start + chunk], trials)
+        class2 = np.repeat(second[start:start + chunk], trials)
+        rows = len(class1)
+        combo1 = _PADDED_COMBOS[class1, (rng.random(rows) * CLASS_SIZES[class1]).astype(np.int64)]
+        combo2 = _PADDED_COMBOS[class2, (rng.random(rows) * CLASS_SIZES[class2]).astype(np.int64)]
+        #Deal the second hand again wherever the two share a card
+        clash = np.flatnonzero(COMBO_MASKS[combo1] & COMBO_MASKS[combo2])
+        while len(clash):
+            redeal = class2[clash]
+            combo2[clash] = _PADDED_COMBOS[redeal, (rng.random(len(clash)) * CLASS_SIZES[redeal]).astype(np.int64)]
+            clash = clash[(COMBO_MASKS[combo1[clash]] & COMBO_MASKS[combo2[clash]]) != 0]
+
+        hole1, hole2 = COMBO_CARDS[combo1], COMBO_CARDS[combo2]
+        keys = rng.random((rows, 52), dtype = np.float32)
+        for hole in (hole1, hole2):
+            keys[np.arange(rows)[:, None], hole] = 2
+        board = np.argpartition(keys, 5, axis = 1)[:, :5]
+
+        ranks1 = evaluate_batch(np.concatenate([hole1, board], axis = 1))[0]
+        ranks2 = evaluate_batch(np.concatenate([hole2, board], axis = 1))[0]
+        scores = (ranks1 > ranks2) + 0.5 * (ranks1 == ranks2)
+        equities = scores.reshape(-1, trials).mean(axis = 1)
+        pairs = slice(start, start + chunk)
+        matrix[first[pairs], second[pairs]] = equities
+        matrix[second[pairs], first[pairs]] = 1 - equities
+    return matrix
+
+def class_equities(table = None, trials = 1000, seed = 0):
+
+    """
+    Returns the 169 x 169 class equity matrix as an array: from table (a \
+    PreflopTable) if given, else from the preflop table file if it has \
+    been built, else estimate_class_equities(trials, seed), which is saved \
+    next to the evaluator tables so it only has to run once.
+    """
+
+    if table is None and os.path.exists(preflop.TABLE_FILE):
+        table = preflop.default_table()
+    if table is not None:
+        return np.array(table.class_matrix())
+
+    path = os.path.join(evaluator.TABLE_DIR, f"class_equities_{trials}_{seed}.npy")
+    if os.path.exists(path):
+        return np.load(path)
+    matrix = estimate_class_equities(trials, seed)
+    os.makedirs(evaluator.TABLE_DIR, exist_ok = True)
+    np.save(path, matrix)
+    return matrix
+
+
+def solve(players = 2, stack = 10, blinds = (0.5, 1), ante = 0, equities = None,
+          iterations = 2000, tolerance = 1e-3):
+
+    """
+    Inputs: The number of players (2 to 10), the stack of every player \
+        before posting anything (one number, or a list in the order the \
+        players act preflop), the small and big blind, the ante everyone \
+        posts, the class equity matrix (default: class_equities()), the \
+        most iterations to run and how little the average strategies may \
+        change in the last one to stop early.
+    Outputs: A PushFoldChart with the equilibrium strategies.
+
+    Stacks, blinds and ante can be in chips or big blinds, as long as they \
+    are in the same unit. Each call between two players risks the smaller \
+    of their stacks.
+    """
+
+    names = position_names(players)
+    stacks = np.broadcast_to(np.asarray(stack, dtype = np.float64), (players,)).copy()
+    if equities is None:
+        equities = class_equities()
+    equities = np.asarray(equities, dtype = np.float64)
+
+    #What everyone has in the pot before acting, capped at their stack
+    posted = np.full(players, float(ante))
+    posted[-2] += blinds[0]
+    posted[-1] += blinds[1]
+    posted = np.minimum(posted, stacks)
+    total_posted = posted.sum()
+
+    weights = combo_pairs()
+    weight_sums = weights.sum(axis = 1)
+
+    #payoff[p][q] weighs what the row class wins against the column class
+    #when the two get all-in, by how often the two are dealt together
+    payoff = {}
+    for p in range(players):
+        for q in range(p + 1, players):
+            risked = min(stacks[p], stacks[q])
+            pot = 2 * risked + total_posted - posted[p] - posted[q]
+            payoff[p, q] = weights * (equities * pot - risked)
+            payoff[q, p] = weights * (equities * pot - risked)
+
+    push = np.full((players, N_CLASSES), 0.5)
+    call = np.full((players, players, N_CLASSES), 0.5)
+
+    def best_responses(push, call):
+
+        """
+        Returns the best responses to the given strategies, and the \
+        expected value of pushing, calling and folding for every class.
+        """
+
+        push_ev = np.zeros((players, N_CLASSES))
+        call_ev = np.zeros((players, players, N_CLASSES))
+        for p in range(players - 1):
+            #Chance everyone between the pusher and the caller folded
+            reach = np.ones(N_CLASSES)
+            for q in range(p + 1, players):
+                push_ev[p] += reach * (payoff[p, q] @ call[p, q]) / weight_sums
+                reach *= 1 - (weights @ call[p, q]) / weight_sums
+
+                facing = weights @ push[p]
+                call_ev[p, q] = np.divide(payoff[q, p] @ push[p], facing,
+                                          out = np.full(N_CLASSES, -np.inf), where = facing > 0)
+            push_ev[p] += reach * (total_posted - posted[p])
+        #Everyone folds to the big blind, who has nothing to decide
+        push_ev[-1] = total_posted - posted[-1]
+        fold_ev = -posted
+        push_br = (push_ev > fold_ev[:, None]).astype(np.float64)
+        call_br = (call_ev > fold_ev[None, :, None]).astype(np.float64)
+        return push_br, call_br, push_ev, call_ev, fold_ev
+
+    #Only players after the pusher call, so call[p][q] matters for q > p
+    live = np.tri(players, players, -1, dtype = bool).T
+    change = np.inf
+    iteration = 0
+    while iteration < iterations and change > tolerance:
+        iteration += 1
+        push_br, call_br, *_ = best_responses(push, call)
+        step = 1 / (iteration + 1)
+        new_push = push + step * (push_br - push)
+        new_call = np.where(live[:, :, None], call + step * (call_br - call), 0)
+        change = max(np.abs(new_push - push).max(), np.abs(new_call - call).max())
+        push, call = new_push, new_call
+
+    #How much a best response would gain at the worst decision, per hand
+    #dealt, in the unit of the stacks
+    _, _, push_ev, call_ev, fold_ev = best_responses(push, call)
+    prior = CLASS_SIZES / N_COMBOS
+    regret = []
+    for p in range(players - 1):
+        played = push[p] * push_ev[p] + (1 - push[p]) * fold_ev[p]
+        regret.append(prior @ (np.maximum(push_ev[p], fold_ev[p]) - played))
+        for q in range(p + 1, players):
+            if push[p].any():
+                ev = np.maximum(call_ev[p, q], fold_ev[q])
+                played = call[p, q] * call_ev[p, q] + (1 - call[p, q]) * fold_ev[q]
+                regret.append(prior @ np.where(np.isfinite(ev), ev - played, 0))
+    push[-1] = 0
+
+    return PushFoldChart(names, stacks.tolist(), blinds, ante, push, call,
+                         iteration, max(regret))
+
+
+class PushFoldChart:
+
+    def __init__(self, positions, stacks, blinds, ante, push, call, iterations = 0,
+                 exploitability = 0.0):
+
+        """
+        Push/fold strategies for one table. push[p][c] is how often the \
+        player in position p shoves class c when folded to, call[p][q][c] \
+        how often the player in position q calls a shove from position p \
+        with class c (positions in the order they act, see positions). \
+        exploitability is how much the best response to the strategies \
+        gains at the worst decision, per hand dealt, in the stack unit.
+        """
+
+        self.positions = list(positions)
+        self.players = len(self.positions)
+        self.stacks = list(stacks)
+        self.blinds = tuple(blinds)
+        self.ante = ante
+        self.push = np.asarray(push, dtype = np.float64)
+        self.call = np.asarray(call, dtype = np.float64)
+        self.iterations = iterations
+        self.exploitability = exploitability
+
+        #Plain nested lists of bools, for cheap lookups at the table
+        self._push_lookup = (self.push >= 0.5).tolist()
+        self._call_lookup = (self.call >= 0.5).tolist()
+
+    def __repr__(self):
+        return (f"Push/fold chart for {self.players} players, stacks {self.stacks}, blinds "
+                f"{self.blinds}, ante {self.ante} (exploitability {self.exploitability:.4f})")
+
+    def position(self, position):
+
+        """
+        Returns the index of a position given by name ("BTN") or index.
+        """
+
+        return self.positions.index(position) if isinstance(position, str) else position
+
+    def should_push(self, position, hand):
+
+        """
+        Inputs: A position (name or index) and a hand (a class name like \
+            "AKs", a class index, or two Cards or card indices).
+        Outputs: True if the hand shoves at least half the time when \
+            everyone before folded.
+        """
+
+        return self._push_lookup[self.position(position)][_hand_class(hand)]
+
+    def should_call(self, position, pusher, hand):
+
+        """
+        True if the player in position calls a shove from pusher with hand \
+        at least half the time, see should_push.
+        """
+
+        return self._call_lookup[self.position(pusher)][self.position(position)][_hand_class(hand)]
+
+    def push_range(self, position):
+
+        """
+        Returns the shoving range of a position as a ranges.Range, every \
+        combo weighted by how often its class shoves.
+        """
+
+        return self._range(self.push[self.position(position)])
+
+    def call_range(self, position, pusher):
+        return self._range(self.call[self.position(pusher), self.position(position)])
+
+    def _range(self, frequencies):
+        weights = {}
+        names = []
+        for c in np.flatnonzero(frequencies >= 0.005):
+            names.append(CLASS_NAMES[c] if frequencies[c] >= 0.995 else f"{CLASS_NAMES[c]}:{frequencies[c]:.2f}")
+            for combo in CLASS_COMBOS[c]:
+                weights[combo] = float(frequencies[c])
+        return Range(weights, ", ".join(names))
+
+    def share(self, position, pusher = None):
+
+        """
+        Returns the share of all combos that shove from position (or call \
+        a shove from pusher there).
+        """
+
+        frequencies = self.push[self.position(position)] if pusher is None else \
+                      self.call[self.position(pusher), self.position(position)]
+        return float(CLASS_SIZES @ frequencies / N_COMBOS)
+
+    def grid(self, position, pusher = None):
+
+        """
+        Returns the shoving (or calling, if pusher is given) strategy of a \
+        position as a 13 x 13 text chart: aces in the first row and column, \
+        suited hands above the diagonal, "#" for hands played at least half \
+        the time and "." for the others.
+        """
+
+        frequencies = self.push[self.position(position)] if pusher is None else \
+                      self.call[self.position(pusher), self.position(position)]
+        lines = []
+        for row in range(13):
+            lines.append(" ".join(f"{CLASS_NAMES[row*13 + col]:>3}" if frequencies[row*13 + col] >= 0.5
+                                  else "  ." for col in range(13)))
+        return "\n".join(lines)
+
+    def to_dict(self):
+
+        """
+        Returns the chart as a dict that can be turned into JSON, with the \
+        strategies keyed by position and class name.
+        """
+
+        return {"positions": self.positions, "stacks": self.stacks, "blinds": list(self.blinds),
+                "ante": self.ante, "iterations": self.iterations,
+                "exploitability": float(self.exploitability),
+                "push": {name: dict(zip(CLASS_NAMES, self.push[p].round(4).tolist()))
+                         for p, name in enumerate(self.positions)},
+                "call": {pusher: {name: dict(zip(CLASS_NAMES, self.call[p, q].round(4).tolist()))
+                                  for q, name in enumerate(self.positions) if q > p}
+                         for p, pusher in enumerate(self.positions)}}
+
+    @classmethod
+    def from_dict(cls, data):
+        positions = data["positions"]
+        n = len(positions)
+        push = np.zeros((n, N_CLASSES))
+        call = np.zeros((n, n, N_CLASSES))
+        for p, pusher in enumerate(positions):
+            push[p] = [data["push"][pusher][name] for name in CLASS_NAMES]
+            for q, name in enumerate(positions):
+                if name in data["call"].get(pusher, {}):
+                    call[p, q] = [data["call"][pusher][name][c] for c in CLASS_NAMES]
+        return cls(positions, data["stacks"], data["blinds"], data["ante"], push, call,
+                   data.get("iterations", 0), data.get("exploitability", 0.0))
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+class PushFoldBot:
+
+    def __init__(self, *charts):
+
+        """
+        A decision provider that plays preflop by the given charts, using \
+        the one for the number of players at the table. It shoves or \
+        folds when nobody has raised, calls or folds when someone has, and \
+        checks or calls after the flop. Tables without a chart check or fold.
+        """
+
+        self.charts = {chart.players: chart for chart in charts}
+
+    def __call__(self, player, game):
+        highest_bet = max(game.bets)
+        can_check = highest_bet == player.bet
+        chart = self.charts.get(game.players_num)
+        if game.board or chart is None:
+            return ("c", 0) if can_check or game.board else ("f", 0)
+
+        #Positions act from 2 on, the blinds (0 and 1) last
+        n = game.players_num
+        position = (player.position - 2) % n
+        hand = class_index(player.hole_cards[0].index, player.hole_cards[1].index)
+        opened = game.ante + game.blinds[1]
+        raisers = [(p.position - 2) % n for p in game.players
+                   if p is not player and game.bets[p.position] > opened]
+
+        if not raisers:
+            if chart.should_push(position, hand):
+                return ("r", player.bet + player.chips)
+            return ("c", 0) if can_check else ("f", 0)
+        pusher = min(raisers)
+        if pusher < position and chart.should_call(position, pusher, hand):
+            return ("c", 0)
+        return ("f", 0)
@@ -0,0 +1,472 @@
+"""
+Hand ranges and range against range equity.
+
+parse_range turns the usual shorthand into a Range, a weight for each of \
+the 1326 starting combos:
+
+    "QQ+, AKs, 65s"          pairs from queens up, plus two suited hands
+    "A2s+, KTo+"             A2s to AKs, KTo to KQo
+    "99-66, KQs-KTs"         everything in between
+    "AK"                     suited and offsuit
+    "AhKd"                   a single combo
+    "AQs:0.5, any"           a weight after the colon (default 1), "any" \
+                             for every hand
+
+range_equity works out how two or more ranges do against each other on \
+a board. Combos that share a card with the board, the dead cards or each \
+other are left out, so every pair of combos counts in proportion to the \
+product of their weights times the number of runouts they can see.
+
+Two ranges are compared as weighted combo matrices with NumPy, one runout \
+at a time: sorting one range by rank gives how much weight every combo \
+of the other range beats or ties, and the few pairs of combos that share \
+a card are taken back out afterwards. From the flop on every runout is \
+walked; before it, runouts are sampled, unless a preflop table is passed \
+in (see preflop). More than two ranges are estimated by sampling combos \
+and runouts.
+"""
+
+import re
+from itertools import combinations
+from math import comb
+
+import numpy as np
+
+from batch_eval import evaluate_batch
+from Card import CARDS, RANK_CHARS, to_cards
+from equity import EquityResult
+from preflop import (CLASS_INDEX, COMBO_CLASSES, COMBO_INDEX, COMBOS, CONFLICT, N_CLASSES, N_COMBOS,
+                     SCALE, combo_index)
+
+#Combos of every starting hand class
+CLASS_COMBOS = [[] for _ in range(N_CLASSES)]
+for _combo, _class in enumerate(COMBO_CLASSES):
+    CLASS_COMBOS[_class].append(_combo)
+del _combo, _class
+
+#Cards of every combo as an (N_COMBOS, 2) array and as 52 bit masks
+COMBO_CARDS = np.array(COMBOS, dtype = np.int64)
+COMBO_MASKS = (np.uint64(1) << COMBO_CARDS[:, 0].astype(np.uint64)) | \
+              (np.uint64(1) << COMBO_CARDS[:, 1].astype(np.uint64))
+
+#Runouts of 2-range equity are walked exactly if there are at most this many
+MAX_EXACT_RUNOUTS = 50_000
+
+#Hands ranked at once by 2-range equity, which bounds its memory use
+_CHUNK_HANDS = 1 << 20
+
+_CLASS_TOKEN = re.compile(r"^([2-9TJQKA])([2-9TJQKA])([so]?)(\+?)$")
+_SPAN_TOKEN = re.compile(r"^([2-9TJQKA])([2-9TJQKA])([so]?)-([2-9TJQKA])([2-9TJQKA])([so]?)$")
+_COMBO_TOKEN = re.compile(r"^([2-9TJQKA][hdsc]){2}$")
+
+
+class Range:
+
+    def __init__(self, weights = None, text = None):
+
+        """
+        A weight between 0 and 1 for each starting combo. weights is a \
+        dict from combo index (see preflop.COMBOS) to weight; combos not \
+        in it have weight 0.
+        """
+
+        self.weights = {combo: w for combo, w in (weights or {}).items() if w > 0}
+        self.text = text
+
+    def __repr__(self):
+        if self.text is not None:
+            return self.text
+        return f"Range of {len(self)} combos"
+
+    def __len__(self):
+        return len(self.weights)
+
+    def __contains__(self, hand):
+        return self.weight(hand) > 0
+
+    def weight(self, hand):
+
+        """
+        Returns the weight of a combo, given by index or as in preflop.combo_index.
+        """
+
+        if not isinstance(hand, int):
+            hand = combo_index(hand)
+        return self.weights.get(hand, 0.0)
+
+    def total_weight(self):
+        return sum(self.weights.values())
+
+    def without(self, cards):
+
+        """
+        Returns the range without the combos that hold any of the given \
+        cards (Cards or a string like "AhKd7c").
+        """
+
+        mask = sum(card.mask for card in to_cards(cards))
+        return Range({combo: w for combo, w in self.weights.items()
+                      if not (CARDS[COMBOS[combo][0]].mask | CARDS[COMBOS[combo][1]].mask) & mask},
+                     self.text)
+
+    def arrays(self):
+
+        """
+        Returns the combo indices and weights as two NumPy arrays.
+        """
+
+        combos = np.array(sorted(self.weights), dtype = np.int64)
+        weights = np.array([self.weights[c] for c in combos.tolist()], dtype = np.float64)
+        return combos, weights
+
+
+def _class_name(high, low, suffix):
+    if high == low:
+        return RANK_CHARS[high] * 2
+    return RANK_CHARS[high] + RANK_CHARS[low] + suffix
+
+def _expand(high, low, suffix):
+
+    """
+    Returns the class names of a hand like "AK" (both kinds), "AKs" or "QQ".
+    """
+
+    if high < low:
+        high, low = low, high
+    if high == low:
+        if suffix:
+            raise ValueError(f"A pair cannot be suited or offsuit: {RANK_CHARS[high]*2}{suffix}.")
+        return [_class_name(high, low, "")]
+    return [_class_name(high, low, s) for s in (suffix or "so")]
+
+def _parse_token(token):
+
+    """
+    Returns the combos one comma separated part of a range stands for.
+    """
+
+    if token.lower() in ("any", "random", "100%"):
+        return list(range(N_COMBOS))
+
+    combo = "".join(char.lower() if i % 2 else char.upper() for i, char in enumerate(token))
+    if _COMBO_TOKEN.match(combo):
+        a = 4*RANK_CHARS.index(combo[0]) + "hdsc".index(combo[1])
+        b = 4*RANK_CHARS.index(combo[2]) + "hdsc".index(combo[3])
+        if a == b:
+            raise ValueError(f"A hand cannot hold the same card twice: {token}.")
+        return [COMBO_INDEX[a][b]]
+
+    #Ranks in upper case, the s and o suffixes in lower case
+    normalized = token.upper().replace("S", "s").replace("O", "o")
+    names = []
+    match = _CLASS_TOKEN.match(normalized)
+    span = _SPAN_TOKEN.match(normalized)
+    if match:
+        high, low = RANK_CHARS.index(match[1]), RANK_CHARS.index(match[2])
+        suffix, plus = match[3], match[4]
+        if high < low:
+            high, low = low, high
+        if not plus:
+            names = _expand(high, low, suffix)
+        elif high == low:
+            names = [name for r in range(high, 13) for name in _expand(r, r, suffix)]
+        else:
+            names = [name for kicker in range(low, high) for name in _expand(high, kicker, suffix)]
+    elif span:
+        first = sorted((RANK_CHARS.index(span[1]), RANK_CHARS.index(span[2])), reverse = True)
+        last = sorted((RANK_CHARS.index(span[4]), RANK_CHARS.index(span[5])), reverse = True)
+        if span[3] != span[6]:
+            raise ValueError(f"Both ends of {token} need the same suffix.")
+        suffix = span[3]
+        if first[0] == first[1] and last[0] == last[1]:
+            low, high = sorted((first[0], last[0]))
+            names = [_class_name(r, r, "") for r in range(low, high + 1)]
+        elif first[0] == last[0] and first[0] not in (first[1], last[1]):
+            low, high = sorted((first[1], last[1]))
+            names = [name for kicker in range(low, high + 1) for name in _expand(first[0], kicker, suffix)]
+        else:
+            raise ValueError(f"{token} is neither a span of pairs nor of hands with the same high card.")
+    else:
+        raise ValueError(f"Could not read {token!r} as part of a range.")
+
+    return [combo for name in names for combo in CLASS_COMBOS[CLASS_INDEX[name]]]
+
+def parse_range(text):
+
+    """
+    Inputs: A range in the shorthand described at the top of this module. \
+        Later parts override the weights of earlier ones, so "any, 72o:0" \
+        is every hand but 72o.
+    Outputs: A Range.
+    """
+
+    weights = {}
+    for token in re.split(r"[,\s]+", text.strip()):
+        if not token:
+            continue
+        weight = 1.0
+        if ":" in token:
+            token, weight_text = token.split(":", 1)
+            weight = float(weight_text)
+            if not 0.0 <= weight <= 1.0:
+                raise ValueError(f"Weights go from 0 to 1, got {weight_text}.")
+        for combo in _parse_token(token):
+            weights[combo] = weight
+    return Range(weights, text.strip())
+
+def _to_range(hand_range):
+    if isinstance(hand_range, Range):
+        return hand_range
+    if isinstance(hand_range, str):
+        return parse_range(hand_range)
+    return Range(dict(hand_range))
+
+
+def _runouts(remaining, to_deal, max_runouts, rng):
+
+    """
+    Returns an array with one runout per row: every runout if there are \
+    at most max_runouts, else max_runouts random ones.
+    """
+
+    if to_deal == 0:
+        return np.zeros((1, 0), dtype = np.int64), True
+    if comb(len(remaining), to_deal) <= max_runouts:
+        return np.array(list(combinations(remaining, to_deal)), dtype = np.int64), True
+    keys = rng.random((max_runouts, len(remaining)))
+    picks = np.argpartition(keys, to_deal, axis = 1)[:, :to_deal]
+    return np.asarray(remaining, dtype = np.int64)[picks], False
+
+def _combo_ranks(combos, board, runouts):
+
+    """
+    Outputs: An (n_runouts, n_combos) array with the rank of every combo \
+        on every runout, -1 where the combo shares a card with the runout.
+    """
+
+    runout_masks = np.zeros(len(runouts), dtype = np.uint64)
+    for col in range(runouts.shape[1]):
+        runout_masks |= np.uint64(1) << runouts[:, col].astype(np.uint64)
+    alive = (runout_masks[:, None] & COMBO_MASKS[combos][None, :]) == 0
+
+    rows, cols = np.nonzero(alive)
+    board_cards = np.broadcast_to(np.asarray(board, dtype = np.int64), (len(rows), len(board)))
+    cards = np.concatenate([COMBO_CARDS[combos][cols], board_cards, runouts[rows]], axis = 1)
+    ranks = np.full(alive.shape, -1, dtype = np.int16)
+    ranks[rows, cols] = evaluate_batch(cards)[0]
+    return ranks
+
+def _two_range_equity(ranges, board, remaining, max_runouts, rng):
+
+    """
+    Equity of two ranges as a weighted combo matrix, one runout at a time. \
+    The runouts are ranked in chunks of about _CHUNK_HANDS hands, only the \
+    totals per runout and per combo are kept.
+    """
+
+    (combos1, weights1), (combos2, weights2) = (r.arrays() for r in ranges)
+    to_deal = 5 - len(board)
+    runouts, exact = _runouts(remaining, to_deal, max_runouts, rng)
+
+    #Pairs of combos that share a card, counted by the sort and taken back out
+    conflict1, conflict2 = np.nonzero((COMBO_MASKS[combos1][:, None] & COMBO_MASKS[combos2][None, :]) != 0)
+
+    #Weight won, tied and faced by range 1 on every runout, and by every
+    #combo of range 1 over all runouts
+    n = len(runouts)
+    win_r = np.zeros(n)
+    tie_r = np.zeros(n)
+    faced_total = np.zeros(n)
+    combo_wins = np.zeros(len(combos1))
+    combo_ties = np.zeros(len(combos1))
+    combo_faced = np.zeros(len(combos1))
+
+    chunk = max(1, _CHUNK_HANDS // (len(combos1) + len(combos2)))
+    for start in range(0, n, chunk):
+        part = runouts[start:start + chunk]
+        ranks1 = _combo_ranks(combos1, board, part)
+        ranks2 = _combo_ranks(combos2, board, part)
+        for r in range(len(part)):
+            rank1, rank2 = ranks1[r], ranks2[r]
+            alive1 = np.where(rank1 >= 0, weights1, 0.0)
+            alive2 = np.where(rank2 >= 0, weights2, 0.0)
+
+            order = np.argsort(rank2, kind = "stable")
+            sorted_ranks = rank2[order]
+            cumulative = np.concatenate(([0.0], np.cumsum(alive2[order])))
+            below = cumulative[np.searchsorted(sorted_ranks, rank1, "left")]
+            up_to = cumulative[np.searchsorted(sorted_ranks, rank1, "right")]
+
+            #Dead combos of range 2 have rank -1 and weight 0, so they never count
+            win = below
+            tie = up_to - below
+            face = np.full(len(combos1), cumulative[-1])
+
+            conflict_weight = alive2[conflict2]
+            diff = rank1[conflict1] - rank2[conflict2]
+            win = alive1 * (win - np.bincount(conflict1, conflict_weight * (diff > 0), len(combos1)))
+            tie = alive1 * (tie - np.bincount(conflict1, conflict_weight * (diff == 0), len(combos1)))
+            face = alive1 * (face - np.bincount(conflict1, conflict_weight, len(combos1)))
+
+            win_r[start + r] = win.sum()
+            tie_r[start + r] = tie.sum()
+            faced_total[start + r] = face.sum()
+            combo_wins += win
+            combo_ties += tie
+            combo_faced += face
+
+    #Totals per runout, scaled so their mean is the equity
+    scale = faced_total.mean()
+    if scale == 0:
+        raise ValueError("The ranges have no combos that can be dealt together on this board.")
+    win_r /= scale
+    tie_r /= scale
+    lose_r = faced_total / scale - win_r - tie_r
+    share1 = win_r + tie_r / 2
+    share2 = lose_r + tie_r / 2
+
+    result = EquityResult(ranges, n, [win_r.sum(), lose_r.sum()], [tie_r.sum(), tie_r.sum()],
+                          [share1.sum(), share2.sum()],
+                          [(share1**2).sum(), (share2**2).sum()], exact = exact)
+
+    #Equity of every combo of range 1 against all of range 2
+    combo_equity = (combo_wins + combo_ties / 2) / np.where(combo_faced > 0, combo_faced, 1)
+    result.combo_equity = {int(combo): float(eq) for combo, eq, f
+                           in zip(combos1, combo_equity, combo_faced) if f > 0}
+    return result
+
+def _table_equity(ranges, table):
+
+    """
+    Preflop equity of two ranges from the combo against combo equities of \
+    a PreflopTable, every pair of combos that can be dealt together \
+    weighted by the product of their weights.
+    """
+
+    (combos1, weights1), (combos2, weights2) = (r.arrays() for r in ranges)
+    values = np.asarray(table.combo_values).reshape(N_COMBOS, N_COMBOS)[np.ix_(combos1, combos2)]
+    pair_weights = np.where(values != CONFLICT, weights1[:, None] * weights2[None, :], 0.0)
+    equities = values / SCALE
+
+    combo_faced = pair_weights.sum(axis = 1)
+    if combo_faced.sum() == 0:
+        raise ValueError("The ranges have no combos that can be dealt together.")
+    combo_shares = (pair_weights * equities).sum(axis = 1)
+    share1 = combo_shares.sum() / combo_faced.sum()
+
+    #The table only holds equities, so win is the equity and tie is 0, and
+    #as the result is exact there is no spread of shares to keep. Every
+    #pair of combos sees all boards of the 48 cards they leave
+    boards = comb(48, 5)
+    shares = [share1 * boards, (1 - share1) * boards]
+    result = EquityResult(ranges, boards, shares, [0.0, 0.0], shares, [0.0, 0.0], exact = True)
+    combo_equity = combo_shares / np.where(combo_faced > 0, combo_faced, 1)
+    result.combo_equity = {int(combo): float(eq) for combo, eq, f
+                           in zip(combos1, combo_equity, combo_faced) if f > 0}
+    return result
+
+def _sampled_equity(ranges, board, remaining, trials, rng, batch_size = 50_000):
+
+    """
+    Estimates the equity of any number of ranges by sampling a combo from \
+    each (by weight, skipping samples where they share a card) and a runout.
+    """
+
+    arrays = [r.arrays() for r in ranges]
+    to_deal = 5 - len(board)
+    remaining = np.asarray(remaining, dtype = np.int64)
+    board = np.asarray(board, dtype = np.int64)
+    n_players = len(ranges)
+
+    wins = np.zeros(n_players)
+    ties = np.zeros(n_players)
+    shares = np.zeros(n_players)
+    shares_sq = np.zeros(n_players)
+    done = 0
+    attempts = 0
+    while done < trials:
+        size = min(batch_size, 2 * (trials - done) + 16)
+        picked = [combos[rng.choice(len(combos), size, p = weights / weights.sum())]
+                  for combos, weights in arrays]
+        masks = np.zeros(size, dtype = np.uint64)
+        ok = np.ones(size, dtype = bool)
+        for combo in picked:
+            ok &= (masks & COMBO_MASKS[combo]) == 0
+            masks |= COMBO_MASKS[combo]
+        attempts += size
+        if not ok.any():
+            if attempts > 100 * trials + 100_000:
+                raise ValueError("The ranges almost never fit together on this board.")
+            continue
+        picked = [combo[ok][:trials - done] for combo in picked]
+        masks = masks[ok][:trials - done]
+        rows = len(masks)
+
+        #A random runout from the cards none of the hands hold
+        keys = rng.random((rows, len(remaining)))
+        held = (masks[:, None] >> remaining.astype(np.uint64)[None, :]) & np.uint64(1)
+        keys[held.astype(bool)] = 2.0
+        runout = remaining[np.argpartition(keys, to_deal, axis = 1)[:, :to_deal]] if to_deal else \
+            np.zeros((rows, 0), dtype = np.int64)
+
+        common = np.concatenate([np.broadcast_to(board, (rows, len(board))), runout], axis = 1)
+        ranks = np.stack([evaluate_batch(np.concatenate([COMBO_CARDS[combo], common], axis = 1))[0]
+                          for combo in picked], axis = 1)
+        best = ranks.max(axis = 1, keepdims = True)
+        winners = ranks == best
+        n_winners = winners.sum(axis = 1, keepdims = True)
+        share = winners / n_winners
+
+        wins += (winners & (n_winners == 1)).sum(axis = 0)
+        ties += (winners & (n_winners > 1)).sum(axis = 0)
+        shares += share.sum(axis = 0)
+        shares_sq += (share**2).sum(axis = 0)
+        done += rows
+
+    return EquityResult(ranges, done, list(wins), list(ties), list(shares), list(shares_sq))
+
+def range_equity(ranges, board = (), dead = (), trials = 200_000, max_runouts = MAX_EXACT_RUNOUTS,
+                 seed = None, table = None):
+
+    """
+    Inputs: Two or more ranges (Range objects, range strings or dicts from \
+        combo index to weight), a board of 0 to 5 cards and dead cards \
+        (Cards or strings like "AhKd7c").
+    Outputs: An EquityResult with the equity of each range.
+
+    Two ranges are worked out runout by runout: exactly if there are at \
+    most max_runouts (from the flop on), else on max_runouts random ones. \
+    The result then also has combo_equity, the equity of every combo of \
+    the first range against the second. More ranges are estimated from \
+    trials random deals. seed makes sampling reproducible.
+
+    If table, a preflop.PreflopTable (e.g. preflop.default_table()), is \
+    given, two ranges with no board and no dead cards are looked up in it \
+    instead of dealing runouts. The table only stores equities, so such a \
+    result has win equal to the equity and tie 0, and combo_equity is as \
+    precise as the table.
+    """
+
+    board = [card.index for card in to_cards(board)]
+    dead = [card.index for card in to_cards(dead)]
+    known = board + dead
+    if len(board) > 5:
+        raise ValueError(f"A board has at most 5 cards, got {len(board)}.")
+    if len(set(known)) != len(known):
+        raise ValueError("The same card was given twice.")
+    if len(ranges) < 2:
+        raise ValueError("Equity needs at least two ranges.")
+
+    known_cards = [CARDS[card] for card in known]
+    ranges = [_to_range(r).without(known_cards) for r in ranges]
+    for r in ranges:
+        if not len(r):
+            raise ValueError(f"Nothing is left of the range {r} once the known cards are removed.")
+
+    remaining = [card for card in range(52) if card not in set(known)]
+    rng = np.random.default_rng(seed)
+    if len(ranges) == 2:
+        if not known and table is not None:
+            return _table_equity(ranges, table)
+        return _two_range_equity(ranges, board, remaining, max_runouts, rng)
+    return _sampled_equity(ranges, board, remaining, trials, rng)
@@ -0,0 +1,88 @@
+"""
+Splitting the pot at showdown.
+
+Works on plain lists indexed by seat, so it does not care which game or \
+evaluator the hand ranks come from, as long as a larger rank is a better hand.
+"""
+
+
+def resolve_showdown(contributions, ranks):
+
+    """
+    Inputs: contributions[i] is how many chips seat i put in this hand, \
+        ranks[i] its hand rank or None if it folded. Seats are in the order \
+        odd chips are handed out, i.e. starting left of the button.
+    Outputs: A pair (winnings, pots). winnings[i] is how many chips seat i \
+        gets back, pots is a list of (amount, eligible seats, winning seats) \
+        from the main pot to the last side pot.
+
+    Every all-in amount of a live player opens a new side pot that only \
+    players who put in at least that much can win. Chips that cannot be \
+    split evenly go one each to the winners closest to the button's left. \
+    A bet nobody could call ends up as a pot with a single eligible \
+    player, who simply gets it back.
+    """
+
+    live = [i for i in range(len(contributions)) if ranks[i] is not None]
+    if not live:
+        raise ValueError("At least one player has to be left at showdown.")
+
+    winnings = [0] * len(contributions)
+    total = sum(contributions)
+
+    #Nobody is all-in for less than the others, so there is just one pot
+    level = contributions[live[0]]
+    if all(contributions[i] == level for i in live):
+        best = max(ranks[i] for i in live)
+        winners = [i for i in live if ranks[i] == best]
+        _split(total, winners, winnings)
+        return winnings, [(total, live, winners)]
+
+    #Live players by how much they put in. Each distinct amount closes a pot
+    #that everyone who put in at least that much can win.
+    live.sort(key = contributions.__getitem__)
+    sorted_contributions = sorted(contributions)
+    pots = []
+    paid_out = 0
+    previous = 0
+    k = 0
+    start = 0
+    while start < len(live):
+        level = contributions[live[start]]
+        eligible = live[start:]
+        while start < len(live) and contributions[live[start]] == level:
+            start += 1
+
+        if start == len(live):
+            #The last pot also takes whatever folded players put in above it
+            amount = total - paid_out
+        else:
+            amount = 0
+            while sorted_contributions[k] <= level:
+                amount += sorted_contributions[k] - previous if sorted_contributions[k] > previous else 0
+                k += 1
+            amount += (len(contributions) - k) * (level - previous)
+        previous = level
+        if amount == 0:
+            continue
+        paid_out += amount
+
+        best = max(ranks[i] for i in eligible)
+        winners = sorted(i for i in eligible if ranks[i] == best)
+        _split(amount, winners, winnings)
+        pots.append((amount, sorted(eligible), winners))
+
+    return winnings, pots
+
+def _split(amount, winners, winnings):
+
+    """
+    Splits amount evenly among winners, the odd chips going one each to \
+    the first winners.
+    """
+
+    share, odd_chips = divmod(amount, len(winners))
+    for i in winners:
+        winnings[i] += share
+    for i in winners[:odd_chips]:
+        winnings[i] += 1
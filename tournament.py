@@ -0,0 +1,308 @@
+"""
+Multi-table tournaments.
+
+A Tournament seats its entrants at tables of up to table_size players and \
+plays them one blind level at a time. Every table plays its hands of the \
+level as a headless Game in a worker process; the workers send back the \
+stacks and who busted when, and the director then updates the \
+leaderboard, breaks tables that are no longer needed and balances the \
+rest before the next level starts.
+
+    tournament = Tournament(10_000, seed = 1)
+    tournament.run()
+    print(tournament.leaderboard(10))
+
+Players are numbered 0 to entrants-1. Players who bust in the same level \
+are placed by the hand they busted in, and among those busting in the \
+same hand, by how many chips they started that hand with. With payouts \
+(see payout_structure) prizes gives what every finished player won and \
+icm_equities what the players still in can expect.
+"""
+
+import multiprocessing
+import os
+
+from bots import RandomBot
+from equity import stream_seed
+from icm import icm
+
+
+def blind_schedule(levels = 40, big_blind = 50, growth = 1.3, ante_from = 4):
+
+    """
+    Returns a blind schedule: a list of (small blind, big blind, ante) per \
+    level, the big blind growing by growth every level and rounded to two \
+    significant digits. Antes of a tenth of the big blind start at level \
+    ante_from (counting from 0).
+    """
+
+    schedule = []
+    value = float(big_blind)
+    for level in range(levels):
+        digits = max(len(str(int(value))) - 2, 0)
+        bb = max(int(round(value / 10**digits)) * 10**digits, 2)
+        bb -= bb % 2
+        schedule.append((bb // 2, bb, bb // 10 if level >= ante_from else 0))
+        value *= growth
+    return schedule
+
+def payout_structure(entrants, prize_pool = None, paid = 0.15, steepness = 1.0):
+
+    """
+    Returns the prizes by place, winner first: the top paid share of the \
+    field (at least one player) get prize_pool (default: one per entrant) \
+    split in proportion to 1 / place**steepness.
+    """
+
+    places = max(1, min(entrants, round(entrants * paid)))
+    prize_pool = entrants if prize_pool is None else prize_pool
+    weights = [1 / place**steepness for place in range(1, places + 1)]
+    total = sum(weights)
+    return [prize_pool * weight / total for weight in weights]
+
+
+def play_table(args):
+
+    """
+    Plays one table through one level. Runs in a worker.
+
+    Inputs: A tuple (table id, list of (player id, chips) in seat order \
+        starting with the next small blind, (small blind, big blind, ante), \
+        number of hands, decision provider (None for a RandomBot), seed, \
+        prizes of the places still to be decided if this is the final \
+        table, else None).
+    Outputs: A tuple (table id, list of (player id, chips) of the players \
+        left, again starting with the next small blind, list of (player id, \
+        hand number, chips at the start of that hand) of the players who \
+        busted, number of hands played).
+    """
+
+    from Game import Game
+
+    table_id, seats, (small_blind, big_blind, ante), hands, decision_provider, seed, payouts = args
+    if len(seats) < 2:
+        return table_id, seats, [], 0
+    if decision_provider is None:
+        decision_provider = RandomBot(seed = seed)
+
+    #Game moves the button once when it is set up, so seat everyone one
+    #place further on and the first hand starts with the small blind given
+    seats = seats[1:] + seats[:1]
+    game = Game(len(seats), headless = True, player_names = [player for player, _ in seats],
+                chips = [chips for _, chips in seats], blinds = [small_blind, big_blind], ante = ante,
+                decision_provider = decision_provider, seed = seed, payouts = payouts)
+
+    busts = []
+    played = 0
+    while played < hands and game.players_num > 1:
+        stacks = {player.name: player.chips for player in game.players}
+        game.run(1)
+        played += 1
+        if game.players_num < len(stacks):
+            left = {player.name for player in game.players}
+            busts.extend((name, played, chips) for name, chips in stacks.items() if name not in left)
+
+    game.sort_by_position()
+    return table_id, [(player.name, player.chips) for player in game.players], busts, played
+
+
+class Tournament:
+
+    def __init__(self, entrants, chips = 10_000, table_size = 9, schedule = None,
+                 hands_per_level = 20, decision_provider = None, seed = None, workers = None,
+                 payouts = None):
+
+        """
+        Sets up a freezeout with entrants players starting with chips each. \
+        schedule is a list of (small blind, big blind, ante), the last level \
+        repeating once it runs out (default: blind_schedule()). \
+        decision_provider decides for every player as in Game; it is \
+        pickled to the workers, so it has to be picklable (default: a \
+        RandomBot per table and level, seeded from seed). workers is the number of processes (default: one per \
+        core, 1 plays everything in this process). payouts are the prizes \
+        by place, winner first (default: payout_structure(entrants)).
+        """
+
+        if entrants < 2:
+            raise ValueError("A tournament needs at least two players.")
+        if table_size < 2:
+            raise ValueError("Tables need at least two seats.")
+
+        self.entrants = entrants
+        self.table_size = table_size
+        self.schedule = schedule if schedule is not None else blind_schedule()
+        self.hands_per_level = hands_per_level
+        self.decision_provider = decision_provider
+        self.seed = seed
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.payouts = list(payouts) if payouts is not None else payout_structure(entrants)
+
+        self.chips = {player: chips for player in range(entrants)}
+        #Finishing place of every player who busted, 1 being the winner
+        self.places = {}
+        self.level = 0
+        self.hands_played = 0
+
+        #Players of every table in seat order, dealt round robin so every
+        #table starts with the same number of players give or take one
+        n_tables = -(-entrants // table_size)
+        self.tables = {table: list(range(table, entrants, n_tables)) for table in range(n_tables)}
+
+    def __repr__(self):
+        return (f"Tournament of {self.entrants} players: {self.players_left()} left at "
+                f"{len(self.tables)} tables, level {self.level}")
+
+    def players_left(self):
+        return self.entrants - len(self.places)
+
+    def blinds(self, level = None):
+
+        """
+        Returns the (small blind, big blind, ante) of a level (default: the current one).
+        """
+
+        level = self.level if level is None else level
+        return self.schedule[min(level, len(self.schedule) - 1)]
+
+    def _jobs(self):
+        blinds = self.blinds()
+        left = self.players_left()
+        for table, players in self.tables.items():
+            seed = None if self.seed is None else stream_seed(self.seed, f"{self.level}:{table}")
+            #ICM of one table only means something at the final table, with
+            #the players at other tables left out it would hand out their
+            #prizes too (see icm_equities for the whole field)
+            payouts = self.payouts[:left] if len(players) == left else None
+            yield (table, [(player, self.chips[player]) for player in players], blinds,
+                   self.hands_per_level, self.decision_provider, seed, payouts)
+
+    def _collect(self, results):
+
+        """
+        Takes in the results of every table of a level and places the \
+        players who busted.
+        """
+
+        busts = []
+        for table, seats, table_busts, played in results:
+            self.tables[table] = [player for player, _ in seats]
+            for player, chips in seats:
+                self.chips[player] = chips
+            for player, hand, chips in table_busts:
+                self.chips[player] = 0
+                busts.append((hand, chips, player))
+            self.hands_played += played
+
+        #The earliest and shortest stacked bust finishes last
+        place = self.players_left()
+        for _, _, player in sorted(busts):
+            self.places[player] = place
+            place -= 1
+
+    def balance(self):
+
+        """
+        Breaks tables until no more are left than needed to seat everyone, \
+        then moves players from the fullest tables to the emptiest ones \
+        until they differ by at most one player. Moved players take the \
+        seat just before the small blind, i.e. the button.
+        """
+
+        self.tables = {table: players for table, players in self.tables.items() if players}
+        needed = -(-self.players_left() // self.table_size)
+
+        while len(self.tables) > needed:
+            broken = min(self.tables, key = lambda table: (len(self.tables[table]), table))
+            for player in self.tables.pop(broken):
+                smallest = min(self.tables, key = lambda table: (len(self.tables[table]), table))
+                self.tables[smallest].append(player)
+
+        while len(self.tables) > 1:
+            largest = max(self.tables, key = lambda table: (len(self.tables[table]), -table))
+            smallest = min(self.tables, key = lambda table: (len(self.tables[table]), table))
+            if len(self.tables[largest]) - len(self.tables[smallest]) <= 1:
+                break
+            #Take the player who would be the big blind next
+            self.tables[smallest].append(self.tables[largest].pop(1))
+
+    def play_level(self, pool = None):
+
+        """
+        Plays one level on every table, then balances the tables.
+        """
+
+        jobs = list(self._jobs())
+        if pool is None:
+            results = map(play_table, jobs)
+        else:
+            results = pool.imap_unordered(play_table, jobs)
+        self._collect(results)
+        self.level += 1
+
+        if self.players_left() == 1:
+            winner = next(player for player in self.chips if player not in self.places)
+            self.places[winner] = 1
+            self.tables = {}
+        else:
+            self.balance()
+
+    def run(self, max_levels = None, callback = None):
+
+        """
+        Plays levels until one player has all the chips, or max_levels \
+        levels have been played. callback, if given, is called with the \
+        tournament after every level.
+        Outputs: The player ids in finishing order as far as known, winner first.
+        """
+
+        pool = multiprocessing.Pool(self.workers) if self.workers > 1 else None
+        try:
+            levels = 0
+            while self.tables and (max_levels is None or levels < max_levels):
+                self.play_level(pool)
+                levels += 1
+                if callback is not None:
+                    callback(self)
+        finally:
+            if pool is not None:
+                pool.terminate()
+        return sorted(self.places, key = self.places.get)
+
+    def leaderboard(self, top = None):
+
+        """
+        Returns (place, player id, chips) for the players still in, by \
+        chips, followed by the players who busted, by finishing place. \
+        The places of players still in are their rank by chips.
+        """
+
+        alive = sorted((player for player in self.chips if player not in self.places),
+                       key = lambda player: (-self.chips[player], player))
+        busted = sorted(self.places, key = self.places.get)
+        board = [(place, player, self.chips[player]) for place, player in enumerate(alive, 1)]
+        board += [(self.places[player], player, self.chips[player]) for player in busted]
+        return board if top is None else board[:top]
+
+    def prize(self, place):
+        return self.payouts[place - 1] if place <= len(self.payouts) else 0
+
+    def prizes(self):
+
+        """
+        Returns what every player who finished won, as a dict by player id.
+        """
+
+        return {player: self.prize(place) for player, place in self.places.items()}
+
+    def icm_equities(self, **kwargs):
+
+        """
+        Returns the ICM equity of every player still in as a dict by \
+        player id: their share of the prizes of the places not decided \
+        yet, by chips. Exact up to icm.MAX_EXACT players left and sampled \
+        beyond that; kwargs go to icm.icm.
+        """
+
+        alive = [player for player in self.chips if player not in self.places]
+        equities = icm([self.chips[player] for player in alive], self.payouts[:len(alive)], **kwargs)
+        return {player: float(equity) for player, equity in zip(alive, equities)}
@@ -0,0 +1,381 @@
+"""
+Vectorized Hold'em engine playing many independent tables in lockstep.
+
+Game keeps one table as Player objects and asks for one decision at a \
+time. VectorGame keeps n_games tables of n_seats seats each as NumPy \
+arrays instead: stacks, bets, contributions and the folded and all-in \
+flags have shape (n_games, n_seats), hole cards (n_games, n_seats, 2) and \
+boards (n_games, 5). Every table always has exactly one seat to act \
+(to_act), and step applies one action per table to all of them at once:
+
+    game = VectorGame(4096, 6, seed = 0)
+    for _ in range(1000):
+        actions, amounts = random_actions(game)
+        rewards, done = game.step(actions, amounts)
+
+Actions are the codes of history: FOLD, CALL (check or call), BET or \
+RAISE to amounts[g] chips in total this street. As in \
+BotPlayer.legal_decision, bets and raises are clamped between the \
+minimum raise (the highest bet plus the big blind) and going all-in, and \
+a raise that cannot go above the highest bet is a call. Blinds, live \
+antes and the order of play follow Game: heads-up the button posts the \
+small blind, acts first preflop and last after the flop.
+
+A table whose hand ends in a step is paid out straight away, side pots \
+included, with the showdowns of all such tables ranked together (see \
+batch_eval.evaluate_states), and deals its next hand with the button \
+moved on. The whole board is dealt with the hole cards; visible_boards \
+only shows what has come so far.
+"""
+
+import numpy as np
+
+from batch_eval import CARD_KEYS, CARD_MASKS, evaluate_states
+from history import FOLD, CALL, BET, RAISE
+import evaluator
+
+#Cards on the board on each street, preflop to river
+BOARD_SIZES = np.array([0, 3, 4, 5])
+
+
+class VectorGame:
+
+    def __init__(self, n_games, n_seats = 6, chips = 1_000, blinds = (1, 2), ante = 0,
+                 refill = True, seed = None):
+
+        """
+        Starts n_games tables of n_seats players and deals the first hand \
+        at each. chips is the starting stack of every seat, or a list with \
+        one per seat.
+
+        With refill = True every hand starts from the starting stacks, \
+        which is what self-play usually wants. Otherwise the chips carry \
+        over from hand to hand, seats without chips sit out and a table \
+        with a single player left starts over from the starting stacks \
+        (counted in tables_finished).
+        """
+
+        if n_seats < 2:
+            raise ValueError("A table needs at least 2 seats.")
+        if 2 * n_seats + 5 > 52:
+            raise ValueError(f"There are not enough cards for {n_seats} seats.")
+
+        self.n_games = n_games
+        self.n_seats = n_seats
+        self.blinds = blinds
+        self.ante = ante
+        self.refill = refill
+        self.rng = np.random.default_rng(seed)
+
+        self.starting_chips = np.broadcast_to(np.asarray(chips, dtype = np.int64), (n_games, n_seats)).copy()
+        if (self.starting_chips <= 0).any():
+            raise ValueError("Every seat has to start with chips.")
+
+        shape = (n_games, n_seats)
+        self.stacks = self.starting_chips.copy()
+        #Bets of the current street and everything put in this hand,
+        #current street included
+        self.bets = np.zeros(shape, dtype = np.int64)
+        self.contributions = np.zeros(shape, dtype = np.int64)
+        #Seats sitting out a hand count as folded
+        self.folded = np.zeros(shape, dtype = bool)
+        self.all_in = np.zeros(shape, dtype = bool)
+        #Who has acted since the last bet or raise
+        self.acted = np.zeros(shape, dtype = bool)
+        self.hole_cards = np.zeros((n_games, n_seats, 2), dtype = np.int8)
+        self.boards = np.zeros((n_games, 5), dtype = np.int8)
+        #Stacks when the hand started, to work out the rewards
+        self.hand_stacks = self.stacks.copy()
+
+        #0 preflop, 1 flop, 2 turn, 3 river
+        self.street = np.zeros(n_games, dtype = np.int8)
+        #Moved on before every hand, so the first hand has the button on the
+        #last seat and the blinds on the first two, like Game
+        self.button = np.full(n_games, n_seats - 2, dtype = np.int64)
+        self.to_act = np.zeros(n_games, dtype = np.int64)
+        self.hands_played = np.zeros(n_games, dtype = np.int64)
+        self.tables_finished = 0
+
+        self._rows = np.arange(n_games)
+        self._seats = np.arange(n_seats)
+        self._new_hands(self._rows)
+        self._advance(self._rows)
+
+    def __repr__(self):
+        return f"VectorGame of {self.n_games} tables with {self.n_seats} seats, {self.hands_played.sum()} hands played"
+
+    def _next_seat(self, mask, after):
+
+        """
+        Returns, for every row of the boolean (B, n_seats) mask, the first \
+        seat after the seat in after (going round the table, after itself \
+        last) where the mask is True, or -1 if there is none.
+        """
+
+        order = (after[:, None] + 1 + self._seats) % self.n_seats
+        hits = np.take_along_axis(mask, order, axis = 1)
+        first = hits.argmax(axis = 1)
+        return np.where(hits.any(axis = 1), order[np.arange(len(order)), first], -1)
+
+    def _bet(self, rows, seats, chips):
+
+        """
+        Moves chips (at most the stack) from the stacks into the bets of \
+        the given seats of the given tables.
+        """
+
+        chips = np.minimum(chips, self.stacks[rows, seats])
+        self.stacks[rows, seats] -= chips
+        self.bets[rows, seats] += chips
+        self.contributions[rows, seats] += chips
+        self.all_in[rows, seats] |= (self.stacks[rows, seats] == 0) & ~self.folded[rows, seats]
+
+    def _new_hands(self, rows):
+
+        """
+        Moves the button, posts the antes and blinds and deals a new hand \
+        at the given tables.
+        """
+
+        if self.refill:
+            self.stacks[rows] = self.starting_chips[rows]
+        else:
+            over = (self.stacks[rows] > 0).sum(axis = 1) < 2
+            self.stacks[rows[over]] = self.starting_chips[rows[over]]
+            self.tables_finished += int(over.sum())
+
+        seated = self.stacks[rows] > 0
+        self.hand_stacks[rows] = self.stacks[rows]
+        self.bets[rows] = 0
+        self.contributions[rows] = 0
+        self.folded[rows] = ~seated
+        self.all_in[rows] = False
+        self.acted[rows] = False
+        self.street[rows] = 0
+
+        #Every seat gets cards, sitting out or not, from one shuffle per table
+        n_seats = self.n_seats
+        cards = self.rng.random((len(rows), 52)).argsort(axis = 1)[:, :2 * n_seats + 5]
+        self.hole_cards[rows] = cards[:, :2 * n_seats].reshape(-1, n_seats, 2)
+        self.boards[rows] = cards[:, 2 * n_seats:]
+
+        button = self._next_seat(seated, self.button[rows])
+        self.button[rows] = button
+        #Heads-up the button posts the small blind
+        small = np.where(seated.sum(axis = 1) == 2, button, self._next_seat(seated, button))
+        big = self._next_seat(seated, small)
+
+        if self.ante > 0:
+            table, seat = np.nonzero(seated)
+            self._bet(rows[table], seat, self.ante)
+        self._bet(rows, small, self.blinds[0])
+        self._bet(rows, big, self.blinds[1])
+        #The first to act preflop sits after the big blind
+        self.to_act[rows] = big
+
+    def _advance(self, rows):
+
+        """
+        Finds the next seat to act at the given tables, ending betting \
+        rounds and hands as needed. Returns the tables whose hand ended, \
+        which have been paid out already.
+        """
+
+        finished = []
+        while len(rows):
+            live = ~self.folded[rows]
+            won = live.sum(axis = 1) == 1
+            if won.any():
+                self._pay_last_player(rows[won])
+                finished.append(rows[won])
+                rows, live = rows[~won], live[~won]
+
+            can_act = live & ~self.all_in[rows]
+            bets = self.bets[rows]
+            waiting = can_act & (~self.acted[rows] | (bets < bets.max(axis = 1, keepdims = True)))
+            seat = self._next_seat(waiting, self.to_act[rows])
+            found = seat >= 0
+            self.to_act[rows[found]] = seat[found]
+            rows, can_act = rows[~found], can_act[~found]
+
+            #The betting round is over. With fewer than two players left
+            #who can bet, the rest of the board is just dealt.
+            showdown = (self.street[rows] == 3) | (can_act.sum(axis = 1) < 2)
+            if showdown.any():
+                self._showdown(rows[showdown])
+                finished.append(rows[showdown])
+                rows = rows[~showdown]
+
+            self.street[rows] += 1
+            self.bets[rows] = 0
+            self.acted[rows] = False
+            #The first to act after the flop sits after the button
+            self.to_act[rows] = self.button[rows]
+
+        if not finished:
+            return np.zeros(0, dtype = np.int64)
+        return np.concatenate(finished)
+
+    def _pay_last_player(self, rows):
+
+        """
+        Gives the pot to the only player left at each of the given tables.
+        """
+
+        winner = (~self.folded[rows]).argmax(axis = 1)
+        self.stacks[rows, winner] += self.contributions[rows].sum(axis = 1)
+
+    def _showdown(self, rows):
+
+        """
+        Ranks the hands left at the given tables and splits the main pot \
+        and the side pots among the winners, like showdown.resolve_showdown \
+        with the seats starting left of the button.
+        """
+
+        n_seats = self.n_seats
+        holes = self.hole_cards[rows].astype(np.int64)
+        boards = self.boards[rows].astype(np.int64)
+        keys = (CARD_KEYS[boards].sum(axis = 1) + evaluator.KEY_OFFSET)[:, None] + CARD_KEYS[holes].sum(axis = 2)
+        masks = np.bitwise_or.reduce(CARD_MASKS[boards], axis = 1)[:, None] | \
+                CARD_MASKS[holes[:, :, 0]] | CARD_MASKS[holes[:, :, 1]]
+        live = ~self.folded[rows]
+        ranks = np.where(live, evaluate_states(keys, masks), -1)
+
+        #Every live player's contribution closes a pot, from the smallest up.
+        #Pot k holds what everyone put in between levels k - 1 and k; folded
+        #players' chips above the last level go into the last pot.
+        contributions = self.contributions[rows]
+        top = contributions.sum(axis = 1, keepdims = True) + 1
+        levels = np.sort(np.where(live, contributions, top), axis = 1)
+        previous = np.concatenate([np.zeros((len(rows), 1), dtype = np.int64), levels[:, :-1]], axis = 1)
+        amounts = (np.clip(contributions[:, None, :], previous[:, :, None], levels[:, :, None])
+                   - previous[:, :, None]).sum(axis = 2)
+        eligible = live[:, None, :] & (contributions[:, None, :] >= levels[:, :, None])
+        has_players = eligible.any(axis = 2)
+        table = np.arange(len(rows))
+        #The first pot at the highest live level, the ones after it at the
+        #same level hold nothing
+        highest = levels[table, has_players.sum(axis = 1) - 1]
+        last = (levels == highest[:, None]).argmax(axis = 1)
+        amounts[table, last] += np.where(has_players, 0, amounts).sum(axis = 1)
+        amounts = np.where(has_players, amounts, 0)
+
+        best = np.where(eligible, ranks[:, None, :], -1).max(axis = 2)
+        winners = eligible & (ranks[:, None, :] == best[:, :, None])
+        share, odd_chips = np.divmod(amounts, np.maximum(winners.sum(axis = 2), 1))
+
+        #Odd chips go one each to the winners closest to the button's left
+        order = np.broadcast_to((((self.button[rows] + 1)[:, None] + self._seats) % n_seats)[:, None, :],
+                                winners.shape)
+        in_order = np.take_along_axis(winners, order, axis = 2)
+        odd = in_order & (in_order.cumsum(axis = 2) <= odd_chips[:, :, None])
+        extra = np.zeros(winners.shape, dtype = np.int64)
+        np.put_along_axis(extra, order, odd, axis = 2)
+
+        self.stacks[rows] += (winners * share[:, :, None] + extra).sum(axis = 1)
+
+    def step(self, actions, amounts = None):
+
+        """
+        Inputs: An array with the action of the seat to act at every table \
+            (FOLD, CALL, BET or RAISE, see history) and, for bets and \
+            raises, an array of the amounts to bet or raise to.
+        Outputs: A pair (rewards, done). done[g] is True if the hand at \
+            table g ended, in which case rewards[g] holds the chips every \
+            seat won or lost in it and a new hand has been dealt; rewards \
+            are zero at the other tables.
+        """
+
+        rows = self._rows
+        actions = np.asarray(actions)
+        if actions.shape != (self.n_games,):
+            raise ValueError(f"Expected one action per table, got shape {actions.shape}.")
+        amounts = np.zeros(self.n_games, dtype = np.int64) if amounts is None else \
+                  np.asarray(amounts, dtype = np.int64)
+
+        seats = self.to_act
+        highest = self.bets.max(axis = 1)
+        bet = self.bets[rows, seats]
+        all_in_to = bet + self.stacks[rows, seats]
+
+        folding = actions == FOLD
+        raising = ((actions == BET) | (actions == RAISE)) & (all_in_to > highest)
+        raise_to = np.minimum(np.maximum(amounts, highest + self.blinds[1]), all_in_to)
+        chips = np.where(raising, raise_to - bet, highest - bet)
+        self._bet(rows, seats, np.where(folding, 0, chips))
+        self.folded[rows, seats] |= folding
+
+        #A bet or raise makes everyone else act again
+        self.acted[raising] = False
+        self.acted[rows, seats] = True
+
+        rewards = np.zeros((self.n_games, self.n_seats), dtype = np.int64)
+        done = np.zeros(self.n_games, dtype = bool)
+        finished = self._advance(rows)
+        #A new hand can end before anyone acts, e.g. when the blinds put
+        #everyone all-in, so keep dealing until every table has a seat to act
+        while len(finished):
+            rewards[finished] += self.stacks[finished] - self.hand_stacks[finished]
+            done[finished] = True
+            self.hands_played[finished] += 1
+            self._new_hands(finished)
+            finished = self._advance(finished)
+        return rewards, done
+
+    def visible_boards(self):
+
+        """
+        Returns the boards with -1 for the cards that have not come yet.
+        """
+
+        dealt = np.arange(5) < BOARD_SIZES[self.street][:, None]
+        return np.where(dealt, self.boards, -1)
+
+    def pots(self):
+
+        """
+        Returns the chips in the middle of every table, bets included.
+        """
+
+        return self.contributions.sum(axis = 1)
+
+    def to_call(self):
+
+        """
+        Returns the chips the seat to act at every table needs to call.
+        """
+
+        bet = self.bets[self._rows, self.to_act]
+        return np.minimum(self.bets.max(axis = 1) - bet, self.stacks[self._rows, self.to_act])
+
+    def raise_limits(self):
+
+        """
+        Returns a pair of arrays with the smallest and the largest amount \
+        the seat to act at every table can bet or raise to. Where the \
+        largest is not above the highest bet, raising is not possible.
+        """
+
+        highest = self.bets.max(axis = 1)
+        all_in_to = self.bets[self._rows, self.to_act] + self.stacks[self._rows, self.to_act]
+        return np.minimum(highest + self.blinds[1], all_in_to), all_in_to
+
+
+def random_actions(game, fold = 0.2, raise_ = 0.1, rng = None):
+
+    """
+    Inputs: A VectorGame, the probabilities of folding (when facing a bet) \
+        and of raising, and a NumPy Generator (default: the game's).
+    Outputs: A pair (actions, amounts) for VectorGame.step, playing like \
+        bots.RandomBot at every table at once.
+    """
+
+    rng = game.rng if rng is None else rng
+    roll = rng.random(game.n_games)
+    highest = game.bets.max(axis = 1)
+    actions = np.full(game.n_games, CALL)
+    actions[(roll < fold) & (game.to_call() > 0)] = FOLD
+    actions[roll > 1 - raise_] = RAISE
+    amounts = np.maximum(highest, game.blinds[1]) * rng.integers(2, 5, game.n_games)
+    return actions, amounts
@@ -0,0 +1,420 @@
+"""
+Exhaustive differential check of hand evaluators against the reference.
+
+    python verify.py                          # all 2,598,960 5-card hands
+    python verify.py --cards 7                # all 133,784,560 7-card hands
+    python verify.py --cards 7 --candidate batch_eval --workers 8
+
+Every hand is ranked by eval_funcs.evaluate_holdem_reference, the original \
+list based evaluator, and by a candidate (see CANDIDATES, or any \
+"module:function" taking a list of card indices and returning a rank, \
+larger being better). Two things are checked:
+
+    category  the candidate puts the hand in the same category
+    order     the candidate orders all hands the same way
+
+The reference gives no rank, so its hands are compared by reference_key: \
+the category, then the values of the cards it picked, most important \
+first. There are only 7462 ranks, so every worker notes which key each \
+rank it sees goes with. If one rank ever goes with two keys, or the keys \
+do not increase with the rank once every hand has been seen, some pair of \
+hands is ordered differently; the pair is reported as the five cards the \
+reference picked from each.
+
+The hands are split into jobs by their two lowest cards, which run on a \
+process pool. Every CHECKPOINT_SECONDS, and when the run stops, \
+everything found so far is written to the checkpoint file (by default in \
+evaluator.TABLE_DIR), so a run that was stopped continues where it left \
+off when started again with the same file. Hands whose category differs \
+are shrunk to the fewest cards that still disagree before being reported.
+"""
+
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from itertools import combinations
+from math import comb
+
+from Card import CARDS
+from eval_funcs import evaluate_holdem_reference
+import evaluator
+
+#Candidates by name, each a "module:function" ranking a list of card indices
+CANDIDATES = {"evaluator": "evaluator:evaluate",
+              "evaluate_holdem_rank": "verify:_holdem_rank",
+              "hand_state": "verify:_hand_state_rank",
+              "batch_eval": "verify:_batch_eval_ranks"}
+
+#Candidates that rank a whole list of hands in one call
+BATCH_CANDIDATES = {"batch_eval"}
+
+#Hands ranked per call of a batch candidate
+CHUNK = 1 << 16
+
+#Seconds between checkpoints. Writing one takes a while with every rank
+#in it, which would slow down the many small jobs at the end of a run.
+CHECKPOINT_SECONDS = 30
+
+
+def _holdem_rank(cards):
+    from eval_funcs import evaluate_holdem_rank
+    return evaluate_holdem_rank([CARDS[card] for card in cards])
+
+def _hand_state_rank(cards):
+    from hand_state import HandState
+    return HandState(cards).rank()
+
+def _batch_eval_ranks(hands):
+    from batch_eval import evaluate_batch
+    import numpy as np
+    return evaluate_batch(np.array(hands, dtype = np.int64))[0].tolist()
+
+def load_candidate(spec):
+
+    """
+    Returns the function named by a candidate spec: a name from CANDIDATES \
+    or a "module:function".
+    """
+
+    module, _, name = CANDIDATES.get(spec, spec).partition(":")
+    if not name:
+        raise ValueError(f"Unknown candidate {spec!r}: use one of {sorted(CANDIDATES)} or module:function.")
+    return getattr(importlib.import_module(module), name)
+
+
+def reference_key(cards):
+
+    """
+    Inputs: A list of card indices.
+    Outputs: A pair (key, five) where key orders hands like the reference \
+        evaluator does, (category, card values...), and five are the card \
+        indices of the hand it picked.
+    """
+
+    name, hand = evaluate_holdem_reference([CARDS[card] for card in cards])
+    category = evaluator.HAND_NAMES.index(name)
+    five = hand[:5]
+    if name in ("straight", "straight flush"):
+        #Only the top card counts; a wheel starts with the five
+        key = (category, five[0].value)
+    else:
+        key = (category,) + tuple(card.value for card in five)
+    return key, [card.index for card in five]
+
+def _disagrees(cards, rank_one):
+    key, _ = reference_key(cards)
+    return evaluator.category(rank_one(cards)) != key[0]
+
+def shrink(cards, rank_one):
+
+    """
+    Returns the smallest subset of cards (at least 5) on which the \
+    candidate still gets the category wrong, or cards if none is smaller.
+    """
+
+    for size in range(5, len(cards)):
+        for subset in combinations(cards, size):
+            if _disagrees(list(subset), rank_one):
+                return list(subset)
+    return list(cards)
+
+def hand_str(cards):
+    return "".join(repr(CARDS[card]) for card in sorted(cards, reverse = True))
+
+
+def jobs(n_cards):
+
+    """
+    Returns the jobs of a run: the pairs of lowest cards that leave enough \
+    cards above them for a hand of n_cards.
+    """
+
+    return [(low, second) for low in range(52) for second in range(low + 1, 52)
+            if 51 - second >= n_cards - 2]
+
+def job_size(job, n_cards):
+    return comb(51 - job[1], n_cards - 2)
+
+def check_job(args):
+
+    """
+    Checks every hand of one job. Runs in a worker.
+
+    Inputs: A tuple (job, number of cards, candidate spec, most examples).
+    Outputs: A dict with the job, the number of hands, how many the \
+        candidate put in each category, the hands whose category differs \
+        (count and examples), the reference key and five cards of every \
+        rank seen, and the ranks seen with two keys (count and examples).
+    """
+
+    job, n_cards, candidate, max_examples = args
+    rank = load_candidate(candidate)
+    batch = candidate in BATCH_CANDIDATES
+    category = evaluator.category
+
+    result = {"job": list(job), "hands": 0, "categories": [0] * 10, "mismatches": 0,
+              "mismatch_examples": [], "ranks": {}, "conflicts": 0, "conflict_examples": []}
+    ranks = {}
+    reported = set()
+    low = list(job)
+    rest = combinations(range(job[1] + 1, 52), n_cards - 2)
+    while True:
+        hands = [low + list(cards) for cards, _ in zip(rest, range(CHUNK))]
+        if not hands:
+            break
+        candidate_ranks = rank(hands) if batch else [rank(hand) for hand in hands]
+        for hand, r in zip(hands, candidate_ranks):
+            key, five = reference_key(hand)
+            cat = category(r)
+            result["categories"][cat] += 1
+            if cat != key[0]:
+                result["mismatches"] += 1
+                if len(result["mismatch_examples"]) < max_examples:
+                    result["mismatch_examples"].append(hand)
+            seen = ranks.get(r)
+            if seen is None:
+                ranks[r] = (key, five)
+            elif seen[0] != key:
+                result["conflicts"] += 1
+                #One example per rank is enough
+                if r not in reported and len(result["conflict_examples"]) < max_examples:
+                    reported.add(r)
+                    result["conflict_examples"].append([r, seen[1], five])
+        result["hands"] += len(hands)
+    result["ranks"] = {r: [list(key), five] for r, (key, five) in ranks.items()}
+    return result
+
+
+class Verification:
+
+    def __init__(self, n_cards = 5, candidate = "evaluator", checkpoint = None, max_examples = 20):
+
+        """
+        The state of a run over every hand of n_cards cards, loaded from \
+        checkpoint if that file exists and belongs to the same run.
+        """
+
+        if n_cards not in (5, 6, 7):
+            raise ValueError("Hands have 5, 6 or 7 cards.")
+        self.n_cards = n_cards
+        self.candidate = candidate
+        self.checkpoint = checkpoint
+        self.max_examples = max_examples
+
+        self.done = set()
+        self.hands = 0
+        self.categories = [0] * 10
+        self.mismatches = 0
+        self.mismatch_examples = []
+        self.conflicts = 0
+        self.conflict_examples = []
+        #Reference key and five cards of every rank seen
+        self.ranks = {}
+
+        if checkpoint is not None and os.path.exists(checkpoint):
+            self.load(checkpoint)
+
+    def __repr__(self):
+        return (f"Verification of {self.candidate} on {self.n_cards}-card hands: "
+                f"{self.hands:,}/{comb(52, self.n_cards):,} hands, {self.mismatches} category "
+                f"mismatches, {self.conflicts} rank conflicts")
+
+    def load(self, path):
+        with open(path) as f:
+            state = json.load(f)
+        if state["cards"] != self.n_cards or state["candidate"] != self.candidate:
+            raise ValueError(f"{path} is a checkpoint of {state['candidate']} on "
+                             f"{state['cards']}-card hands, not of this run.")
+        self.done = {tuple(job) for job in state["done"]}
+        self.hands = state["hands"]
+        self.categories = state["categories"]
+        self.mismatches = state["mismatches"]
+        self.mismatch_examples = state["mismatch_examples"]
+        self.conflicts = state["conflicts"]
+        self.conflict_examples = state["conflict_examples"]
+        self.ranks = {int(r): (tuple(key), five) for r, (key, five) in state["ranks"].items()}
+
+    def save(self, path):
+
+        """
+        Writes the state to path, through a temporary file so a run killed \
+        while writing leaves the last checkpoint intact.
+        """
+
+        state = {"cards": self.n_cards, "candidate": self.candidate,
+                 "done": sorted(self.done), "hands": self.hands, "categories": self.categories,
+                 "mismatches": self.mismatches, "mismatch_examples": self.mismatch_examples,
+                 "conflicts": self.conflicts, "conflict_examples": self.conflict_examples,
+                 "ranks": {r: [list(key), five] for r, (key, five) in self.ranks.items()}}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok = True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+    def add(self, result):
+
+        """
+        Merges the result of one job.
+        """
+
+        self.done.add(tuple(result["job"]))
+        self.hands += result["hands"]
+        self.categories = [a + b for a, b in zip(self.categories, result["categories"])]
+        self.mismatches += result["mismatches"]
+        room = self.max_examples - len(self.mismatch_examples)
+        self.mismatch_examples += result["mismatch_examples"][:max(room, 0)]
+        self.conflicts += result["conflicts"]
+        room = self.max_examples - len(self.conflict_examples)
+        self.conflict_examples += result["conflict_examples"][:max(room, 0)]
+        for r, (key, five) in result["ranks"].items():
+            r, key = int(r), tuple(key)
+            seen = self.ranks.get(r)
+            if seen is None:
+                self.ranks[r] = (key, five)
+            elif seen[0] != key:
+                self.conflicts += 1
+                if r not in {example[0] for example in self.conflict_examples} and \
+                   len(self.conflict_examples) < self.max_examples:
+                    self.conflict_examples.append([r, seen[1], five])
+
+    def pending(self):
+        return [job for job in jobs(self.n_cards) if job not in self.done]
+
+    def run(self, workers = None, max_jobs = None, progress = None, save_every = CHECKPOINT_SECONDS):
+
+        """
+        Checks the jobs not done yet (at most max_jobs of them), biggest \
+        first, on workers processes (default: one per core). progress, if \
+        given, is called with the verification after every job. The \
+        checkpoint is saved every save_every seconds and when the run \
+        stops, for whatever reason.
+        """
+
+        todo = sorted(self.pending(), key = lambda job: -job_size(job, self.n_cards))
+        if max_jobs is not None:
+            todo = todo[:max_jobs]
+        args = [(job, self.n_cards, self.candidate, self.max_examples) for job in todo]
+        workers = workers or os.cpu_count() or 1
+
+        evaluator.preload()
+        pool = multiprocessing.Pool(workers) if workers > 1 else None
+        saved = time.perf_counter()
+        unsaved = False
+        try:
+            results = pool.imap_unordered(check_job, args) if pool is not None else map(check_job, args)
+            for result in results:
+                self.add(result)
+                unsaved = True
+                if self.checkpoint is not None and time.perf_counter() - saved >= save_every:
+                    self.save(self.checkpoint)
+                    saved = time.perf_counter()
+                    unsaved = False
+                if progress is not None:
+                    progress(self)
+        finally:
+            if pool is not None:
+                pool.terminate()
+            if self.checkpoint is not None and unsaved:
+                self.save(self.checkpoint)
+
+    def complete(self):
+        return not self.pending()
+
+    def order_violations(self):
+
+        """
+        Returns the pairs of neighbouring ranks whose reference keys do not \
+        increase, as (lower rank, its five cards, higher rank, its five \
+        cards): the candidate ranks the second hand higher, the reference \
+        does not.
+        """
+
+        ranked = sorted(self.ranks.items())
+        return [(r1, five1, r2, five2) for (r1, (key1, five1)), (r2, (key2, five2)) in zip(ranked, ranked[1:])
+                if key1 >= key2]
+
+    def report(self):
+
+        """
+        Returns a text report with the counts and minimal counterexamples.
+        """
+
+        rank_one = load_candidate(self.candidate)
+        if self.candidate in BATCH_CANDIDATES:
+            batch_rank = rank_one
+            rank_one = lambda cards: batch_rank([cards])[0]
+
+        lines = [repr(self)]
+        if not self.complete():
+            lines.append(f"{len(self.pending())} of {len(jobs(self.n_cards))} jobs still to run.")
+        lines.append("Hands per category (candidate): " +
+                     ", ".join(f"{evaluator.HAND_NAMES[cat]} {count:,}"
+                               for cat, count in enumerate(self.categories) if cat))
+
+        for hand in self.mismatch_examples:
+            small = shrink(hand, rank_one)
+            key, five = reference_key(small)
+            lines.append(f"CATEGORY {hand_str(hand)}: minimal {hand_str(small)} is "
+                         f"{evaluator.hand_name(rank_one(small))} for the candidate, "
+                         f"{evaluator.HAND_NAMES[key[0]]} {hand_str(five)} for the reference")
+        for r, five1, five2 in self.conflict_examples:
+            lines.append(f"CONFLICT rank {r}: {hand_str(five1)} and {hand_str(five2)} rank the same "
+                         f"for the candidate, not for the reference")
+        violations = self.order_violations() if self.complete() else []
+        for r1, five1, r2, five2 in violations[:self.max_examples]:
+            lines.append(f"ORDER {hand_str(five2)} (rank {r2}) beats {hand_str(five1)} (rank {r1}) "
+                         f"for the candidate, not for the reference")
+        if self.complete() and not (self.mismatches or self.conflicts or violations):
+            lines.append("The candidate agrees with the reference on every hand.")
+        return "\n".join(lines)
+
+    def passed(self):
+        return self.complete() and not (self.mismatches or self.conflicts or self.order_violations())
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Check an evaluator against the reference on every hand.")
+    parser.add_argument("--cards", type = int, default = 5, choices = (5, 6, 7))
+    parser.add_argument("--candidate", default = "evaluator",
+                        help = f"one of {', '.join(CANDIDATES)} or module:function")
+    parser.add_argument("--checkpoint",
+                        help = "state file (default: verify_<cards>_<candidate>.json in evaluator.TABLE_DIR)")
+    parser.add_argument("--save-every", type = float, default = CHECKPOINT_SECONDS,
+                        help = "seconds between checkpoints")
+    parser.add_argument("--fresh", action = "store_true", help = "ignore an existing checkpoint")
+    parser.add_argument("--workers", type = int, help = "processes (default: one per core)")
+    parser.add_argument("--max-jobs", type = int, help = "stop after this many jobs")
+    parser.add_argument("--max-examples", type = int, default = 20)
+    args = parser.parse_args(argv)
+
+    checkpoint = args.checkpoint or os.path.join(evaluator.TABLE_DIR,
+                                                 f"verify_{args.cards}_{args.candidate.replace(':', '_')}.json")
+    if args.fresh and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    verification = Verification(args.cards, args.candidate, checkpoint, args.max_examples)
+    start = time.perf_counter()
+    hands_before = verification.hands
+    total = len(jobs(args.cards))
+
+    def progress(verification):
+        elapsed = time.perf_counter() - start
+        rate = (verification.hands - hands_before) / elapsed if elapsed else 0
+        print(f"\r{len(verification.done)}/{total} jobs, {verification.hands:,} hands, "
+              f"{rate:,.0f} hands/s, {verification.mismatches} mismatches", end = "", flush = True)
+
+    verification.run(args.workers, args.max_jobs, progress, args.save_every)
+    print()
+    print(verification.report())
+    failed = verification.mismatches or verification.conflicts or \
+             (verification.complete() and verification.order_violations())
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+
+    sys.exit(main())